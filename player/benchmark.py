@@ -0,0 +1,263 @@
+import asyncio
+import gc
+import os
+import resource
+import statistics
+import time
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+import simplejson as json
+import click
+
+from content.api import ApiClient
+from content.apidata import ApiData, MetaDatum
+from content.program import Program
+from standin.archive import StandInArchive
+from standin.server import StandInServer
+from system.clock import Clock
+from system.config import Config
+from system.loop import EventLoop
+
+
+@click.command()
+@click.option('--programs', default='programs.json', help='JSON file with programs')
+@click.option('--cycles', default=10, help='Number of program loads')
+@click.option('--entries', default=30, help='Number of single media entry requests')
+@click.option('--hydrate', default=200, help='Number of media entries whose memory is measured')
+@click.option('--text/--no-text', default=True, help='Measure text fitting (needs a display)')
+@click.option('--results', default=None, help='JSON file that keeps the results of all runs')
+@click.option('--tolerance', default=0.1, help='Relative change that is reported as regression')
+class Benchmark(object):
+    """
+    Measures the hot paths of the player against a local stand-in of the Madek API
+    and compares the results with the previous run.
+    """
+
+    # box of an info screen with two content screens
+    INFO_BOX_WIDTH = 840
+    INFO_BOX_HEIGHT = 600
+    # seconds of a frame at 60 frames per second
+    FRAME = 1 / 60
+    # screens that show content next to the info screen
+    CONTENT_SCREENS = 2
+
+    def __init__(self, programs, cycles, entries, hydrate, text, results, tolerance):
+        self._server = StandInServer(StandInArchive()).start()
+        self._config = Config()
+        self._config.set_server(self._server.url)
+        self._config.set_api_auth(('standin', 'standin'))
+        self._config.set_meta_data_white_list(Config.META_DATA_WHITE_LIST)
+        self._api = ApiClient(self._server.url, 'standin', 'standin')
+        self._results = OrderedDict()
+
+        programs = os.path.join(os.path.dirname(__file__), programs)
+        with open(programs) as json_data:
+            self._programs = [Program(self._api, p) for p in json.load(json_data)['programs']]
+
+        self.benchmark_program_load(cycles)
+        self.benchmark_program_start(cycles)
+        self.benchmark_decoding(cycles)
+        self.benchmark_media_entry(entries)
+        if text:
+            self.benchmark_text_size()
+        self.benchmark_memory(cycles)
+        self.benchmark_entry_bytes(hydrate)
+        self.benchmark_frame_gaps(cycles)
+        self._server.stop()
+
+        if not results:
+            results = str(Path(self._config.log_dir, 'benchmarks.json'))
+        self.report(results, tolerance)
+
+    def run(self, coroutine_):
+        loop = self._api.start_session()
+        result = loop.run_until_complete(coroutine_)
+        self._api.complete_session()
+        return result
+
+    def benchmark_program_load(self, cycles_):
+        times = []
+        requests = []
+        for i in range(cycles_):
+            program = self._programs[i % len(self._programs)]
+            start = time.perf_counter()
+            self.run(program.load(False))
+            times.append(time.perf_counter() - start)
+            requests.append(self._api.request_count)
+        self._results['program_load_seconds'] = statistics.mean(times)
+        self._results['program_load_seconds_max'] = max(times)
+        self._results['program_load_requests'] = statistics.mean(requests)
+
+    def benchmark_program_start(self, cycles_):
+        """
+        Measures the time until a program that is loaded while it is playing has entries for the content screens.
+        """
+        times = []
+        for i in range(cycles_):
+            program = self._programs[i % len(self._programs)]
+            start = time.perf_counter()
+            started = []
+
+            def on_playlist_update(program_):
+                if not started and program_.length >= self.CONTENT_SCREENS:
+                    started.append(time.perf_counter() - start)
+
+            program.push_handlers(on_playlist_update=on_playlist_update)
+            self.run(program.load(False, stream_=True))
+            program.remove_handlers(on_playlist_update=on_playlist_update)
+            times.append(started[0] if started else time.perf_counter() - start)
+        self._results['program_start_seconds'] = statistics.mean(times)
+
+    def benchmark_decoding(self, cycles_):
+        """
+        Measures decoding time and the peak of transient allocations per program load.
+        """
+        decoder = self._api.decoder
+        seconds = []
+        peaks = []
+        for i in range(cycles_):
+            program = self._programs[i % len(self._programs)]
+            # entries are hydrated from scratch in every load
+            ApiData.instances.clear()
+            MetaDatum.instances.clear()
+            gc.collect()
+            decoded = decoder.stats['seconds']
+            tracemalloc.start()
+            self.run(program.load(False))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            seconds.append(decoder.stats['seconds'] - decoded)
+        self._results['decode_seconds_per_load'] = statistics.mean(seconds)
+        self._results['peak_bytes_per_load'] = statistics.mean(peaks)
+
+    def benchmark_media_entry(self, entries_):
+        times = []
+        for id_ in self._server.archive.entry_ids[:entries_]:
+            loop = self._api.start_session()
+            start = time.perf_counter()
+            loop.run_until_complete(self._api.get_media_entry(id_=id_))
+            times.append(time.perf_counter() - start)
+            self._api.complete_session()
+        self._results['media_entry_seconds'] = statistics.median(times)
+
+    def benchmark_text_size(self):
+        # text layouts need a gl context
+        import pyglet
+        from system.screen import Screen
+        window = pyglet.window.Window(visible=False)
+        captions = []
+        for p in self._programs:
+            if p.playlist:
+                for m in p.playlist:
+                    captions.append(m.serialize_meta_data(p.meta_data_white_list, ApiData.INFO_SEPARATOR, ApiData.INFO_PARAGRAPH_SEPARATOR))
+        times = []
+        for c in captions:
+            start = time.perf_counter()
+            Screen.find_text_size(c, self.INFO_BOX_WIDTH, self.INFO_BOX_HEIGHT)
+            times.append(time.perf_counter() - start)
+        window.close()
+        if times:
+            self._results['find_text_size_seconds'] = statistics.mean(times)
+
+    def benchmark_memory(self, cycles_):
+        gc.collect()
+        self._results['rss_bytes_after_{}_cycles'.format(cycles_)] = self.rss()
+        counts = {}
+        for o in gc.get_objects():
+            n = type(o).__name__
+            if n in ('MediaEntryData', 'MetaDatum', 'KeywordData', 'PeopleData', 'MediaFileData', 'PreviewData'):
+                counts[n] = counts.get(n, 0) + 1
+        for n in sorted(counts):
+            self._results['objects_{}'.format(n)] = counts[n]
+        self._results['instances_api_data'] = len(ApiData.instances)
+        self._results['instances_meta_datum'] = len(MetaDatum.instances)
+
+    def benchmark_entry_bytes(self, entries_):
+        """
+        Measures the memory kept per media entry with its meta data, people, keywords, media file and previews.
+        """
+        # all entries are hydrated from scratch
+        ApiData.instances.clear()
+        MetaDatum.instances.clear()
+        gc.collect()
+        tracemalloc.start()
+        loop = self._api.start_session()
+        start = tracemalloc.get_traced_memory()[0]
+        entries = loop.run_until_complete(asyncio.gather(
+            *[self._api.get_media_entry(id_=i, meta_data_white_list_=Config().meta_data_white_list)
+              for i in self._server.archive.entry_ids[:entries_]]))
+        self._api.complete_session()
+        gc.collect()
+        kept = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+        entries = [m for m in entries if m]
+        if entries:
+            self._results['bytes_per_hydrated_entry'] = kept / len(entries)
+            self._results['meta_datum_instances_per_entry'] = len(MetaDatum.instances) / len(entries)
+
+    def benchmark_frame_gaps(self, cycles_):
+        """
+        Measures the longest time between two frames while programs are loaded, once with blocking loads
+        and once on the EventLoop that is stepped with every frame.
+        """
+        gaps = []
+        for i in range(cycles_):
+            start = time.perf_counter()
+            self.run(self._programs[i % len(self._programs)].load(False))
+            gaps.append(time.perf_counter() - start)
+        self._results['frame_gap_seconds_max_blocking'] = max(gaps)
+        gaps = []
+        for i in range(cycles_):
+            self._api.start_session()
+            task = EventLoop().run(self._programs[i % len(self._programs)].load(False))
+            last = time.perf_counter()
+            while not task.done():
+                time.sleep(self.FRAME)
+                Clock().tick()
+                gaps.append(time.perf_counter() - last - self.FRAME)
+                last = time.perf_counter()
+            self._api.complete_session()
+        self._results['frame_gap_seconds_max_event_loop'] = max(gaps)
+        self._results['event_loop_lag_seconds'] = EventLoop().lag[0]
+
+    @staticmethod
+    def rss():
+        """
+        Current resident set size in bytes, maximum resident set size if /proc is not available.
+        """
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * resource.getpagesize()
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def report(self, file_, tolerance_):
+        runs = []
+        if os.path.exists(file_):
+            with open(file_) as f:
+                runs = json.load(f)['runs']
+        previous = runs[-1]['results'] if runs else {}
+        print('{:<40} {:>16} {:>16} {:>8}'.format('benchmark', 'result', 'previous', 'change'))
+        for k, v in self._results.items():
+            p = previous.get(k)
+            change = ''
+            if p:
+                c = (v - p) / p
+                change = '{:+.1%}'.format(c)
+                # all values are costs, so growing values are regressions
+                if c > tolerance_:
+                    change += ' REGRESSION'
+            print('{:<40} {:>16.6g} {:>16} {:>8}'.format(k, v, '{:.6g}'.format(p) if p else '-', change))
+        runs.append({'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'results': self._results})
+        directory = os.path.dirname(file_)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(file_, 'w') as f:
+            json.dump({'runs': runs}, f, indent=2)
+
+
+if __name__ == '__main__':
+    b = Benchmark()
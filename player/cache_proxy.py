@@ -0,0 +1,43 @@
+import os
+import time
+
+import click
+
+from api_access import api_user, api_pass, api_server
+from system.config import Config
+from system.layout import ScreenLayout
+from system.proxy import CachingProxy
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', help='Address the proxy listens on, 0.0.0.0 for other hosts')
+@click.option('--port', default=8800, help='Port of the proxy')
+@click.option('--cache-dir', default=Config.PROXY_CACHE_DIR, help='Directory of the cache on disk')
+@click.option('--prewarm/--no-prewarm', default=True, help='Request linked resources in advance')
+@click.option('--interval', default=600, help='Seconds between status lines and removal of expired responses')
+@click.option('--screens', default=None, help='JSON file with the screen layout of the players, for the previews')
+class CacheProxyService(object):
+    """
+    Runs a caching proxy of the Madek server, which players use with `main.py --proxy URL`.
+    """
+
+    def __init__(self, host, port, cache_dir, prewarm, interval, screens):
+        # the proxy prewarms the previews that the players choose for their screens
+        layout = ScreenLayout.load(os.path.join(os.path.dirname(__file__), screens) if screens else None)
+        Config().set_screen_sizes([(d.width, d.height) for d in layout.screens])
+        self._proxy = CachingProxy(api_server, (api_user, api_pass), host, port, directory_=cache_dir,
+                                   prewarm_=prewarm)
+        print('{} expired responses removed'.format(self._proxy.cache.prune()))
+        self._proxy.start()
+        print('Proxy of {} on {}'.format(api_server, self._proxy.url))
+        try:
+            while True:
+                time.sleep(interval)
+                self._proxy.cache.prune()
+                print(self._proxy)
+        except KeyboardInterrupt:
+            self._proxy.stop()
+
+
+if __name__ == '__main__':
+    s = CacheProxyService()
@@ -0,0 +1,177 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+import requests
+import simplejson as json
+import click
+
+from content.api import ApiClient
+from content.dispatcher import Dispatcher
+from content.rotation import Rotation
+from standin.archive import StandInArchive
+from standin.display import StandInMediaDisplay
+from standin.screen import StandInScreen
+from standin.server import StandInServer
+from system.clock import Clock
+from system.cluster import ClusterServer, ClusterFollower
+from system.config import Config
+from system.layout import ScreenLayout
+
+
+class DownloadingMediaDisplay(StandInMediaDisplay):
+    """
+    Stand-in display that downloads the file of its entry like a MediaDisplay and
+    records when it is shown.
+    """
+
+    # tuples of screen index, entry id and time of the leader
+    shown = []
+    # seconds to add to the local time to get the time of the leader
+    offset = 0
+
+    @staticmethod
+    def prepare(media_entry_):
+        if media_entry_.file_url:
+            requests.get('{}{}'.format(Config().server, media_entry_.file_url), auth=Config().api_auth)
+
+    def show(self):
+        DownloadingMediaDisplay.shown.append(
+            (self.screen.index, self.media_entry.id, time.time() + DownloadingMediaDisplay.offset))
+        super(DownloadingMediaDisplay, self).show()
+
+
+def run_node(leader_, server_, programs_, screens_, seconds_, delay_, results_):
+    """
+    Entry point of a node process, the leader if leader_ is None.
+    """
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    config = Config()
+    config.set_dev_mode(True)
+    config.set_api_auth(('', ''))
+    config.set_meta_data_white_list(Config.META_DATA_WHITE_LIST)
+    config.set_log_dir(tempfile.mkdtemp(prefix='cluster_'))
+    layout = ScreenLayout.load(screens_)
+    screens = [StandInScreen(d.index, d.width, d.height, d.info) for d in layout.screens]
+    cluster = follower = None
+    if leader_ is None:
+        cluster = ClusterServer(server_, ('', ''), host_='127.0.0.1').start()
+        results_.put(('url', cluster.url))
+        config.set_server(cluster.url)
+        api = ApiClient(cluster.url, '', '')
+        dispatcher = Dispatcher(screens, DownloadingMediaDisplay)
+        dispatcher.push_handlers(on_media=cluster.on_media)
+        rotation = Rotation(api, True, True)
+        rotation.load(programs_)
+
+        def on_clock(dt):
+            if dispatcher.entries_len == 0 and not api.session_active:
+                program = rotation.load_next(dispatcher.program)
+                if program.valid:
+                    dispatcher.set_program(program)
+                    dispatcher.start()
+        Clock().schedule_interval(on_clock, 1)
+    else:
+        config.set_server(leader_)
+        follower = ClusterFollower(leader_, screens, DownloadingMediaDisplay, delay_)
+        follower.start()
+
+        def on_clock(dt):
+            follower.on_clock(dt)
+            DownloadingMediaDisplay.offset = follower.offset - follower.delay
+        Clock().schedule_interval(on_clock, 0.5)
+
+    end = time.time() + seconds_
+    while time.time() < end:
+        Clock().tick()
+        time.sleep(0.01)
+    report = {'shown': DownloadingMediaDisplay.shown}
+    if cluster:
+        # the followers still need the timeline and the files of the last entries
+        time.sleep(delay_ + 2)
+        report['cache'] = dict(cluster.stats)
+    if follower:
+        report['stats'] = dict(follower.stats)
+        report['round_trip'] = follower.round_trip
+    results_.put(('report', leader_ is None, report))
+
+
+@click.command()
+@click.option('--programs', default='programs.json', help='JSON file with programs')
+@click.option('--screens', default=None, help='JSON file with the screen layout, by default three screens')
+@click.option('--followers', default=2, help='Number of follower processes')
+@click.option('--seconds', default=60.0, help='Seconds of playout')
+@click.option('--delay', default=ClusterFollower.DELAY, help='Seconds the followers play after the leader')
+@click.option('--entries', default=500, help='Number of media entries in the stand-in archive')
+@click.option('--report', default=None, help='JSON file for the report')
+class ClusterCheck(object):
+    """
+    Runs a leader and several followers as local processes against a stand-in of the Madek server
+    and compares what the followers show with the timeline of the leader.
+    Screens are stand-ins without windows, the media files are downloaded nevertheless.
+    """
+
+    def __init__(self, programs, screens, followers, seconds, delay, entries, report):
+        server = StandInServer(StandInArchive(1, entries)).start()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        programs = os.path.join(directory, programs)
+        screens = os.path.join(directory, screens) if screens else None
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [context.Process(target=run_node, daemon=True,
+                                     args=(None, server.url, programs, screens, seconds, delay, results))]
+        processes[0].start()
+        leader = results.get(timeout=30)[1]
+        for _ in range(followers):
+            p = context.Process(target=run_node, daemon=True,
+                                args=(leader, server.url, programs, screens, seconds, delay, results))
+            p.start()
+            processes.append(p)
+        reports = [results.get(timeout=seconds + delay + 60)[1:] for _ in processes]
+        for p in processes:
+            p.join(5)
+        server.stop()
+        self.report([r for is_leader, r in reports if is_leader][0], [r for is_leader, r in reports if not is_leader],
+                    server.request_counter, seconds, delay, report)
+
+    @staticmethod
+    def report(leader_, followers_, upstream_, seconds_, delay_, file_):
+        played = {(s, e): t for s, e, t in leader_['shown']}
+        # entries shown by the leader late enough for the followers to catch up
+        end = max(played.values()) - delay_ if played else 0
+        expected = [k for k, t in played.items() if t < end]
+        errors = []
+        covered = []
+        for f in followers_:
+            shown = {(s, e): t for s, e, t in f['shown']}
+            errors += [abs(t - played[k]) for k, t in shown.items() if k in played]
+            covered.append(sum(1 for k in expected if k in shown) / len(expected) if expected else 0)
+        errors.sort()
+        cache = leader_['cache']
+        r = OrderedDict()
+        r['seconds'] = seconds_
+        r['followers'] = len(followers_)
+        r['leader_shown'] = len(leader_['shown'])
+        r['follower_shown'] = [len(f['shown']) for f in followers_]
+        r['follower_coverage_min'] = round(min(covered), 3) if covered else None
+        r['sync_error_median'] = round(errors[len(errors) // 2], 4) if errors else None
+        r['sync_error_max'] = round(errors[-1], 4) if errors else None
+        r['follower_late'] = sum(f['stats'].get('late', 0) for f in followers_)
+        r['follower_failed'] = sum(f['stats'].get('failed', 0) for f in followers_)
+        r['round_trip_max'] = round(max(f['round_trip'] or 0 for f in followers_), 4) if followers_ else None
+        r['cache_requests'] = cache.get('hits', 0) + cache.get('misses', 0)
+        r['cache_hits'] = cache.get('hits', 0)
+        r['upstream_requests'] = upstream_
+        r['timeline_requests'] = cache.get('timeline', 0)
+        for k, v in r.items():
+            print('{:<28} {}'.format(k, v))
+        if file_:
+            with open(file_, 'w') as f:
+                json.dump(r, f, indent=2)
+
+
+if __name__ == '__main__':
+    c = ClusterCheck()
@@ -12,6 +12,7 @@ from uritemplate import expand
 
 from content.apidata import PeopleData, KeywordData, MetaDatum
 from content.collections import CollectionData
+from content.decoder import JsonDecoder
 from content.mediaentry import *
 
 PathIdType = collections.namedtuple('PathIdType', 'path, id, type')
@@ -65,11 +66,12 @@ class ApiClient(object):
                 # TODO: find actual id
         return path_.split('/').pop(), type_
 
-    def __init__(self, server_: str, user_: str, pass_: str):
+    def __init__(self, server_: str, user_: str, pass_: str, decoder_=None):
         """
         :param server_: URL of the server, like 'http://medienarchiv.zhdk.ch'
         :param user_: username of API-client
         :param pass_: password of API-client
+        :param decoder_: decoder of the responses, by default a JsonDecoder
         """
         super(ApiClient, self).__init__()
         self.__auth = aiohttp.BasicAuth(user_, pass_)
@@ -77,7 +79,12 @@ class ApiClient(object):
         self.__header = {
             'content-type': 'application/json-roa+json', 'accept': 'application/json-roa+json'}
         self.debug = False
-        self.__request_counter = 0
+        self.decoder = decoder_ if decoder_ else JsonDecoder()
+        # hits and misses of the people and keyword caches
+        self.cache_stats = collections.Counter()
+        # entries that were not complete at the deadline of their program
+        self.deadline_misses = 0
+        self._request_counter = 0
         self.__session = None
         self.__semaphore = asyncio.Semaphore(1000)
         self.__connector = None
@@ -92,7 +99,7 @@ class ApiClient(object):
         Initiates an asynchronous session.
         """
         self.__active = True
-        self.__request_counter = 0
+        self._request_counter = 0
         self.__loop = asyncio.get_event_loop()
         self.__connector = aiohttp.TCPConnector(loop=self.__loop, limit=20)
         if not self.__session or self.__session.closed:
@@ -105,7 +112,7 @@ class ApiClient(object):
         """
         Completes an asynchronous session.
         """
-        print('{} requests'.format(self.__request_counter))
+        print('{} requests'.format(self._request_counter))
         self.__active = False
         self.__session.close()
         self.__session = None
@@ -114,6 +121,13 @@ class ApiClient(object):
     def session_active(self):
         return self.__active
 
+    @property
+    def request_count(self):
+        """
+        Number of requests sent in the current or last session.
+        """
+        return self._request_counter
+
     async def send_request(self, path_,
                     retries=3,
                     interval=0.9,
@@ -135,7 +149,7 @@ class ApiClient(object):
             attempt = 1
         else:  # any other value means retry N times
             attempt = retries + 1
-        self.__request_counter += 1
+        self._request_counter += 1
         url = '{}{}'.format(self.__server, path_)
         if self.__session.closed and self.debug:
             print('Session closed!')
@@ -152,7 +166,7 @@ class ApiClient(object):
                     async with getattr(self.__session, 'get')(url) as response:
                         if response.status == 200:
                             try:
-                                data = await response.json()
+                                data = self.decoder.decode(await response.read())
                             except json.JSONDecodeError as exc:
                                 print('failed to decode response code:{} url:{} error:{} response:{}'.format(
                                     response.status, url, exc,
@@ -172,7 +186,7 @@ class ApiClient(object):
                                 code=response.status, message=response.reason)
                         else:
                             try:
-                                data = await response.json(encoding='utf-8')
+                                data = self.decoder.decode(await response.read())
                             except json.JSONDecodeError as exc:
                                 print('failed to decode response code:%s url:%s error:%s response:%s'.format(
                                     response.status, url,
@@ -185,6 +199,10 @@ class ApiClient(object):
                                 print(data['errors'][0]['detail'])
                                 raised_exc = None
                                 return data
+            except asyncio.CancelledError:
+                # requests of entries that missed their deadline or are not needed are cancelled, this
+                # must not reach the clause below, which names errors of older aiohttp versions
+                raise
             except (aiohttp.errors.ClientResponseError,
                     aiohttp.errors.ClientRequestError,
                     aiohttp.errors.ClientOSError,
@@ -245,9 +263,14 @@ class ApiClient(object):
 
         return c
 
-    async def get_media_entries(self, path_, limit_=None, meta_data_white_list_=None, preload_media_=False):
+    async def get_media_entries(self, path_, limit_=None, meta_data_white_list_=None, preload_media_=False,
+                                deadline_=None, on_entry_=None):
         """
         Requests media entries based on a complete api-path.
+        :param deadline_: loop time by which the entries have to be loaded, see asyncio.AbstractEventLoop.time,
+                          entries that are not complete by then are cancelled and counted in deadline_misses
+        :param on_entry_: function that is called with every entry as soon as it is loaded, the remaining
+                          entries are cancelled when it returns False
         """
         media_entries = []
         tasks = []
@@ -255,6 +278,7 @@ class ApiClient(object):
             limit = limit_
         else:
             limit = self.__max_media_entries
+        loop = asyncio.get_event_loop()
         ready = False
         while not ready:
             j = await self.send_request(path_)
@@ -271,14 +295,37 @@ class ApiClient(object):
                     ready = True
                     break
             # find next page
-            if not ready and 'next' in roa['collection']:
+            if not ready and 'next' in roa['collection'] and not (deadline_ and loop.time() >= deadline_):
                 path_ = roa['collection']['next']['href']
             else:
                 ready = True
 
-        for r in await asyncio.gather(*tasks):
-            if r:
-                media_entries.append(r)
+        done = set()
+        pending = set(tasks)
+        full = False
+        try:
+            while pending and not full:
+                timeout = None if deadline_ is None else max(0, deadline_ - loop.time())
+                finished, pending = await asyncio.wait(pending, timeout=timeout,
+                                                       return_when=asyncio.FIRST_COMPLETED)
+                if not finished:
+                    # stragglers would hold up the whole program
+                    self.deadline_misses += len(pending)
+                    break
+                done |= finished
+                if on_entry_:
+                    for t in sorted(finished, key=tasks.index):
+                        if not full and t.result():
+                            full = on_entry_(t.result()) is False
+        finally:
+            for t in pending:
+                t.cancel()
+            if pending:
+                # the cancelled requests end before the session is closed
+                await asyncio.wait(pending)
+        for t in tasks:
+            if t in done and t.result():
+                media_entries.append(t.result())
 
         return media_entries
 
@@ -293,7 +340,8 @@ class ApiClient(object):
                     p = expand(roa['relations']['meta-data']['href'], {'?meta_keys': ''})
                     meta_data = Config().meta_data_white_list
                     if meta_data_white_list_:
-                        meta_data = list(set(meta_data_white_list_) | set(Config.META_DATA_MINIMUM))
+                        # sorted for the same URL in every process, which makes responses cacheable
+                        meta_data = sorted(set(meta_data_white_list_) | set(Config.META_DATA_MINIMUM))
                     params = urllib.parse.urlencode({'meta_keys': meta_data})
                     p = p + '?' + params.replace('+','').replace('%27','%22')
                     await self.handle_meta_data(await self.send_request(p))
@@ -366,6 +414,7 @@ class ApiClient(object):
         cr = ApiClient.complete(path_, id_, 'person')
         # Persons are not updated if they were already requested
         p = PeopleData.find(cr.id)
+        self.cache_stats['person_hit' if p else 'person_miss'] += 1
         if not p:
             # TODO: Create instance before sending request and not on response.
             j = await self.send_request(cr.path)
@@ -380,6 +429,7 @@ class ApiClient(object):
         cr = ApiClient.complete(path_, id_, 'keyword')
         # Keywords are not updated if they were already requested
         k = KeywordData.find(cr.id)
+        self.cache_stats['keyword_hit' if k else 'keyword_miss'] += 1
         if not k:
             j = await self.send_request(cr.path)
             if j:
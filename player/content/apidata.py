@@ -1,3 +1,5 @@
+import re
+import sys
 import textwrap
 
 from system.config import Config
@@ -6,6 +8,13 @@ from system.config import Config
 class ApiData():
     instances = {}
 
+    # separators of the meta data shown on the info screen
+    INFO_SEPARATOR = ' | '
+    INFO_PARAGRAPH_SEPARATOR = ' ¶ '
+    # maximum length of a serialized meta datum
+    MAX_VALUE_LENGTH = 500
+    LINEBREAKS = re.compile('[\r\n]+')
+
     @classmethod
     def find(cls, id_:str):
         """
@@ -20,6 +29,8 @@ class ApiData():
     def __init__(self, id_:str):
         self.id = id_
         self.__meta_data = {}
+        # serialized meta data by keys and separators
+        self.__serialized = {}
 
     def set_meta_datum(self, meta_datum_):
         """
@@ -27,6 +38,7 @@ class ApiData():
         :param meta_datum_: meta datum
         """
         self.__meta_data[meta_datum_.meta_key_id] = meta_datum_
+        self.__serialized = {}
 
     def get_meta_datum(self, key_:str, enforce_string_:bool=True):
         """
@@ -40,23 +52,51 @@ class ApiData():
         return None
 
     def serialize_meta_data(self, keys_:list=None, separator_:str=' | ', paragraph_separator_:str=None):
-        values = []
+        """
+        Returns the values of the given meta keys as one string. The result is cached until
+        a meta datum of the entry changes.
+        """
         if not keys_:
             keys_ = Config().meta_data_white_list
-        for key in keys_:
-            value = self.get_meta_datum(key)
+        key = (tuple(keys_), separator_, paragraph_separator_)
+        revision = self.__revision()
+        cached = self.__serialized.get(key)
+        if cached and cached[0] == revision:
+            return cached[1]
+        values = []
+        for k in keys_:
+            value = self.get_meta_datum(k)
             if value:
                 if type(value) == str:
-                    # remove double linebreaks
-                    value = value.replace('\r', '\n')
-                    while value.find('\n\n') > -1:
-                        value = value.replace('\n\n', '\n')
-                    if paragraph_separator_:
-                        value = value.replace('\n', paragraph_separator_)
-                    # shorten text
-                    value = textwrap.shorten(value, 500, placeholder='...')
+                    value = ApiData.normalize_value(value, paragraph_separator_)
                 values.append(value)
-        return separator_.join(values)
+        s = separator_.join(values)
+        self.__serialized[key] = (revision, s)
+        return s
+
+    def __revision(self):
+        # values of people and keywords are added to meta data after they were created
+        return sum(m.revision for m in self.__meta_data.values())
+
+    @staticmethod
+    def normalize_value(value_:str, paragraph_separator_:str=None):
+        """
+        Removes empty lines and shortens the text in a single pass over the value.
+        """
+        value = ApiData.LINEBREAKS.sub('\n', value_)
+        if paragraph_separator_:
+            value = value.replace('\n', paragraph_separator_)
+        value = ' '.join(value.split())
+        if len(value) > ApiData.MAX_VALUE_LENGTH:
+            value = textwrap.shorten(value, ApiData.MAX_VALUE_LENGTH, placeholder='...')
+        return value
+
+    @staticmethod
+    def intern_value(value_):
+        """
+        Shares equal strings that occur in many instances, like types, sizes, dates and ids of media files.
+        """
+        return sys.intern(value_) if type(value_) is str else value_
 
     def __getattr__(self, name_:str):
         """
@@ -68,16 +108,16 @@ class ApiData():
         # This is needed to allow pickle support.
         if name_.startswith('__') and name_.endswith('__'):
             return super(ApiData, self).__getattr__(name_)
-        name_ = name_.replace('__',':')
         # For missing values do not return None but an empty string to allow sorting.
-        if self.get_meta_datum(name_):
-            return self.get_meta_datum(name_)
-        return ''
+        return self.get_meta_datum(name_.replace('__',':')) or ''
 
 
 class MetaDatum():
     instances = {}
 
+    # meta data, keywords and people are kept in instances for the whole run
+    __slots__ = ('id', 'meta_key_id', 'type', 'value', 'revision')
+
     @classmethod
     def find(cls, id_:str):
         """
@@ -105,9 +145,11 @@ class MetaDatum():
 
     def __init__(self, json_:dict):
         self.id = json_['id']
-        self.meta_key_id = json_.get('meta_key_id')
-        self.type = json_.get('type')
+        self.meta_key_id = ApiData.intern_value(json_.get('meta_key_id'))
+        self.type = ApiData.intern_value(json_.get('type'))
         self.value = None # can either be a string or a list with MetaDatum instances
+        # increased whenever a value is added
+        self.revision = 0
         if 'value' in json_ and type(json_['value']) is str:
             self.value = json_['value']
 
@@ -116,6 +158,7 @@ class MetaDatum():
             self.value = []
         if type(self.value) is list:
             self.value.append(value_)
+            self.revision += 1
 
     def get_value(self, serialized_:bool=True, delimiter_:str=', '):
         if serialized_ and type(self.value) is list:
@@ -129,6 +172,8 @@ class MetaDatum():
 
 class KeywordData(MetaDatum):
 
+    __slots__ = ('__value',)
+
     @classmethod
     def get_instance(cls, json_:dict):
         i = cls.find(json_['id'])
@@ -150,6 +195,8 @@ class KeywordData(MetaDatum):
 
 class PeopleData(MetaDatum):
 
+    __slots__ = ('first_name', 'last_name', 'pseudonym', 'date_of_birth', 'date_of_death')
+
     @classmethod
     def get_instance(cls, json_:dict):
         i = cls.find(json_['id'])
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+import simplejson as json
+
+
+class ProgramCatalog():
+    """
+    Statistics of the regular programs by name: how long loading took, how many requests it needed,
+    how many valid entries it delivered and how often it failed. The Rotation skips programs that are
+    chronically empty and the Schedule loads expensive programs earlier. The catalog is kept in a JSON
+    file across restarts.
+    """
+
+    # weight of the last load in the averages
+    WEIGHT = 0.3
+    # loads before a program is judged
+    MIN_LOADS = 2
+    # share of failed loads from which a program is skipped
+    MAX_FAILURE_RATE = 0.6
+    # skipped turns after which an empty program is tried again, the archive might have changed
+    RETRY_TURNS = 4
+    # seconds or requests from which a load is expensive
+    EXPENSIVE_SECONDS = 10
+    EXPENSIVE_REQUESTS = 400
+
+    def __init__(self, path_: str=None):
+        """
+        :param path_: JSON file for the catalog, None keeps it in memory only
+        """
+        self._path = path_
+        self._programs = {}
+        self._lock = threading.Lock()
+        # counts skipped and retried programs
+        self.skipped = 0
+        self.retried = 0
+        if path_ and os.path.exists(path_):
+            try:
+                with open(path_) as f:
+                    self._programs = json.load(f)['programs']
+            except (ValueError, KeyError):
+                print('Ignoring broken program catalog {}'.format(path_))
+
+    def get(self, program_):
+        """
+        :return: dict with loads, failures, seconds, requests, valid, loaded and skipped or None if never loaded
+        """
+        return self._programs.get(program_.name)
+
+    def failure_rate(self, program_):
+        p = self.get(program_)
+        if not p or not p['loads']:
+            return 0
+        return p['failures'] / p['loads']
+
+    def is_usable(self, program_):
+        """
+        False for programs that failed most of the times they were loaded. Every RETRY_TURNS
+        turns such a program is used anyway.
+        """
+        p = self.get(program_)
+        if not p or p['loads'] < ProgramCatalog.MIN_LOADS:
+            return True
+        if self.failure_rate(program_) < ProgramCatalog.MAX_FAILURE_RATE:
+            return True
+        with self._lock:
+            p['skipped'] = p.get('skipped', 0) + 1
+            if p['skipped'] > ProgramCatalog.RETRY_TURNS:
+                p['skipped'] = 0
+                self.retried += 1
+                return True
+            self.skipped += 1
+        return False
+
+    def is_expensive(self, program_):
+        """
+        True for programs that usually take long to load.
+        """
+        p = self.get(program_)
+        return p is not None and (p['seconds'] >= ProgramCatalog.EXPENSIVE_SECONDS or
+                                  p['requests'] >= ProgramCatalog.EXPENSIVE_REQUESTS)
+
+    def record(self, program_, seconds_: float, requests_: int):
+        """
+        Stores the cost and yield of a load of a program.
+        :param program_: loaded Program
+        :param seconds_: duration of the load
+        :param requests_: requests of the load
+        """
+        valid = len(program_.playlist) if program_.playlist else 0
+        with self._lock:
+            p = self._programs.get(program_.name)
+            if not p:
+                p = self._programs[program_.name] = {'loads': 0, 'failures': 0, 'seconds': seconds_,
+                                                      'requests': requests_, 'valid': valid}
+            w = ProgramCatalog.WEIGHT
+            p['loads'] += 1
+            p['failures'] += 0 if valid else 1
+            p['seconds'] = round((1 - w) * p['seconds'] + w * seconds_, 3)
+            p['requests'] = round((1 - w) * p['requests'] + w * requests_, 1)
+            p['valid'] = round((1 - w) * p['valid'] + w * valid, 1)
+            p['loaded'] = time.time()
+            p['skipped'] = 0
+        self.save()
+
+    def save(self):
+        if self._path:
+            with self._lock:
+                # written under another name first, so that a restart never reads a partial file
+                with open(self._path + '.tmp', 'w') as f:
+                    json.dump({'programs': self._programs}, f)
+                os.replace(self._path + '.tmp', self._path)
+
+    def __len__(self):
+        return len(self._programs)
+
+    def __str__(self):
+        return 'ProgramCatalog {} programs, {} skipped, {} retried'.format(len(self), self.skipped, self.retried)
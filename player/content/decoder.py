@@ -0,0 +1,26 @@
+import time
+from collections import Counter
+
+import simplejson as json
+
+
+class JsonDecoder():
+    """
+    Decodes the bodies of the responses of the Madek server into whole documents.
+    """
+
+    def __init__(self):
+        # counts decoded documents, bytes and seconds
+        self.stats = Counter()
+
+    def decode(self, body_: bytes):
+        """
+        :param body_: body of a response, JSON is always UTF-8
+        :raises json.JSONDecodeError: if the body is not JSON
+        """
+        start = time.perf_counter()
+        data = json.loads(body_.decode('utf-8'))
+        self.stats['documents'] += 1
+        self.stats['bytes'] += len(body_)
+        self.stats['seconds'] += time.perf_counter() - start
+        return data
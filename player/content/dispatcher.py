@@ -1,8 +1,10 @@
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
 from pyglet.event import EventDispatcher
 
+from content.mediaentry import MediaEntryData
 from display.mediadisplay import MediaDisplay
 from system.config import Config
 
@@ -12,25 +14,83 @@ class Dispatcher(EventDispatcher):
     This is where the entire logic/magic is happening ...
     """
 
-    def __init__(self, screens_):
+    def __init__(self, screens_, display_class_=MediaDisplay):
+        """
+        :param screens_: list of Screen instances
+        :param display_class_: class that turns a media entry into something shown on a screen
+        """
         EventDispatcher.__init__(self)
+        self._display_class = display_class_
+        self._info_screen = None
         self._screens = []
         for s in screens_:
             self._screens.append(s)
+        # the window holds at least one entry more than there are screens
+        self._lookahead = Lookahead(max(Lookahead.SIZE, len(self._screens) + 1))
         self._program = None
         self._config = Config()
 
     def set_program(self, program_):
+        if self._program:
+            self._program.remove_handlers(on_playlist_update=self.on_playlist_update)
         self._program = program_
+        if program_:
+            # the program might still be loading
+            program_.push_handlers(on_playlist_update=self.on_playlist_update)
 
     @property
     def program(self):
         return self._program
 
+    @property
+    def screens(self):
+        return self._screens
+
     @property
     def playlist(self):
         return self._program.playlist
 
+    @property
+    def info_screen(self):
+        return self._info_screen
+
+    @property
+    def upcoming(self):
+        """
+        Entries of the lookahead and the rest of the program in the order of the program.
+        """
+        entries = [t.entry for t in self._lookahead.entries]
+        if self._program:
+            entries += self._program.remaining
+        return entries
+
+    def resume(self, program_, shown_, info_index_=None):
+        """
+        Continues a program with the screen assignments of a PlayoutSnapshot.
+        :param program_: Program with the entries that were not shown yet
+        :param shown_: list of tuples with screen index and MediaEntryData shown on that screen
+        :param info_index_: index of the info screen or None
+        """
+        self.set_program(program_)
+        screens = dict((s.index, s) for s in self._screens)
+        info_screen = screens.get(info_index_)
+        if not shown_ or not info_screen or not info_screen.info_capable:
+            self.start()
+            return
+        self._info_screen = info_screen
+        for s in self._screens:
+            s.set_info_mode(s == self._info_screen)
+        for i, entry in shown_:
+            if i in screens and screens[i] is not self._info_screen:
+                self.play_media_on_screen(screens[i], entry)
+        self.fill_lookahead()
+        # screens without an entry in the snapshot continue as if they just became empty
+        for s in self.__find_empty_screens():
+            if len(self._lookahead):
+                t = self._lookahead.take(s.orientation)
+                self.play_media_on_screen(s, t.entry, t.index)
+        self._info_screen.update_info_layout()
+
     def update(self):
         # called by the playlist
         print('playlist update')
@@ -39,31 +99,38 @@ class Dispatcher(EventDispatcher):
     def start(self):
         # combine screens and content
         screens = self.__find_empty_screens(True)
+        self.fill_lookahead()
         content = []
-        # find enough content for all empty screens
-        while len(content) < len(screens)-1:
-            e, i = self._program.get_next(True)
-            # check whether program delivered an entry
-            if not e:
-                break
-            t = ScreenEntry(e, None, i)
-            content.append(t)
-        # find a screen for each content item with fitting orientation
-        for t in content:
-            for s in screens:
-                if t.entry and t.entry.orientation == s.orientation:
-                    t.screen = s
-                    screens.remove(s)
-                    break
-        # fill remaining screens with content
+        remaining = []
+        # find content with fitting orientation for as many screens as possible and keep one for the info
         for s in screens:
-            for t in content:
-                if not t.screen:
-                    t.screen = s
-                    screens.remove(s)
+            t = None
+            if len(content) < len(screens) - 1:
+                t = self._lookahead.take(s.orientation, True)
+            if t:
+                t.screen = s
+                content.append(t)
+            else:
+                remaining.append(s)
+        # make the first screen without fitting content the info screen, if it can show info
+        self._info_screen = next((s for s in remaining if s.info_capable), None)
+        if not self._info_screen:
+            # otherwise give the content of the last screen that can show info back
+            for t in reversed(content):
+                if t.screen.info_capable:
+                    content.remove(t)
+                    self._lookahead.give_back(t)
+                    self._info_screen = t.screen
                     break
-        # make remaining screen the info screen
-        self._info_screen = screens[0]
+        if self._info_screen in remaining:
+            remaining.remove(self._info_screen)
+        # fill remaining screens with the closest orientation
+        for s in remaining:
+            t = self._lookahead.take(s.orientation)
+            if not t:
+                break
+            t.screen = s
+            content.append(t)
         for s in self._screens:
             s.set_info_mode(s==self._info_screen)
         # play content
@@ -72,29 +139,40 @@ class Dispatcher(EventDispatcher):
         if self._info_screen:
             self._info_screen.update_info_layout()
 
-    def play_media(self, media_entry_, index_=None):
+    def play_next(self, screen_):
         """"
-        Finds a screen for the next media entry - optionally with swapping places with the info screen.
+        Finds the next media entry for a screen that became empty - optionally with swapping places
+        with the info screen if that fits the orientation of the next entry better.
         """
-        # find an empty screen
-        available_screen = None
-        for s in self._screens:
-            if s.is_empty:
-                available_screen = s
-                break
-        if available_screen:
+        self.fill_lookahead()
+        if not len(self._lookahead):
+            # TODO: do something useful ... or do I handle this elsewhere
+            print('no entry')
+            return
+        screen = screen_
+        overdue = self._lookahead.overdue
+        t = None
+        if overdue is None or overdue == screen.orientation:
+            t = self._lookahead.take(screen.orientation, True)
+        if not t and self._info_screen and self._info_screen is not screen and screen.info_capable:
             # swap with info screen?
-            if self._info_screen:
-                    if abs(available_screen.orientation - media_entry_.orientation) \
-                            > abs(self._info_screen.orientation - media_entry_.orientation):
-                        self._info_screen.set_info_mode(False)
-                        self._info_screen, available_screen = available_screen, self._info_screen
-                        self._info_screen.set_info_mode(True)
-            self.play_media_on_screen(available_screen, media_entry_, index_)
-            if self._info_screen:
-                self._info_screen.update_info_layout()
-        else:
-            print('No empty screen!')
+            orientation = self._info_screen.orientation
+            if overdue is None or overdue == orientation:
+                t = self._lookahead.take(orientation, True)
+            if t:
+                self._info_screen.set_info_mode(False)
+                self._info_screen, screen = screen, self._info_screen
+                self._info_screen.set_info_mode(True)
+        if not t:
+            # an overdue entry is played in any case, otherwise the closest orientation
+            t = self._lookahead.take(screen.orientation if overdue is None else overdue)
+        self.play_media_on_screen(screen, t.entry, t.index)
+        if self._info_screen:
+            self._info_screen.update_info_layout()
+
+    def fill_lookahead(self):
+        for t in self._lookahead.fill(self._program):
+            self._display_class.prepare(t.entry)
 
     def play_media_on_screen(self, screen_, media_entry_, index_=None):
         """
@@ -106,10 +184,11 @@ class Dispatcher(EventDispatcher):
         :return: None
         """
         print('play_media_on_screen {} - {} - {} sec.'.format(screen_, media_entry_, media_entry_.duration))
-        media_display_ = MediaDisplay(media_entry_, screen_, self._program, index_)
+        media_display_ = self._display_class(media_entry_, screen_, self._program, index_)
         media_display_.push_handlers(on_end=self.on_screen_ready)
         screen_.set_media(media_display_)
         self.log_media(media_entry_)
+        self.dispatch_event('on_media', screen_, media_entry_, index_, self._info_screen, self._program)
 
     def on_screen_ready(self, media_display_, screen_):
         """
@@ -121,12 +200,20 @@ class Dispatcher(EventDispatcher):
         # print('on_screen_ready %s' % screen_.index)
         screen_.clear_media()
         # Pull next entry.
-        entry, index = self._program.get_next(True)
-        if entry:
-            self.play_media(entry, index)
-        else:
-            # TODO: do something useful ... or do I handle this elsewhere
-            print('no entry')
+        self.play_next(screen_)
+
+    def on_playlist_update(self, program_):
+        """
+        Triggered whenever an entry arrives while the program is loading.
+        Screens that ran out of entries in the meantime play it right away.
+        :param program_: Program the entry was added to
+        """
+        if program_ is not self._program:
+            return
+        for s in self.__find_empty_screens():
+            if not self.entries_len:
+                break
+            self.play_next(s)
 
     def __find_empty_screens(self, include_info_: object = False) -> object:
         e = []
@@ -139,17 +226,104 @@ class Dispatcher(EventDispatcher):
     @property
     def entries_len(self):
         if self._program:
-            return self._program.length
-        return 0
+            return self._program.length + len(self._lookahead)
+        return len(self._lookahead)
 
     def log_media(self, media_entry_):
         with open(str(Path(self._config.log_dir,'last_media_entry.txt')), 'w') as f:
             f.write('{} {}\n'.format(datetime.now().strftime('%H:%M:%S'),media_entry_.uuid))
 
+Dispatcher.register_event_type('on_media')
+
 
 class ScreenEntry():
 
+    __slots__ = ('entry', 'screen', 'index', 'turn')
+
     def __init__(self, entry_, screen_=None, index_=None):
         self.entry = entry_
         self.screen = screen_
-        self.index = index_
\ No newline at end of file
+        self.index = index_
+        self.turn = 0
+
+
+class Lookahead():
+    """
+    Small window of upcoming entries of a program, indexed by orientation so that
+    a screen gets an entry with its own orientation in constant time.
+    """
+
+    ORIENTATIONS = (MediaEntryData.LANDSCAPE, MediaEntryData.SQUARE, MediaEntryData.PORTRAIT)
+    SIZE = 4
+
+    def __init__(self, size_: int=SIZE):
+        """
+        :param size_: number of entries in the window, also the number of turns an entry waits at most
+        """
+        self._size = size_
+        self._entries = dict((o, deque()) for o in Lookahead.ORIENTATIONS)
+        # orientations ordered by their distance to each orientation
+        self._closest = dict((o, sorted(Lookahead.ORIENTATIONS, key=lambda c: abs(c - o)))
+                             for o in Lookahead.ORIENTATIONS)
+        self._length = 0
+        self._turn = 0
+
+    def fill(self, program_):
+        """
+        Pulls entries from the program until the window is full.
+        :return: list of the new ScreenEntry instances
+        """
+        added = []
+        while program_ and self._length < self._size:
+            e, i = program_.get_next(True)
+            if not e:
+                break
+            t = ScreenEntry(e, None, i)
+            t.turn = self._turn
+            self._entries[e.orientation].append(t)
+            self._length += 1
+            added.append(t)
+        return added
+
+    def take(self, orientation_, exact_=False):
+        """
+        Returns the oldest entry with the given orientation or with the closest one.
+        :param orientation_: MediaEntryData.LANDSCAPE, MediaEntryData.SQUARE, MediaEntryData.PORTRAIT
+        :param exact_: only return entries with the given orientation
+        :return: ScreenEntry or None
+        """
+        for o in self._closest[orientation_]:
+            if self._entries[o]:
+                self._length -= 1
+                self._turn += 1
+                return self._entries[o].popleft()
+            if exact_:
+                break
+        return None
+
+    def give_back(self, screen_entry_):
+        """
+        Puts an entry that was taken but not played back to the front of the window.
+        """
+        self._entries[screen_entry_.entry.orientation].appendleft(screen_entry_)
+        self._length += 1
+
+    @property
+    def overdue(self):
+        """
+        Orientation of an entry that has waited for more turns than the window size, otherwise None.
+        """
+        for o, entries in self._entries.items():
+            if entries and self._turn - entries[0].turn > self._size:
+                return o
+        return None
+
+    @property
+    def entries(self):
+        """
+        ScreenEntry instances of the window in the order of the program.
+        """
+        return sorted((t for entries in self._entries.values() for t in entries), key=lambda t: t.index or 0)
+
+    def __len__(self):
+        return self._length
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import threading
+import time
+
+import simplejson as json
+
+from content.program import FollowupProgram
+
+
+class HookIndex():
+    """
+    Cache of how many media entries the keywords and people used as followup hooks deliver.
+    Hooks are probed with a single listing request and updated with the actual number of valid entries
+    whenever a followup program was loaded. The index is kept in a JSON file across restarts.
+    """
+
+    # share of listed entries that are images or videos as long as nothing was measured
+    DEFAULT_VALID_RATIO = 0.8
+
+    def __init__(self, path_: str=None, minimum_: int=4, max_age_: float=24 * 3600):
+        """
+        :param path_: JSON file for the index, None keeps it in memory only
+        :param minimum_: number of valid entries a hook needs to be used
+        :param max_age_: seconds after which a hook is probed again
+        """
+        self._path = path_
+        self._minimum = minimum_
+        self._max_age = max_age_
+        self._hooks = {}
+        self._lock = threading.Lock()
+        if path_ and os.path.exists(path_):
+            try:
+                with open(path_) as f:
+                    self._hooks = json.load(f)['hooks']
+            except (ValueError, KeyError):
+                print('Ignoring broken hook index {}'.format(path_))
+
+    def is_fresh(self, hook_):
+        h = self._hooks.get(hook_.id)
+        return h is not None and time.time() - h['checked'] < self._max_age
+
+    def is_usable(self, hook_):
+        """
+        True if the hook is known to deliver enough image and video entries.
+        :param hook_: KeywordData or PeopleData
+        """
+        return self.is_fresh(hook_) and self.estimate(hook_) >= self._minimum
+
+    def estimate(self, hook_):
+        """
+        Expected number of valid entries, either measured or estimated from the listed entries.
+        """
+        h = self._hooks.get(hook_.id)
+        if not h:
+            return 0
+        if h.get('valid') is not None:
+            return h['valid']
+        return h['listed'] * self.valid_ratio
+
+    @property
+    def valid_ratio(self):
+        listed = 0
+        valid = 0
+        for h in self._hooks.values():
+            if h.get('valid') is not None and h['listed']:
+                listed += h['listed']
+                valid += min(h['valid'], h['listed'])
+        return valid / listed if listed else HookIndex.DEFAULT_VALID_RATIO
+
+    async def update(self, api_, entry_):
+        """
+        Probes all hooks of an entry that are unknown or outdated. Requires an active session of the api.
+        :param api_: ApiClient
+        :param entry_: MediaEntryData, usually the last entry of a program
+        """
+        hooks = [h for h in FollowupProgram.find_hooks(entry_) if not self.is_fresh(h)]
+        if hooks:
+            await asyncio.gather(*[self.probe(api_, h) for h in hooks])
+            self.save()
+
+    async def probe(self, api_, hook_):
+        params = FollowupProgram.get_params(hook_)
+        if not params:
+            return
+        j = await api_.send_request(params.url)
+        listed = 0
+        if j and '_json-roa' in j:
+            for i in j['_json-roa']['collection']['relations'].values():
+                if i['name'] == 'Media-Entry':
+                    listed += 1
+        with self._lock:
+            self._hooks[hook_.id] = {'listed': listed, 'valid': None, 'checked': time.time()}
+
+    def record(self, hook_, valid_: int):
+        """
+        Stores the number of valid entries a followup program with this hook actually delivered.
+        """
+        with self._lock:
+            h = self._hooks.setdefault(hook_.id, {'listed': valid_})
+            h['valid'] = valid_
+            h['checked'] = time.time()
+        self.save()
+
+    def save(self):
+        if self._path:
+            with self._lock:
+                # written under another name first, so that a restart never reads a partial file
+                with open(self._path + '.tmp', 'w') as f:
+                    json.dump({'hooks': self._hooks}, f)
+                os.replace(self._path + '.tmp', self._path)
@@ -1,12 +1,13 @@
 import os
 import random
+import threading
 from tempfile import NamedTemporaryFile
 
 import pyglet
-import requests
 
 from content.apidata import ApiData
 from system.config import Config
+from system.download import DownloadManager
 
 
 class MediaEntryData(ApiData):
@@ -21,6 +22,10 @@ class MediaEntryData(ApiData):
     SQUARE = 0
     PORTRAIT = 1
 
+    # range of seconds an entry is shown
+    DURATION = (60, 120)
+    DEV_DURATION = (3, 5)
+
     @classmethod
     def get_instance(cls, id_: str, json_: dict=None):
         i = cls.find(id_)
@@ -31,6 +36,17 @@ class MediaEntryData(ApiData):
             i.parse_data(json_)
         return i
 
+    @classmethod
+    def duration_range(cls):
+        return cls.DEV_DURATION if Config().dev_mode else cls.DURATION
+
+    @classmethod
+    def expected_duration(cls):
+        """
+        Mean duration of entries whose actual duration is not known yet.
+        """
+        return sum(cls.duration_range()) / 2
+
     @classmethod
     def get_orientation(cls, width_: int, height_: int):
         if width_ > height_:
@@ -49,10 +65,7 @@ class MediaEntryData(ApiData):
         self.file = None
         self.image = None
         self.video = None
-        if Config().dev_mode:
-            self.duration = random.randint(3, 5)
-        else:
-            self.duration = random.randint(60, 120)
+        self.duration = random.randint(*MediaEntryData.duration_range())
 
     def set_file_data(self, file_data_):
         self.file_data = file_data_
@@ -126,40 +139,70 @@ class MediaFile(pyglet.event.EventDispatcher):
     __SUFFIXES = {MediaEntryData.IMAGE: '.jpg', MediaEntryData.VIDEO: '.mp4',
                   MediaEntryData.AUDIO: '.mp3', MediaEntryData.DOCUMENT: '.jpg'}
 
-    def __init__(self, entry_: MediaEntryData):
+    def __init__(self, entry_: MediaEntryData, path_: str=None):
+        """
+        :param path_: local copy of the file, which is used instead of downloading it
+        """
         super(MediaFile, self).__init__()
         self.__entry = entry_
+        self.__local_path = path_
         self.__temp_file = None
+        # whether the temporary file is complete
+        self.__downloaded = False
         self.__image_source = None
         self.__video_source = None
+        # files are also cached in the background, e.g. by the UploadScheduler
+        self.__lock = threading.Lock()
         self.__entry.set_file(self)
 
-    def cache(self):
+    def cache(self, priority_=None, slot_=None, load_=True):
+        """
+        Downloads the file unless it is cached already. This blocks until it is cached.
+        :param priority_: DownloadManager.FOREGROUND, the default, or DownloadManager.BACKGROUND
+        :param slot_: seconds until the file is shown, by default DownloadManager.SLOT for foreground downloads
+        :param load_: load the image or video as well, otherwise only path is set, e.g. for another process
+        """
+        if priority_ != DownloadManager.BACKGROUND and self.__lock.locked():
+            # the prefetcher might be downloading the file at the background rate, it continues in the foreground
+            DownloadManager().promote(self.url, slot_)
+        with self.__lock:
+            # another thread might have cached the file while waiting
+            if self.source or (self.cached and not load_):
+                return
+            if self.cached or self.__download(priority_, slot_):
+                if load_:
+                    self.__load(self.path)
+                self.dispatch_event('on_cached', self)
+
+    def __download(self, priority_, slot_):
         if self.__temp_file:
             self.__temp_file.close()
         self.__temp_file = NamedTemporaryFile(suffix=self.__suffix, delete=False)
-        response = None
-        attempts = 0
-        while not response or response.status_code != 200 and attempts < 3:
-            response = requests.get('{}{}'.format(
-                Config().server, self.__entry.file_url), auth=Config().api_auth)
-            if response.status_code == 200:
-                self.__temp_file.write(response.content)
-                if self.__entry.is_image:
-                    self.__image_source = pyglet.image.load(self.__temp_file.name)
-                elif self.__entry.is_video:
-                    self.__video_source = pyglet.media.load(self.__temp_file.name)
-                self.dispatch_event('on_cached', self)
-                return None
-            else:
-                print('Problem caching {}'.format(self.__entry.file_url))
-                attempts += 1
+        if slot_ is None and priority_ != DownloadManager.BACKGROUND:
+            slot_ = DownloadManager.SLOT
+        for attempt in range(3):
+            if DownloadManager().fetch(self.url, self.__temp_file, priority_, slot_):
+                self.__downloaded = True
+                return True
+            print('Problem caching {}'.format(self.__entry.file_url))
         print('Failed to cache file! {}'.format(self.__entry))
+        return False
+
+    def __load(self, path_):
+        if self.__entry.is_image:
+            self.__image_source = pyglet.image.load(path_)
+        elif self.__entry.is_video:
+            self.__video_source = pyglet.media.load(path_)
+
+    @property
+    def url(self):
+        return '{}{}'.format(Config().server, self.__entry.file_url)
 
     def delete(self):
         if self.__temp_file:
             self.__temp_file.close()
             self.__temp_file = None
+        self.__downloaded = False
         self.__image_source = None
         self.__video_source = None
 
@@ -187,6 +230,18 @@ class MediaFile(pyglet.event.EventDispatcher):
             return self.__image_source.get_texture()
         return None
 
+    @property
+    def cached(self):
+        # whether path is complete, the file might not be loaded
+        return bool(self.__local_path) or self.__downloaded
+
+    @property
+    def path(self):
+        # location of the cached file
+        if self.__temp_file:
+            return self.__temp_file.name
+        return self.__local_path
+
     @property
     def source(self):
         if self.__image_source:
@@ -206,8 +261,22 @@ MediaFile.register_event_type('on_cached')
 
 
 class MediaFileData():
+
+    # there is one instance per entry and it is kept as long as the entry
+    __slots__ = ('id', 'filename', 'media_entry_id', 'size', 'media_type', 'content_type', 'data_stream', 'previews',
+                 '__index')
+
+    # preview used without screen sizes, and the one sizes are compared with
+    DEFAULT_THUMBNAIL = 'x_large'
+    # previews may be scaled up this much to fill a screen
+    MAX_UPSCALE = 1.5
+    # estimated size of a JPEG preview
+    BYTES_PER_PIXEL = 0.25
+    # difference of the aspect ratios of the previews of a file up to which their sizes are trusted
+    ASPECT_TOLERANCE = 0.02
+
     def __init__(self, server_: str, json_: dict):
-        self.id = json_['id']
+        self.id = ApiData.intern_value(json_['id'])
         self.filename = json_['filename']
         self.media_entry_id = json_['media_entry_id']
         self.size = json_['size']
@@ -218,23 +287,79 @@ class MediaFileData():
         self.data_stream = '{}{}'.format(server_, json_[
             '_json-roa']['relations']['data-stream']['href'])
         self.previews = []
+        self.__index = None
 
     def add_preview(self, preview_):
         # TODO: Remove once the API delivers this for MediaFile.
         if self.media_type is None or self.media_type is MediaEntryData.IMAGE:
             self.media_type = preview_.media_type
         self.previews.append(preview_)
+        self.__index = None
 
-    def get_preview(self, size_: str="x_large"):
-        # maximum, x_large, large, medium, small_125, small
-        # look for videos first
-        for i in self.previews:
-            if i.content_type == 'video/mp4':
-                return i
-        for i in self.previews:
-            if i.thumbnail == size_:
-                return i
-        return None
+    @property
+    def index(self):
+        """
+        List with the video preview or None, the image previews with a size sorted by pixels,
+        and the screen sizes and preview of the last choice. The image previews are left out unless
+        their sizes agree on the aspect ratio, otherwise they are not the real sizes of the previews.
+        """
+        if self.__index is None:
+            video = next((p for p in self.previews if p.content_type == 'video/mp4'), None)
+            images = sorted((p for p in self.previews if p.content_type != 'video/mp4' and p.width and p.height),
+                            key=lambda p: p.width * p.height)
+            aspects = [p.width / p.height for p in images]
+            if aspects and max(aspects) - min(aspects) > MediaFileData.ASPECT_TOLERANCE * max(aspects):
+                images = []
+            self.__index = [video, images, None, None]
+        return self.__index
+
+    def get_preview(self, size_: str=None):
+        """
+        Returns the video preview or the smallest image preview that fills the screens of its orientation
+        without scaling it up more than MAX_UPSCALE. Without screen sizes the x_large preview is used.
+        :param size_: thumbnail, e.g. 'x_large', that is used instead: maximum, x_large, large, medium, small_125, small
+        :rtype: PreviewData or None
+        """
+        index = self.index
+        video, images, sizes, preview = index
+        if video:
+            return video
+        if size_:
+            return next((p for p in self.previews if p.thumbnail == size_), None)
+        screens = Config().screen_sizes
+        if sizes is screens:
+            return preview
+        preview = self.get_preview(MediaFileData.DEFAULT_THUMBNAIL)
+        if screens and images:
+            orientation = MediaEntryData.get_orientation(images[-1].width, images[-1].height)
+            targets = [s for s in screens if MediaEntryData.get_orientation(*s) == orientation] or screens
+            preview = next((p for p in images if MediaFileData.get_upscale(p, targets) <= MediaFileData.MAX_UPSCALE),
+                           images[-1])
+        index[2:] = [screens, preview]
+        return preview
+
+    @property
+    def bytes_saved(self):
+        """
+        Estimated bytes the chosen preview saves compared with the x_large preview, negative if it is larger.
+        """
+        if self.index[0]:
+            return 0
+        return (MediaFileData.estimate_bytes(self.get_preview(MediaFileData.DEFAULT_THUMBNAIL)) -
+                MediaFileData.estimate_bytes(self.get_preview()))
+
+    @staticmethod
+    def get_upscale(preview_, screens_):
+        """
+        :return: highest factor a preview is scaled by to fit one of the screens
+        """
+        return max(min(w / preview_.width, h / preview_.height) for w, h in screens_)
+
+    @staticmethod
+    def estimate_bytes(preview_):
+        if not preview_ or not preview_.width or not preview_.height:
+            return 0
+        return int(preview_.width * preview_.height * MediaFileData.BYTES_PER_PIXEL)
 
     def guess_media_type(self):
         # This is just an ugly way to determine the media type as the API doesn't tell.
@@ -260,18 +385,25 @@ class MediaFileData():
 
 
 class PreviewData():
+
+    # there are several instances per entry, one for each size of the image
+    __slots__ = ('id', 'media_type', 'content_type', 'filename', 'thumbnail', 'width', 'height', 'created_at',
+                 'updated_at', 'media_file_id', 'data_stream')
+
     def __init__(self, server_, json_):
         self.id = json_['id']
-        self.media_type = json_['media_type']
-        self.content_type = json_['content_type']
+        self.media_type = ApiData.intern_value(json_['media_type'])
+        self.content_type = ApiData.intern_value(json_['content_type'])
         self.filename = json_['filename']
-        self.thumbnail = json_['thumbnail']
-        # Only to be used carefully because the API doesn't provide real sizes.
+        self.thumbnail = ApiData.intern_value(json_['thumbnail'])
+        # Only to be used carefully because the API doesn't provide real sizes,
+        # MediaFileData.get_preview checks that the previews of a file agree on the aspect ratio.
         self.width = json_['width']
         self.height = json_['height']
-        self.created_at = json_['created_at']
-        self.updated_at = json_['updated_at']
-        self.media_file_id = json_['media_file_id']
+        # previews of a file are usually created at the same time
+        self.created_at = ApiData.intern_value(json_['created_at'])
+        self.updated_at = ApiData.intern_value(json_['updated_at'])
+        self.media_file_id = ApiData.intern_value(json_['media_file_id'])
         self.data_stream = '{}'.format(json_[
             '_json-roa']['relations']['data-stream']['href'])
 
@@ -0,0 +1,154 @@
+import os
+import shutil
+
+import simplejson as json
+
+from content.apidata import MetaDatum
+from content.mediaentry import MediaEntryData, MediaFile, MediaFileData, PreviewData
+from content.program import Program
+from system.config import Config
+
+
+class PlaylistCache():
+    """
+    Keeps the images and meta data of the entries shown last on disk, so that a restarted player
+    can show them right away while the first program is loading.
+    """
+
+    # number of entries kept
+    SIZE = 12
+    FILE = 'playlist.json'
+
+    def __init__(self, directory_: str, size_: int=SIZE):
+        """
+        :param directory_: directory for the playlist and the images
+        :param size_: number of entries kept, the oldest ones are deleted
+        """
+        self._directory = directory_
+        self._size = size_
+        self._entries = []
+        # files of entries that only the PlayoutSnapshot refers to
+        self._kept = []
+        if not os.path.exists(directory_):
+            os.makedirs(directory_)
+        try:
+            with open(os.path.join(directory_, PlaylistCache.FILE)) as f:
+                j = json.load(f)
+                self._entries = j['entries']
+                self._kept = j.get('kept', [])
+        except (OSError, ValueError, KeyError):
+            self._entries = []
+
+    def on_media(self, screen_, media_entry_, index_, info_screen_, program_):
+        """
+        Handler for the on_media event of the Dispatcher.
+        """
+        if not media_entry_.is_image or not media_entry_.file or not media_entry_.file.path or not program_:
+            return
+        if any(e['id'] == media_entry_.id for e in self._entries):
+            return
+        name = PlaylistCache.get_file_name(media_entry_)
+        try:
+            shutil.copyfile(media_entry_.file.path, os.path.join(self._directory, name))
+        except OSError as exc:
+            print('Caching {} for the start failed: {}'.format(media_entry_, exc))
+            return
+        self._entries.append(PlaylistCache.dump_entry(media_entry_, program_, name))
+        while len(self._entries) > self._size:
+            old = self._entries.pop(0)
+            if old['file'] not in self._kept and os.path.exists(os.path.join(self._directory, old['file'])):
+                os.remove(os.path.join(self._directory, old['file']))
+        self.save()
+
+    def keep(self, media_entries_):
+        """
+        Copies the cached files of the entries of a PlayoutSnapshot, so that a restarted player does not
+        download them again. Files that were kept for the previous snapshot only are deleted.
+        :param media_entries_: list of MediaEntryData, entries whose files are not cached are left out
+        :return: dict with the file names by entry id
+        """
+        files = {}
+        for m in media_entries_:
+            name = PlaylistCache.get_file_name(m)
+            path = os.path.join(self._directory, name)
+            if not os.path.exists(path):
+                if not m.file or not m.file.path:
+                    continue
+                try:
+                    shutil.copyfile(m.file.path, path)
+                except OSError as exc:
+                    print('Keeping {} for the snapshot failed: {}'.format(m, exc))
+                    continue
+            files[m.id] = name
+        cached = set(e['file'] for e in self._entries)
+        for name in set(self._kept) - set(files.values()) - cached:
+            if os.path.exists(os.path.join(self._directory, name)):
+                os.remove(os.path.join(self._directory, name))
+        self._kept = list(files.values())
+        self.save()
+        return files
+
+    def save(self):
+        path = os.path.join(self._directory, PlaylistCache.FILE)
+        # written under another name first, so that a restart never reads a partial file
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'entries': self._entries, 'kept': self._kept}, f)
+        os.replace(path + '.tmp', path)
+
+    def load(self):
+        """
+        Creates a program with the cached entries whose images still exist.
+        :rtype: Program or None if nothing is cached
+        """
+        entries = [e for e in self._entries if os.path.exists(os.path.join(self._directory, e['file']))]
+        if not entries:
+            return None
+        program = Program(None, {'name': entries[-1]['program'], 'parameters': {},
+                                 'meta_data': entries[-1]['meta_data']})
+        program.set_playlist([self.load_entry(e) for e in entries])
+        return program
+
+    @staticmethod
+    def get_file_name(media_entry_):
+        return '{}{}'.format(media_entry_.id, '.mp4' if media_entry_.is_video else '.jpg')
+
+    @staticmethod
+    def dump_entry(media_entry_, program_, file_=None):
+        """
+        :return: dict with the data of an entry that load_entry needs
+        """
+        f = media_entry_.file_data
+        p = f.get_preview()
+        keys = list(program_.meta_data_white_list or []) + Config.META_DATA_MINIMUM
+        return {
+            'id': media_entry_.id, 'file': file_, 'program': program_.name,
+            'meta_data': program_.meta_data_white_list,
+            'values': {k: media_entry_.get_meta_datum(k) for k in keys if media_entry_.get_meta_datum(k)},
+            'media_file': {'id': f.id, 'filename': f.filename, 'media_entry_id': f.media_entry_id, 'size': f.size,
+                           '_json-roa': {'relations': {'data-stream': {'href': f.data_stream}}}},
+            'preview': {'id': p.id, 'media_type': p.media_type, 'content_type': p.content_type,
+                        'filename': p.filename, 'thumbnail': p.thumbnail, 'width': p.width, 'height': p.height,
+                        'created_at': p.created_at, 'updated_at': p.updated_at, 'media_file_id': p.media_file_id,
+                        '_json-roa': {'relations': {'data-stream': {'href': p.data_stream}}}}}
+
+    def load_entry(self, json_):
+        """
+        Creates an entry as dumped by dump_entry without requests, the image is used if it is cached.
+        :rtype: MediaEntryData
+        """
+        m = MediaEntryData.get_instance(json_['id'])
+        m.uuid = json_['id']
+        if not m.file_data:
+            # the data stream of the media file is stored with the server already
+            m.set_file_data(MediaFileData('', json_['media_file']))
+            m.file_data.add_preview(PreviewData('', json_['preview']))
+        for k, v in json_['values'].items():
+            if not m.get_meta_datum(k):
+                m.set_meta_datum(MetaDatum({'id': '{}:{}'.format(m.id, k), 'meta_key_id': k, 'value': v}))
+        path = os.path.join(self._directory, json_['file']) if json_.get('file') else None
+        if not m.file and path and os.path.exists(path):
+            MediaFile(m, path)
+        return m
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+from content.api import ApiClient
+from content.mediaentry import MediaFile
+from content.schedule import Slot
+from system.config import Config
+from system.download import DownloadManager
+
+
+class Prefetcher(threading.Thread):
+    """
+    Loads the programs of upcoming slots of a Schedule in the background
+    and caches the media files of their first entries.
+    """
+
+    def __init__(self, schedule_, lead_: float=1800, media_entries_: int=3, interval_: float=5):
+        """
+        :param schedule_: Schedule
+        :param lead_: seconds before their planned start when programs are loaded
+        :param media_entries_: number of entries per program whose media files are cached
+        :param interval_: seconds between checks of the schedule
+        """
+        super(Prefetcher, self).__init__(daemon=True)
+        self._schedule = schedule_
+        self._lead = lead_
+        self._media_entries = media_entries_
+        self._interval = interval_
+        self._stopped = threading.Event()
+        self._api = None
+
+    def run(self):
+        # the thread needs its own event loop and session
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self._api = ApiClient(Config().server, *Config().api_auth)
+        while not self._stopped.wait(self._interval):
+            slot = self._schedule.next_to_prefetch(self._lead)
+            if slot:
+                self.prefetch(slot)
+
+    def prefetch(self, slot_):
+        print('prefetch {}'.format(slot_.name))
+        try:
+            self._schedule.load(slot_, self._api)
+            for m in slot_.program.playlist[:self._media_entries]:
+                if not m.file:
+                    MediaFile(m).cache(DownloadManager.BACKGROUND)
+        except Exception as exc:
+            print('Prefetching {} failed: {}'.format(slot_.name, exc))
+            if slot_.state == Slot.LOADING:
+                # the slot is loaded on demand once it is due
+                slot_.set_state(Slot.PLANNED)
+                slot_.ready.set()
+
+    def stop(self):
+        self._stopped.set()
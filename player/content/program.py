@@ -3,23 +3,31 @@ from random import shuffle
 from pyglet.event import EventDispatcher
 
 from content.api import MediaEntryParams
+from content.mediaentry import MediaEntryData
 from system.config import Config
-from content.apidata import KeywordData, PeopleData
+from content.apidata import ApiData, KeywordData, PeopleData
 
 
 class Program(EventDispatcher):
 
+    # default number of entries
+    LIMIT = 20
+
     def __init__(self, api_, json_=None):
         EventDispatcher.__init__(self)
         self._api = api_
         self._meta_data_white_list = Config().meta_data_white_list
-        self._limit = 20
+        self._limit = Program.LIMIT
         if json_:
             self.parse_json(json_)
         self._limit_selection = self._limit
         self._start_url = None
         self._playlist = None
         self.__index = None
+        # estimated bytes the previews chosen for the screens save compared with x_large previews
+        self.preview_bytes_saved = 0
+        # entries of the last load that were not complete at the deadline
+        self.deadline_misses = 0
 
     def parse_json(self, json_):
         self._name = json_['name']
@@ -32,22 +40,59 @@ class Program(EventDispatcher):
     def set_limit(self, limit_=0):
         self._limit = limit_
 
-    async def load(self, preload_media_=False):
+    async def load(self, preload_media_=False, api_=None, deadline_=None, stream_=False):
+        """
+        Requests the entries of the program.
+        :param preload_media_: cache the media files as well
+        :param api_: ApiClient to use instead of the one of the program, e.g. for loading in another thread
+        :param deadline_: loop time by which the program has to be loaded, entries that are not complete
+                          by then are left out
+        :param stream_: append the entries to the playlist as soon as they are loaded, in the order they arrive,
+                        so that the program can be played while it is loading
+        """
         print(self.start_url)
+        api = api_ if api_ else self._api
         limit = max(self._limit, self._limit_selection)
         self.__index = None
         self._playlist = []
-        playlist = []
-        for m in await self._api.get_media_entries(self.start_url, limit, self._meta_data_white_list, preload_media_):
+        misses = api.deadline_misses
+        entries = await api.get_media_entries(self.start_url, limit, self._meta_data_white_list, preload_media_,
+                                              deadline_, self.append if stream_ else None)
+        if not stream_:
             # only use images and videos
-            if m.is_image or m.is_video:
-                playlist.append(m)
-        if self._limit_selection > self._limit:
-            shuffle(playlist)
-        if self._limit > 0:
-            self._playlist = playlist[:self._limit]
-        else:
-            self._playlist = playlist[:]
+            playlist = [m for m in entries if m.is_image or m.is_video]
+            if self._limit_selection > self._limit:
+                shuffle(playlist)
+            for m in playlist[:self._limit] if self._limit > 0 else playlist:
+                self.append(m)
+        self.deadline_misses = api.deadline_misses - misses
+        if self.deadline_misses:
+            print('{} entries of {} missed the deadline'.format(self.deadline_misses, self.name))
+        self.preview_bytes_saved = sum(m.file_data.bytes_saved for m in self._playlist if m.file_data)
+        if self._playlist:
+            print('Previews of {} save {:.1f} MB'.format(self.name, self.preview_bytes_saved / 1024 / 1024))
+
+    def append(self, media_entry_):
+        """
+        Adds a loaded entry to the playlist unless it is not an image or video or the playlist is full.
+        :return: False once the playlist is full
+        """
+        full = 0 < self._limit <= len(self._playlist)
+        if not full and (media_entry_.is_image or media_entry_.is_video):
+            # serialize the meta data for the info screen while loading instead of while playing
+            media_entry_.serialize_meta_data(self.meta_data_white_list, ApiData.INFO_SEPARATOR,
+                                             ApiData.INFO_PARAGRAPH_SEPARATOR)
+            self._playlist.append(media_entry_)
+            self.dispatch_event('on_playlist_update', self)
+            full = 0 < self._limit <= len(self._playlist)
+        return not full
+
+    def set_playlist(self, playlist_):
+        """
+        Sets entries that are already loaded, e.g. from the PlaylistCache or a PlayoutSnapshot.
+        """
+        self._playlist = playlist_
+        self.__index = None
 
     def sort(self):
         pass
@@ -76,6 +121,15 @@ class Program(EventDispatcher):
     def playlist(self):
         return self._playlist
 
+    @property
+    def remaining(self):
+        """
+        Entries that were not taken with get_next yet.
+        """
+        if not self._playlist:
+            return []
+        return self._playlist[self.__index or 0:]
+
     @property
     def length(self):
         if self.__index is None:
@@ -88,6 +142,20 @@ class Program(EventDispatcher):
     def valid(self):
         return self.length > 0
 
+    @property
+    def duration(self):
+        """
+        Expected seconds to show all entries one after another,
+        an estimate based on the limit as long as the program is not loaded.
+        """
+        if self._playlist:
+            return sum(m.duration for m in self._playlist)
+        return (self._limit or Program.LIMIT) * MediaEntryData.expected_duration()
+
+    @property
+    def parameters(self):
+        return self._params.data if self._params else {}
+
     @property
     def meta_data_white_list(self):
         return self._meta_data_white_list
@@ -111,31 +179,61 @@ class Program(EventDispatcher):
 
 class FollowupProgram(Program):
 
+    # meta keys whose keywords and people are used as hooks
+    HOOK_KEYS = ['madek_core:keywords', 'madek_core:authors', 'zhdk_bereich:project_type',
+                 'media_content:portrayed_object_materials', 'media_content:type']
+
+    @staticmethod
+    def find_hooks(entry_):
+        """
+        Returns the keywords and people of an entry that can be used as filter for a followup program.
+        :param entry_: MediaEntryData
+        :return: list with KeywordData and PeopleData
+        """
+        hooks = []
+        for key in FollowupProgram.HOOK_KEYS:
+            values = entry_.get_meta_datum(key, False)
+            if type(values) is list:
+                hooks += [v for v in values if v]
+        return hooks
+
+    @staticmethod
+    def get_params(hook_):
+        """
+        Returns the parameters that filter media entries by a hook.
+        :param hook_: KeywordData or PeopleData
+        :return: MediaEntryParams
+        """
+        if type(hook_) is KeywordData:
+            return MediaEntryParams({"filter_by": {"meta_data": [{"key": hook_.meta_key_id, "value": hook_.id}]}})
+        elif type(hook_) is PeopleData:
+            # TODO: Maybe make do author selection?
+            return MediaEntryParams({"filter_by": {"meta_data": [{"key": "any", "value": hook_.id, "type": "MetaDatum::People"}]}})
+        return None
+
     def __init__(self, api_):
         super(FollowupProgram, self).__init__(api_)
+        self._hook = None
 
-    def set_reference(self, reference_program_):
+    @property
+    def hook(self):
+        return self._hook
+
+    def set_reference(self, reference_program_, hook_index_=None):
+        """
+        Defines the program based on a hook of the last entry of the reference program.
+        :param reference_program_: loaded Program
+        :param hook_index_: optional HookIndex, only hooks known to deliver enough entries are used then
+        :return: True if a hook was found
+        """
         print('set_reference {}'.format(reference_program_))
         # define start path based of reference program
         last_entry = reference_program_.playlist[-1]
         print('last_entry {}'.format(last_entry))
-        hooks = []
-        keywords = last_entry.get_meta_datum('madek_core:keywords', False)
-        if type(keywords)is list:
-            hooks += keywords
-        authors = last_entry.get_meta_datum('madek_core:authors', False)
-        if type(authors) is list:
-            hooks += authors
-        project_type = last_entry.get_meta_datum('zhdk_bereich:project_type', False)
-        if type(project_type) is list:
-            hooks += project_type
-        material = last_entry.get_meta_datum('media_content:portrayed_object_materials', False)
-        if type(material) is list:
-            hooks += material
-        types = last_entry.get_meta_datum('media_content:type', False)
-        if type(types) is list:
-            hooks += types
+        hooks = FollowupProgram.find_hooks(last_entry)
         shuffle(hooks)
+        if hook_index_ is not None:
+            hooks = [h for h in hooks if hook_index_.is_usable(h)]
         print('hooks {}'.format(hooks))
         # handle case that there are no keywords
         hook = hooks[0] if len(hooks)>0 else None
@@ -156,11 +254,13 @@ class FollowupProgram(Program):
                 else:
                     self._name = str(hook)
                     print('---- unrecognized meta_key_id {} ----'.format(hook.meta_key_id))
-                self._params = MediaEntryParams({"filter_by": {"meta_data": [{"key": hook.meta_key_id, "value": hook.id}]}})
             elif type(hook) is PeopleData:
-                # TODO: Maybe make do author selection?
                 self._name = 'Person {}'.format(hook)
-                self._params = MediaEntryParams({"filter_by": {"meta_data": [{"key": "any", "value": hook.id, "type": "MetaDatum::People"}]}})
+            self._params = FollowupProgram.get_params(hook)
+            self._hook = hook
             return True
         else:
             return False
+
+
+Program.register_event_type('on_playlist_update')
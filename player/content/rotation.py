@@ -0,0 +1,334 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from random import shuffle, randint
+
+import simplejson as json
+
+from content.program import Program, FollowupProgram
+
+
+class Rotation():
+    """
+    Decides which program is played next and loads it.
+    """
+
+    # seconds between checks of the programs file
+    RELOAD_INTERVAL = 10
+    # seconds a program may take to load, the entries that are not complete by then are left out
+    LOAD_SECONDS = 30
+    # seconds between checks whether a program that is loading has enough entries to start
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, api_, randomize_=True, followups_=True, hook_index_=None, catalog_=None):
+        """
+        :param api_: ApiClient
+        :param randomize_: shuffle the order of the programs
+        :param followups_: try a followup program after each regular program
+        :param hook_index_: optional HookIndex that restricts followups to hooks known to deliver entries
+        :param catalog_: optional ProgramCatalog that skips programs which are chronically empty
+        """
+        self._api = api_
+        self._hook_index = hook_index_
+        self._catalog = catalog_
+        self._randomize = randomize_
+        self._followups = followups_
+        self._programs = []
+        self._program_index = -1
+        # definitions of the programs as read from the file, to find the ones that changed
+        self._definitions = {}
+        self._path = None
+        self._mtime = None
+        # the programs are reloaded in the main thread while the prefetcher advances the rotation
+        self._lock = threading.RLock()
+        # counts loads, invalid loads, followups, skipped programs, deadline misses and reloads of the programs file
+        self.stats = Counter()
+
+    def load(self, path_):
+        """
+        Reads the programs from a JSON file.
+        :param path_: absolute path of the programs file
+        :raises ValueError: if the file is not a valid programs file
+        """
+        self._path = path_
+        self._mtime = os.path.getmtime(path_)
+        for d in Rotation.read(path_):
+            self.add(d)
+        print('{} programs'.format(len(self._programs)))
+        if self._randomize:
+            shuffle(self._programs)
+        self._program_index = -1
+
+    def add(self, definition_):
+        program = Program(self._api, definition_)
+        self._programs.append(program)
+        self._definitions[program] = json.dumps(definition_, sort_keys=True)
+        return program
+
+    def reload(self):
+        """
+        Merges the programs file into the rotation if it changed since it was read. Programs whose definition
+        did not change are kept with their loaded entries and their position, new and changed programs are
+        played after the current position. A broken file is rejected and the rotation stays as it is.
+        :return: True if the programs changed
+        """
+        try:
+            mtime = os.path.getmtime(self._path)
+        except (OSError, TypeError):
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            definitions = Rotation.read(self._path)
+        except (OSError, ValueError) as exc:
+            print('Rejected changes of {}: {}'.format(self._path, exc))
+            self.stats['rejected_reloads'] += 1
+            return False
+        with self._lock:
+            kept = {}
+            for p in self._programs:
+                kept.setdefault(self._definitions[p], []).append(p)
+            unchanged = set()
+            added = []
+            for d in definitions:
+                same = kept.get(json.dumps(d, sort_keys=True))
+                if same:
+                    unchanged.add(same.pop(0))
+                else:
+                    added.append(d)
+            # the position counts the programs that were already played and are kept
+            index = len([p for p in self._programs[:self._program_index + 1] if p in unchanged]) - 1
+            removed = len(self._programs) - len(unchanged)
+            self._programs = [p for p in self._programs if p in unchanged]
+            self._definitions = dict((p, self._definitions[p]) for p in self._programs)
+            self._program_index = index
+            for d in added:
+                program = self.add(d)
+                if self._randomize:
+                    self._programs.insert(randint(index + 1, len(self._programs) - 1), self._programs.pop())
+            self.stats['reloads'] += 1
+            print('Reloaded {}: {} programs, {} added, {} removed'.format(self._path, len(self._programs), len(added),
+                                                                         removed))
+        return bool(added or removed)
+
+    @staticmethod
+    def read(path_):
+        """
+        Reads and validates the definitions of a programs file.
+        :return: list of dicts
+        :raises ValueError: if the file is not valid JSON or a program is not valid
+        """
+        with open(path_) as f:
+            j = json.load(f)
+        definitions = j.get('programs') if isinstance(j, dict) else None
+        if not isinstance(definitions, list) or not definitions:
+            raise ValueError('no programs')
+        names = set()
+        for d in definitions:
+            if not isinstance(d, dict) or not d.get('name'):
+                raise ValueError('program without name')
+            if d['name'] in names:
+                raise ValueError('program {} is defined twice'.format(d['name']))
+            names.add(d['name'])
+            if not isinstance(d.get('parameters'), dict):
+                raise ValueError('program {} has no parameters'.format(d['name']))
+            try:
+                program = Program(None, d)
+            except (TypeError, ValueError, AttributeError) as exc:
+                raise ValueError('program {} is not valid: {}'.format(d['name'], exc))
+            if not program.start_url:
+                raise ValueError('program {} selects no entries'.format(d['name']))
+        return definitions
+
+    @property
+    def programs(self):
+        return self._programs
+
+    @property
+    def followups(self):
+        return self._followups
+
+    @property
+    def catalog(self):
+        return self._catalog
+
+    @property
+    def state(self):
+        """
+        Order of the programs and position in it, e.g. for a PlayoutSnapshot.
+        """
+        with self._lock:
+            return {'programs': [p.name for p in self._programs], 'index': self._program_index}
+
+    def restore(self, state_):
+        """
+        Restores the order and position of the programs if the programs did not change.
+        :param state_: dict as returned by state
+        :return: True if restored
+        """
+        names = state_.get('programs', [])
+        if sorted(names) != sorted(p.name for p in self._programs):
+            return False
+        programs = {}
+        for p in self._programs:
+            programs.setdefault(p.name, []).append(p)
+        self._programs = [programs[n].pop(0) for n in names]
+        self._program_index = state_.get('index', -1)
+        return True
+
+    def find(self, name_):
+        """
+        :return: regular Program with the given name or None
+        """
+        return next((p for p in self._programs if p.name == name_), None)
+
+    def next_program(self, last_program_=None):
+        """
+        Returns either a followup program for the last program or the next regular program.
+        :param last_program_: Program that was played last
+        :return: Program
+        """
+        return self.next_followup(last_program_) or self.next_regular()
+
+    def next_followup(self, last_program_):
+        """
+        Returns a followup program based on the last program or None.
+        :param last_program_: loaded Program that was played last
+        :return: FollowupProgram
+        """
+        # Decide whether to try a followup program
+        if self._followups and last_program_ and type(last_program_) is not FollowupProgram:
+            program = FollowupProgram(self._api)
+            if program.set_reference(last_program_, self._hook_index):
+                print('***** load_program followup {} *****'.format(program.name))
+                self.stats['followups'] += 1
+                return program
+        return None
+
+    def next_regular(self):
+        """
+        Returns the next program of the programs file that the catalog does not skip.
+        :return: Program
+        """
+        with self._lock:
+            program = self.advance()
+            for i in range(len(self._programs)):
+                if self._catalog is None or self._catalog.is_usable(program):
+                    break
+                print('***** skip program {} *****'.format(program.name))
+                self.stats['skipped'] += 1
+                program = self.advance()
+            return program
+
+    def advance(self):
+        """
+        Returns the next program of the programs file and reshuffles them from time to time.
+        :return: Program
+        """
+        with self._lock:
+            self._program_index = (self._program_index + 1) % len(self._programs)
+            # shuffle programs?
+            middle_index = int(0.5*len(self._programs))
+            one_third_index = int(0.3*len(self._programs))
+            if self._program_index == 0:
+                # shuffle last two third whenever program loop starts again
+                a = self._programs[:one_third_index]
+                b = self._programs[one_third_index:]
+                shuffle(b)
+                self._programs = a + b
+            elif self._program_index == middle_index + 1:
+                # shuffle first half whenever program loop has reached second half
+                a = self._programs[:middle_index]
+                b = self._programs[middle_index:]
+                shuffle(a)
+                self._programs = a + b
+            return self._programs[self._program_index]
+
+    def load_next(self, last_program_=None):
+        """
+        Loads programs until a valid one is found. This blocks until the program is loaded.
+        :param last_program_: Program that was played last
+        :return: Program
+        """
+        program = None
+        while not program or not program.valid:
+            program = self.next_program(last_program_)
+            print('***** load_program {} *****'.format(program.name))
+            self.load_program(program)
+        return program
+
+    async def start_next(self, last_program_, entries_, api_=None):
+        """
+        Loads programs until a valid one is found and returns as soon as it has enough entries to start playing,
+        without blocking the event loop. Requires an active session of the api.
+        :param last_program_: Program that was played last
+        :param entries_: number of entries needed to start, e.g. one for every content screen
+        :return: Program and the asyncio.Task that loads the rest of it or None if it is loaded completely
+        """
+        program = None
+        loading = None
+        while not program or not program.valid:
+            program = self.next_program(last_program_)
+            print('***** load_program {} *****'.format(program.name))
+            loading = await self.start_program(program, entries_, api_)
+        return program, loading
+
+    async def start_program(self, program_, entries_, api_=None):
+        """
+        Loads a program and returns as soon as it has enough entries to start playing, the other entries are
+        appended to its playlist as they arrive. Requires an active session of the api.
+        :param program_: Program
+        :param entries_: number of entries needed to start
+        :param api_: ApiClient to use instead of the one of the rotation
+        :return: asyncio.Task that loads the rest of the program or None if it is loaded completely
+        """
+        loading = asyncio.ensure_future(self.fetch_program(program_, api_, True))
+        while not loading.done() and program_.length < max(1, entries_):
+            await asyncio.sleep(Rotation.POLL_INTERVAL)
+        if loading.done():
+            # raises the error of the load, if any
+            loading.result()
+            return None
+        return loading
+
+    def load_program(self, program_, api_=None):
+        """
+        Loads a program and probes the followup hooks of its last entry. This blocks until it is done.
+        :param program_: Program
+        :param api_: ApiClient to use instead of the one of the rotation, e.g. for loading in another thread
+        """
+        api = api_ if api_ else self._api
+        loop = api.start_session()
+        try:
+            loop.run_until_complete(self.fetch_program(program_, api))
+        finally:
+            api.complete_session()
+
+    async def fetch_program(self, program_, api_=None, stream_=False):
+        """
+        Loads a program and probes the followup hooks of its last entry. Requires an active session of the api.
+        :param program_: Program
+        :param api_: ApiClient to use instead of the one of the rotation
+        :param stream_: append the entries to the playlist of the program as they arrive, see Program.load
+        """
+        api = api_ if api_ else self._api
+        start = time.perf_counter()
+        await program_.load(False, api, asyncio.get_event_loop().time() + Rotation.LOAD_SECONDS, stream_)
+        self.stats['deadline_misses'] += program_.deadline_misses
+        if self._catalog is not None and type(program_) is not FollowupProgram:
+            self._catalog.record(program_, time.perf_counter() - start, api.request_count)
+        if self._hook_index is not None and self._followups and program_.playlist:
+            if type(program_) is FollowupProgram:
+                self._hook_index.record(program_.hook, len(program_.playlist))
+            else:
+                await self._hook_index.update(api, program_.playlist[-1])
+        self.stats['loads'] += 1
+        if not program_.valid:
+            self.stats['invalid_loads'] += 1
+            if type(program_) is FollowupProgram:
+                self.stats['invalid_followups'] += 1
+                if self._hook_index is not None:
+                    self._hook_index.record(program_.hook, 0)
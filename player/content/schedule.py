@@ -0,0 +1,283 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import simplejson as json
+
+from system.clock import Clock
+
+
+class Slot():
+    """
+    A program at a planned time of the schedule.
+    """
+
+    PLANNED = 'planned'
+    LOADING = 'loading'
+    LOADED = 'loaded'
+    SKIPPED = 'skipped'
+
+    def __init__(self, program_=None, reference_=None):
+        """
+        :param program_: Program, None for followup slots that are not resolved yet
+        :param reference_: Slot whose program a followup refers to
+        """
+        self.program = program_
+        self.reference = reference_
+        self.start = None
+        self.state = Slot.PLANNED
+        self.ready = threading.Event()
+
+    @property
+    def is_followup(self):
+        return self.reference is not None
+
+    @property
+    def name(self):
+        if self.program:
+            return self.program.name
+        return 'followup of {}'.format(self.reference.name)
+
+    def duration(self, content_screens_: int):
+        """
+        Expected seconds the slot takes with the given number of screens showing content.
+        """
+        if self.state == Slot.SKIPPED:
+            return 0
+        if self.program:
+            return self.program.duration / content_screens_
+        # a followup is expected to be as long as the program it refers to
+        return self.reference.duration(content_screens_)
+
+    def set_state(self, state_):
+        self.state = state_
+        if state_ in (Slot.LOADED, Slot.SKIPPED):
+            self.ready.set()
+
+    def __str__(self):
+        return 'Slot {} {}'.format(self.name, self.state)
+
+
+class Schedule():
+    """
+    Rolling schedule that plans the programs of the rotation some hours ahead,
+    including slots for followup programs. The schedule can be inspected in the log directory
+    and is used by the Prefetcher to load upcoming programs in time.
+    """
+
+    # factor of the lead time for expensive programs
+    EXPENSIVE_LEAD = 2
+    # seconds between checks whether the prefetcher loaded a slot
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, rotation_, api_, hours_: float=3, content_screens_: int=2):
+        """
+        :param rotation_: Rotation that defines the order of the programs
+        :param api_: ApiClient for programs that have to be loaded on demand
+        :param hours_: length of the schedule
+        :param content_screens_: number of screens that show content at the same time
+        """
+        self._rotation = rotation_
+        self._api = api_
+        self._hours = hours_
+        self._content_screens = content_screens_
+        self._slots = []
+        self._current = None
+        self._current_end = Clock().time()
+        self._lock = threading.RLock()
+        self.extend()
+
+    @property
+    def slots(self):
+        with self._lock:
+            return self._slots[:]
+
+    @property
+    def current(self):
+        return self._current
+
+    def extend(self):
+        """
+        Adds slots until the schedule covers the defined hours and updates the planned start times.
+        """
+        with self._lock:
+            horizon = Clock().time() + self._hours * 3600
+            self.retime()
+            while not self._slots or self._slots[-1].start < horizon:
+                last = self._slots[-1] if self._slots else self._current
+                if self._rotation.followups and last and not last.is_followup:
+                    slot = Slot(None, last)
+                else:
+                    slot = Slot(self._rotation.next_regular())
+                self._slots.append(slot)
+                self.retime()
+
+    def replan(self):
+        """
+        Skips the slots of programs that are no longer in the rotation, e.g. after the programs file changed,
+        and extends the schedule with the programs of the rotation.
+        """
+        with self._lock:
+            programs = self._rotation.programs
+            for s in self._slots:
+                if s.program and not s.is_followup and s.program not in programs and s.state != Slot.LOADING:
+                    s.set_state(Slot.SKIPPED)
+            self.extend()
+
+    def retime(self):
+        with self._lock:
+            start = max(self._current_end, Clock().time())
+            for s in self._slots:
+                s.start = start
+                start += s.duration(self._content_screens)
+
+    def resolve(self, slot_):
+        """
+        Creates the program of a followup slot once the program it refers to is loaded.
+        :return: True if the slot has a program
+        """
+        with self._lock:
+            if slot_.program or slot_.state == Slot.SKIPPED:
+                return slot_.program is not None
+            reference = slot_.reference
+            if reference.state in (Slot.PLANNED, Slot.LOADING):
+                return False
+            if reference.state == Slot.SKIPPED or not reference.program.playlist:
+                slot_.set_state(Slot.SKIPPED)
+                return False
+            program = self._rotation.next_followup(reference.program)
+            if program:
+                slot_.program = program
+                return True
+            slot_.set_state(Slot.SKIPPED)
+            return False
+
+    def next_to_prefetch(self, lead_: float):
+        """
+        Returns the first slot within the lead time that is not loaded yet and marks it as loading.
+        :param lead_: seconds ahead, programs that the catalog of the rotation knows to be expensive
+                      are loaded earlier
+        :return: Slot or None
+        """
+        with self._lock:
+            now = Clock().time()
+            busy = [self._current.program] if self._current else []
+            for s in self._slots:
+                if s.start > now + lead_ * Schedule.EXPENSIVE_LEAD:
+                    break
+                due = s.start <= now + lead_ or self.is_expensive(s)
+                if due and s.state == Slot.PLANNED and self.resolve(s) and s.program not in busy:
+                    s.set_state(Slot.LOADING)
+                    return s
+                if s.program:
+                    # the same program must not be loaded twice at the same time
+                    busy.append(s.program)
+        return None
+
+    def is_expensive(self, slot_):
+        catalog = self._rotation.catalog
+        return catalog is not None and slot_.program is not None and catalog.is_expensive(slot_.program)
+
+    def next_program(self):
+        """
+        Takes the next slot from the schedule and returns its program as soon as it is loaded.
+        Programs that are not prefetched are loaded on demand, which blocks.
+        :return: valid Program
+        """
+        program = None
+        while not program:
+            slot = self.take()
+            if slot.state == Slot.LOADING:
+                # wait for the prefetcher
+                slot.ready.wait()
+            if slot.state == Slot.PLANNED and self.resolve(slot):
+                self.load(slot)
+            program = self.accept(slot)
+        return program
+
+    async def start_next_program(self, entries_, api_=None):
+        """
+        Like next_program, but waits for the prefetcher without blocking the event loop. Programs that are not
+        prefetched are loaded on demand and returned as soon as they have enough entries to start playing.
+        Requires an active session of the api.
+        :param entries_: number of entries needed to start, e.g. one for every content screen
+        :param api_: ApiClient to use instead of the one of the schedule
+        :return: valid Program and the asyncio.Task that loads the rest of it or None if it is loaded completely
+        """
+        program = None
+        loading = None
+        while not program:
+            slot = self.take()
+            while slot.state == Slot.LOADING and not slot.ready.is_set():
+                await asyncio.sleep(Schedule.POLL_INTERVAL)
+            loading = None
+            if slot.state == Slot.PLANNED and self.resolve(slot):
+                print('***** load_program {} *****'.format(slot.name))
+                slot.set_state(Slot.LOADING)
+                loading = await self._rotation.start_program(slot.program, entries_, api_ if api_ else self._api)
+                if not loading:
+                    slot.set_state(Slot.LOADED)
+            program = self.accept(slot, loading is not None)
+        if loading:
+            loading = asyncio.ensure_future(self.complete(slot, loading))
+        return program, loading
+
+    async def complete(self, slot_, loading_):
+        """
+        Waits for the rest of a program that is played while it is loading and moves the end of the slot.
+        """
+        before = slot_.duration(self._content_screens)
+        try:
+            await loading_
+        finally:
+            slot_.set_state(Slot.LOADED)
+            with self._lock:
+                if self._current is slot_:
+                    self._current_end += slot_.duration(self._content_screens) - before
+            self.extend()
+
+    def take(self):
+        with self._lock:
+            if not self._slots:
+                self.extend()
+            return self._slots.pop(0)
+
+    def accept(self, slot_, loading_=False):
+        """
+        Makes a taken slot the current one if its program is loaded and valid.
+        :param loading_: the program is still loading and is accepted with the entries it has so far
+        :return: Program or None if the slot is skipped
+        """
+        if slot_.state != (Slot.LOADING if loading_ else Slot.LOADED) or not slot_.program.valid:
+            slot_.set_state(Slot.SKIPPED)
+            return None
+        with self._lock:
+            self._current = slot_
+            self._current_end = Clock().time() + slot_.duration(self._content_screens)
+        self.extend()
+        return slot_.program
+
+    def load(self, slot_, api_=None):
+        """
+        Loads the program of a slot. This blocks until it is loaded.
+        :param api_: ApiClient to use instead of the one of the schedule, e.g. for loading in another thread
+        """
+        print('***** load_program {} *****'.format(slot_.name))
+        self._rotation.load_program(slot_.program, api_ if api_ else self._api)
+        slot_.set_state(Slot.LOADED)
+
+    def dump(self, path_):
+        """
+        Writes the schedule as JSON for inspection.
+        """
+        now = Clock().time()
+        slots = []
+        for s in self.slots:
+            slots.append({'start': (datetime.now() + timedelta(seconds=s.start - now)).strftime('%H:%M:%S'),
+                          'minutes': round(s.duration(self._content_screens) / 60, 1),
+                          'program': s.name, 'followup': s.is_followup, 'state': s.state})
+        with open(path_, 'w') as f:
+            json.dump({'current': self._current.name if self._current else None, 'slots': slots}, f, indent=2)
+
+    def __str__(self):
+        return '\n'.join(str(s) for s in self.slots)
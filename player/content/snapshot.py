@@ -0,0 +1,82 @@
+import os
+import time
+
+import simplejson as json
+
+from content.playlist import PlaylistCache
+from content.program import Program, FollowupProgram
+
+
+class PlayoutSnapshot():
+    """
+    Compact state of the playout, saved at intervals and on shutdown: the current program with the ids
+    of its remaining entries, the entries on the screens, the info screen and the order of the rotation.
+    A restarted player resumes from it with the data of the entries in the snapshot and the files kept
+    by the PlaylistCache, without requests to the Madek server. Only the files of entries that were not
+    cached yet when the snapshot was saved are downloaded.
+    """
+
+    # seconds between snapshots
+    INTERVAL = 60
+    # older snapshots are not restored, the archive might have changed meanwhile
+    MAX_AGE = 6 * 3600
+
+    def __init__(self, path_: str, playlist_cache_: PlaylistCache):
+        """
+        :param path_: JSON file of the snapshot
+        :param playlist_cache_: PlaylistCache that creates the entries and provides their images
+        """
+        self._path = path_
+        self._playlist_cache = playlist_cache_
+
+    def save(self, dispatcher_, rotation_):
+        """
+        :return: True if there was a program to save
+        """
+        program = dispatcher_.program
+        if not program or not program.playlist:
+            return False
+        shown = [(s.index, s.media.media_entry) for s in dispatcher_.screens if s.media]
+        upcoming = dispatcher_.upcoming
+        media_entries = [m for m in [m for i, m in shown] + upcoming if m.file_data and m.file_data.get_preview()]
+        files = self._playlist_cache.keep(media_entries)
+        entries = {}
+        for m in media_entries:
+            if m.id not in entries:
+                entries[m.id] = PlaylistCache.dump_entry(m, program, files.get(m.id))
+        j = {'time': time.time(),
+             'program': {'name': program.name, 'parameters': program.parameters,
+                         'meta_data': program.meta_data_white_list, 'followup': type(program) is FollowupProgram},
+             'shown': [[i, m.id] for i, m in shown if m.id in entries],
+             'upcoming': [m.id for m in upcoming if m.id in entries],
+             'info': dispatcher_.info_screen.index if dispatcher_.info_screen else None,
+             'rotation': rotation_.state,
+             'entries': list(entries.values())}
+        # written under another name first, so that a restart never reads a partial file
+        with open(self._path + '.tmp', 'w') as f:
+            json.dump(j, f)
+        os.replace(self._path + '.tmp', self._path)
+        return True
+
+    def restore(self, rotation_):
+        """
+        Restores the order of the rotation and creates the program of the snapshot.
+        :return: tuple of Program with the entries that were not shown yet, list of tuples with screen index
+                 and entry shown on it and index of the info screen, or None without a recent snapshot
+        """
+        try:
+            with open(self._path) as f:
+                j = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - j.get('time', 0) > PlayoutSnapshot.MAX_AGE:
+            return None
+        rotation_.restore(j['rotation'])
+        entries = dict((e['id'], self._playlist_cache.load_entry(e)) for e in j['entries'])
+        p = j['program']
+        # a program of its own, the programs of the rotation might be loaded by the schedule meanwhile
+        program = (FollowupProgram if p['followup'] else Program)(None)
+        program.parse_json(p)
+        program.set_playlist([entries[i] for i in j['upcoming']])
+        print('Resuming {} with {} entries'.format(program.name, len(j['upcoming'])))
+        return program, [(i, entries[e]) for i, e in j['shown']], j['info']
@@ -1,8 +1,12 @@
 import tempfile
+import threading
 
 import pyglet
 
 from content.mediaentry import MediaFile
+from display.texturepool import TexturePool
+from display.upload import UploadScheduler
+from system.clock import Clock
 
 
 class MediaDisplay(pyglet.event.EventDispatcher):
@@ -26,6 +30,11 @@ class MediaDisplay(pyglet.event.EventDispatcher):
                 self.on_video_end(self)
         self.area = None
 
+    @staticmethod
+    def prepare(media_entry_):
+        # Called when the entry is going to be shown soon.
+        UploadScheduler().prepare(media_entry_)
+
     def define_area(self):
         # Looks for a suitable position on the screen
         w, h = self.media_entry.width_height
@@ -40,17 +49,47 @@ class MediaDisplay(pyglet.event.EventDispatcher):
         # Called when the content appears on the screen.
         if not self.media_entry.file:
             self.media_entry.file = MediaFile(self.media_entry)
-        if not self.media_entry.file.source:
-            self.media_entry.file.cache()
         if self.media_entry.is_image:
-            self.texture = self.media_entry.file.texture
+            # the texture is usually uploaded during the previous frames
+            self.texture = UploadScheduler().take(self.media_entry)
+            if not self.texture and self.media_entry.file.source:
+                self.texture = TexturePool().acquire(self.media_entry.file.source)
+            elif not self.texture:
+                # the screen stays empty until the image is decoded and uploaded in the background
+                UploadScheduler().prepare(self.media_entry)
+                Clock().schedule(self.on_frame)
         elif self.media_entry.is_video:
-            self.player.queue(self.media_entry.file.source)
-            self.player.play()
-        pyglet.clock.schedule_once(self.on_timer_end, self.media_entry.duration)
+            if self.media_entry.file.cached:
+                self.play()
+            else:
+                # the entry is due now, the video starts once it is downloaded
+                threading.Thread(target=self.media_entry.file.cache, kwargs={'slot_': 0, 'load_': False},
+                                 daemon=True).start()
+                Clock().schedule(self.on_frame)
+        Clock().schedule_once(self.on_timer_end, self.media_entry.duration)
         self.define_area()
         self.dispatch_event('on_show', self)
 
+    def play(self):
+        # loads the downloaded video
+        self.media_entry.file.cache()
+        if self.media_entry.file.source:
+            self.player.queue(self.media_entry.file.source)
+            self.player.play()
+
+    def on_frame(self, dt):
+        # waits for the file or texture that was not ready when the entry was shown
+        if self.media_entry.is_video:
+            if self.media_entry.file.cached:
+                Clock().unschedule(self.on_frame)
+                self.play()
+        else:
+            # the upload is prepared again if it was dropped for newer ones meanwhile
+            UploadScheduler().prepare(self.media_entry)
+            self.texture = UploadScheduler().poll(self.media_entry)
+            if self.texture:
+                Clock().unschedule(self.on_frame)
+
     def draw(self):
         a = self.area
         if self.media_entry.is_video and self.player:
@@ -69,8 +108,12 @@ class MediaDisplay(pyglet.event.EventDispatcher):
         self.dispatch_event('on_end', self, self.screen)
 
     def hide(self):
+        Clock().unschedule(self.on_frame)
         if self.player:
             self.player.delete()
+        # the texture is reused for the next image of the same size or deleted
+        TexturePool().release(self.texture)
+        self.texture = None
         self.media_entry.file.delete()
 
 MediaDisplay.register_event_type('on_show')
@@ -78,6 +121,9 @@ MediaDisplay.register_event_type('on_end')
 
 
 class Area:
+
+    __slots__ = ('x', 'y', 'width', 'height')
+
     def __init__(self, x_, y_, w_, h_):
 
         self.x = x_
@@ -0,0 +1,323 @@
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pyglet
+
+from content.mediaentry import MediaEntryData, MediaFile
+from display.upload import TextureUpload
+from system.clock import Clock
+from system.config import Config
+from system.renderer import run_renderer
+from system.screen import Screen
+
+
+class FrameDecoder:
+    """
+    Singleton class that caches upcoming media files and decodes images in a pool of threads
+    of the content daemon, so that they are ready to be passed to a render process.
+    Frames are handed over on the clock, which keeps running while a file is cached.
+    """
+
+    instance = None
+
+    class __FrameDecoder:
+
+        def __init__(self, workers_, size_):
+            """
+            :param workers_: number of threads
+            :param size_: number of decoded images kept, the oldest ones are dropped
+            """
+            self._executor = ThreadPoolExecutor(workers_)
+            self._size = size_
+            self._frames = OrderedDict()
+            # futures of taken frames and the functions waiting for them
+            self._waiting = []
+            Clock().schedule(self.on_frame)
+
+        def prepare(self, entry_):
+            if not (entry_.is_image or entry_.is_video) or id(entry_) in self._frames:
+                return
+            # the file is created here so that it is not created twice while caching in the background
+            if not entry_.file:
+                MediaFile(entry_)
+            self._frames[id(entry_)] = self._executor.submit(FrameDecoder.decode, entry_)
+            while len(self._frames) > self._size:
+                self._frames.popitem(False)
+
+        def take(self, entry_, callback_):
+            """
+            Calls a function with the decoded image of an entry once its file is cached and decoded.
+            :param callback_: function called on the clock with a tuple of width, height, format and rows,
+                              or None for videos and failed images
+            """
+            self.prepare(entry_)
+            frame = self._frames.pop(id(entry_), None)
+            if frame is None:
+                callback_(None)
+            else:
+                self._waiting.append((frame, callback_))
+
+        def on_frame(self, dt):
+            done = [w for w in self._waiting if w[0].done()]
+            for w in done:
+                self._waiting.remove(w)
+                w[1](w[0].result())
+
+    @staticmethod
+    def decode(entry_):
+        try:
+            if not entry_.is_image:
+                # videos are played by the render process, which loads them itself
+                entry_.file.cache(load_=False)
+                return None
+            entry_.file.cache()
+            image = entry_.file.source
+            if not image:
+                return None
+            format = TextureUpload.get_format(image)
+            return image.width, image.height, format, image.get_data(format, image.width * len(format))
+        except Exception as exc:
+            print('Decoding {} failed: {}'.format(entry_, exc))
+            return None
+
+    def __init__(self, workers_=2, size_=8):
+        if not FrameDecoder.instance:
+            FrameDecoder.instance = FrameDecoder.__FrameDecoder(workers_, size_)
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+
+class RemoteMediaDisplay(pyglet.event.EventDispatcher):
+    """
+    MediaDisplay of the content daemon. It keeps the time of the entry and
+    leaves the drawing to the render process of its screen.
+    """
+
+    def __init__(self, media_entry_, screen_, program_=None, index_=None):
+        super(RemoteMediaDisplay, self).__init__()
+        self.media_entry = media_entry_
+        self.program = program_
+        self.index = index_
+        self.screen = screen_
+        self.area = None
+        # number of the video in the render process, to match its end
+        self.sequence = None
+        self._ended = False
+
+    @staticmethod
+    def prepare(media_entry_):
+        FrameDecoder().prepare(media_entry_)
+
+    def show(self):
+        self.screen.send_media(self)
+        Clock().schedule_once(self.on_timer_end, self.media_entry.duration)
+        self.dispatch_event('on_show', self)
+
+    def draw(self):
+        pass
+
+    def on_timer_end(self, seconds_):
+        # timer used for still images and to end videos
+        self.on_content_end()
+
+    def on_content_end(self):
+        if not self._ended:
+            self._ended = True
+            Clock().unschedule(self.on_timer_end)
+            self.dispatch_event('on_end', self, self.screen)
+
+    def hide(self):
+        Clock().unschedule(self.on_timer_end)
+        if self.media_entry.file:
+            self.media_entry.file.delete()
+
+RemoteMediaDisplay.register_event_type('on_show')
+RemoteMediaDisplay.register_event_type('on_end')
+
+
+class RemoteScreen():
+    """
+    Screen of the content daemon that passes its content to a render process.
+    Decoded images are written into one of two buffers shared with the process,
+    a buffer is free again once the render process has uploaded it.
+    """
+
+    # contains the RemoteMediaDisplay instances of all screens for the info screen
+    _content = []
+
+    def __init__(self, index_, width_, height_, connection_, buffers_, info_capable_=True):
+        """
+        :param connection_: multiprocessing.Connection to the render process
+        :param buffers_: list of multiprocessing.RawArray
+        :param info_capable_: whether the screen can become the info screen
+        """
+        self.__index = index_
+        self.info_capable = info_capable_
+        self.__virtual_width = width_
+        self.__virtual_height = height_
+        self.__info_mode = False
+        self._connection = connection_
+        self._buffers = buffers_
+        self._free = list(range(len(buffers_)))
+        # number of the last video sent to the render process
+        self._sequence = 0
+        self.closed = False
+        self.orientation = MediaEntryData.get_orientation(width_, height_)
+        RemoteScreen._content.append(None)
+        # the render process starts showing content until the dispatcher chooses the info screen
+        self._connection.send(('info_mode', False))
+
+    @property
+    def media(self):
+        return RemoteScreen._content[self.__index]
+
+    @property
+    def get_width(self):
+        return self.__virtual_width
+
+    @property
+    def get_height(self):
+        return self.__virtual_height
+
+    @property
+    def index(self):
+        return self.__index
+
+    @property
+    def is_info(self):
+        return self.__info_mode
+
+    @property
+    def is_empty(self):
+        return not self.media and not self.__info_mode
+
+    def set_info_mode(self, info_=True):
+        if info_ != self.__info_mode:
+            if info_:
+                RemoteScreen._content[self.__index] = None
+            self.__info_mode = info_
+            self._connection.send(('info_mode', info_))
+
+    def set_media(self, media_):
+        if not self.__info_mode:
+            if self.media:
+                self.media.hide()
+            RemoteScreen._content[self.__index] = media_
+            media_.show()
+
+    def send_media(self, media_):
+        """
+        Sends the content of a media display to the render process once its file is cached and decoded.
+        """
+        FrameDecoder().take(media_.media_entry, lambda frame_: self.__send_media(media_, frame_))
+
+    def __send_media(self, media_, frame_):
+        if media_ is not self.media:
+            # the content changed while the file was cached
+            return
+        entry = media_.media_entry
+        caption = Screen.get_caption(entry)
+        if entry.is_image:
+            if not frame_:
+                return
+            width, height, format, data = frame_
+            if self._free and len(data) <= len(self._buffers[0]):
+                index = self._free.pop(0)
+                memoryview(self._buffers[index]).cast('B')[:len(data)] = data
+                self._connection.send(('image', index, width, height, format, caption))
+            elif entry.file.cached:
+                # too large for the buffers or the render process is still busy with both
+                self._connection.send(('file', entry.file.path, caption))
+        elif entry.is_video:
+            if entry.file.cached:
+                self._sequence += 1
+                media_.sequence = self._sequence
+                self._connection.send(('video', self._sequence, entry.file.path, caption))
+
+    def clear_media(self):
+        if self.media:
+            self.media.hide()
+        RemoteScreen._content[self.__index] = None
+        self._connection.send(('clear',))
+
+    def update_info_layout(self):
+        content = [m for m in RemoteScreen._content if m]
+        self._connection.send(('layout', Screen.get_program_name(content), [Screen.get_info(m) for m in content]))
+
+    def poll(self):
+        """
+        Handles the messages of the render process.
+        """
+        try:
+            while self._connection.poll():
+                message = self._connection.recv()
+                if message[0] == 'released':
+                    self._free.append(message[1])
+                elif message[0] == 'end' and self.media and self.media.sequence == message[1]:
+                    # the end of a video that was already replaced is ignored
+                    self.media.on_content_end()
+                elif message[0] == 'closed':
+                    self.closed = True
+        except EOFError:
+            self.closed = True
+
+    def close(self):
+        try:
+            self._connection.send(('quit',))
+        except (BrokenPipeError, EOFError):
+            pass
+
+    def __str__(self):
+        return 'RemoteScreen {}'.format(self.index+1)
+
+
+class Renderers():
+    """
+    Starts one render process per screen. The process that creates them becomes the content daemon,
+    which runs the clock, the API client and the dispatcher without any window.
+    """
+
+    # seconds between checks for messages of the render processes
+    INTERVAL = 0.01
+
+    def __init__(self, font_directory_, layout_):
+        """
+        :param font_directory_: directory with the fonts for the render processes
+        :param layout_: ScreenLayout
+        """
+        # render processes must not inherit a display connection or GL state
+        context = multiprocessing.get_context('spawn')
+        self._processes = []
+        self.screens = []
+        for d in layout_.screens:
+            buffers = [context.RawArray('B', Config.FRAME_BYTES) for _ in range(2)]
+            connection, child_connection = context.Pipe()
+            p = context.Process(target=run_renderer, name='renderer {}'.format(d.index+1), daemon=True,
+                                args=(d.index, layout_, font_directory_, child_connection, buffers))
+            p.start()
+            self._processes.append(p)
+            self.screens.append(RemoteScreen(d.index, d.width, d.height, connection, buffers, d.info))
+
+    @property
+    def alive(self):
+        return all(p.is_alive() for p in self._processes) and not any(s.closed for s in self.screens)
+
+    def run(self):
+        """
+        Runs the clock of the content daemon until a render process ends.
+        """
+        while self.alive:
+            for s in self.screens:
+                s.poll()
+            Clock().tick()
+            time.sleep(Renderers.INTERVAL)
+        self.stop()
+
+    def stop(self):
+        for s in self.screens:
+            s.close()
+        for p in self._processes:
+            p.join(1)
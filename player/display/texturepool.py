@@ -0,0 +1,131 @@
+import pyglet
+
+from system.config import Config
+
+
+class TexturePool:
+    """
+    Singleton class that hands out textures for images, reuses released textures of the same size
+    and deletes unused textures as soon as the video memory budget is exceeded.
+    """
+
+    instance = None
+
+    class __TexturePool:
+
+        def __init__(self, budget_):
+            """
+            :param budget_: bytes of video memory for all textures
+            """
+            self.budget = budget_
+            # released textures by size, ready for reuse
+            self.__free = {}
+            self.__live = {}
+            self.live_bytes = 0
+            self.free_bytes = 0
+            self.created = 0
+            self.reused = 0
+
+        def acquire(self, image_):
+            """
+            Returns a texture with the content of the image.
+            :param image_: pyglet.image.ImageData
+            :return: pyglet.image.Texture
+            """
+            texture = self.allocate(image_.width, image_.height)
+            texture.blit_into(image_, 0, 0, 0)
+            return texture
+
+        def allocate(self, width_, height_):
+            """
+            Returns a texture of the given size whose content is undefined until it is filled.
+            :return: pyglet.image.Texture
+            """
+            key = (width_, height_)
+            free = self.__free.get(key)
+            if free:
+                texture = free.pop()
+                self.free_bytes -= TexturePool.get_bytes(texture)
+                self.reused += 1
+            else:
+                texture = pyglet.image.Texture.create(width_, height_)
+                self.created += 1
+            self.__live[id(texture)] = texture
+            self.live_bytes += TexturePool.get_bytes(texture)
+            self.trim()
+            return texture
+
+        def release(self, texture_):
+            """
+            Gives a texture back to the pool, it must not be drawn anymore.
+            """
+            if texture_ is None or id(texture_) not in self.__live:
+                return
+            del self.__live[id(texture_)]
+            b = TexturePool.get_bytes(texture_)
+            self.live_bytes -= b
+            self.free_bytes += b
+            self.__free.setdefault((texture_.width, texture_.height), []).append(texture_)
+            self.trim()
+
+        def trim(self):
+            """
+            Deletes free textures until all textures fit into the budget.
+            """
+            for key in list(self.__free.keys()):
+                free = self.__free[key]
+                while free and self.live_bytes + self.free_bytes > self.budget:
+                    texture = free.pop(0)
+                    self.free_bytes -= TexturePool.get_bytes(texture)
+                    TexturePool.delete(texture)
+                if not free:
+                    del self.__free[key]
+            if self.live_bytes > self.budget:
+                print('Textures in use exceed the budget: {}'.format(self))
+
+        def clear(self):
+            """
+            Deletes all free textures.
+            """
+            for free in self.__free.values():
+                for texture in free:
+                    TexturePool.delete(texture)
+            self.__free = {}
+            self.free_bytes = 0
+
+        @property
+        def live_count(self):
+            return len(self.__live)
+
+        @property
+        def free_count(self):
+            return sum(len(f) for f in self.__free.values())
+
+        def __str__(self):
+            return 'TexturePool {} live / {:.1f} MB, {} free / {:.1f} MB, {} created, {} reused'.format(
+                self.live_count, self.live_bytes / 1048576, self.free_count, self.free_bytes / 1048576,
+                self.created, self.reused)
+
+    @staticmethod
+    def get_bytes(texture_):
+        # textures are allocated in the size of their owner, which might be padded to a power of two
+        owner = getattr(texture_, 'owner', texture_)
+        return owner.width * owner.height * 4
+
+    @staticmethod
+    def delete(texture_):
+        # releases the video memory right away instead of waiting for the garbage collector
+        owner = getattr(texture_, 'owner', texture_)
+        if owner.id:
+            owner._context.delete_texture(owner.id)
+            owner.id = 0
+
+    def __init__(self, budget_=None):
+        if not TexturePool.instance:
+            TexturePool.instance = TexturePool.__TexturePool(budget_ if budget_ else Config.TEXTURE_BUDGET)
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def __str__(self):
+        return str(self.instance)
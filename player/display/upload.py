@@ -0,0 +1,219 @@
+import ctypes
+import queue
+import threading
+from collections import Counter, OrderedDict
+
+from pyglet import gl
+
+from content.mediaentry import MediaFile
+from display.texturepool import TexturePool
+from system.clock import Clock
+from system.config import Config
+
+
+class TextureUpload():
+    """
+    Image of an upcoming media entry that is decoded in the background and copied
+    into a texture of the pool row by row over several frames.
+    """
+
+    QUEUED = 'queued'
+    DECODED = 'decoded'
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+
+    def __init__(self, entry_):
+        """
+        :param entry_: MediaEntryData of an image or None if the data is set directly
+        """
+        self.entry = entry_
+        self.state = TextureUpload.QUEUED
+        self.texture = None
+        self.width = 0
+        self.height = 0
+        self.format = 'RGBA'
+        self.pitch = 0
+        self.row = 0
+        self.cancelled = False
+        self._data = None
+
+    def decode(self):
+        """
+        Caches the file and converts the image into RGB or RGBA rows. Runs in the background thread.
+        """
+        try:
+            # a discarded upload must not download the file, its entry might already be hidden
+            if self.cancelled or not self.entry.is_image:
+                self.state = TextureUpload.FAILED
+                return
+            self.entry.file.cache()
+            if self.cancelled:
+                self.state = TextureUpload.FAILED
+                return
+            image = self.entry.file.source
+            if self.cancelled or not image:
+                self.state = TextureUpload.FAILED
+                return
+            # pyglet converts formats in python, which must not happen in the frame of the upload
+            format = TextureUpload.get_format(image)
+            data = image.get_data(format, image.width * len(format))
+            self.set_data(image.width, image.height, (gl.GLubyte * len(data)).from_buffer_copy(data), format)
+        except Exception as exc:
+            print('Decoding {} failed: {}'.format(self.entry, exc))
+            self.state = TextureUpload.FAILED
+
+    @staticmethod
+    def get_format(image_):
+        # pyglet fills a missing alpha channel with a color channel when converting to RGBA
+        return 'RGBA' if 'A' in image_.format else 'RGB'
+
+    def set_data(self, width_, height_, data_, format_='RGBA'):
+        """
+        Sets decoded image data, e.g. from a buffer shared with another process.
+        :param data_: ctypes array with rows from bottom to top
+        :param format_: 'RGB' or 'RGBA'
+        """
+        self.width = width_
+        self.height = height_
+        self.format = format_
+        self.pitch = width_ * len(format_)
+        self._data = data_
+        self.state = TextureUpload.DECODED
+
+    @property
+    def remaining_rows(self):
+        return self.height - self.row
+
+    def upload(self, rows_: int):
+        """
+        Copies the next rows into the texture, which is allocated with the first rows.
+        :return: number of rows copied
+        """
+        if self.state == TextureUpload.DECODED:
+            self.texture = TexturePool().allocate(self.width, self.height)
+            self.state = TextureUpload.UPLOADING
+        if self.state != TextureUpload.UPLOADING:
+            return 0
+        rows = min(rows_, self.remaining_rows)
+        t = self.texture
+        gl.glBindTexture(t.target, t.id)
+        # rows of RGB images are not aligned to four bytes
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexSubImage2D(t.target, t.level, t.x, t.y + self.row, self.width, rows,
+                           gl.GL_RGBA if self.format == 'RGBA' else gl.GL_RGB, gl.GL_UNSIGNED_BYTE,
+                           ctypes.byref(self._data, self.row * self.pitch))
+        self.row += rows
+        if not self.remaining_rows:
+            self._data = None
+            self.state = TextureUpload.COMPLETE
+        return rows
+
+    def discard(self):
+        self.cancelled = True
+        self._data = None
+        TexturePool().release(self.texture)
+        self.texture = None
+
+
+class UploadScheduler:
+    """
+    Singleton class that prepares the textures of upcoming images before they are shown,
+    so that switching content does not block a frame with the upload of a whole image.
+    Images are decoded in a background thread, the uploads share a budget of bytes per frame.
+    """
+
+    instance = None
+
+    class __UploadScheduler(threading.Thread):
+
+        def __init__(self, bytes_per_frame_, size_):
+            """
+            :param bytes_per_frame_: bytes copied into textures per frame
+            :param size_: number of prepared images, the oldest ones are discarded
+            """
+            super().__init__(daemon=True)
+            self.bytes_per_frame = bytes_per_frame_
+            self._size = size_
+            self._uploads = OrderedDict()
+            self._queue = queue.Queue()
+            # counts prepared, complete and partial uploads taken on show and misses
+            self.stats = Counter()
+            self.start()
+            Clock().schedule(self.on_frame)
+
+        def run(self):
+            while True:
+                self._queue.get().decode()
+
+        def prepare(self, entry_):
+            """
+            Starts preparing the texture of an entry that is going to be shown soon.
+            :param entry_: MediaEntryData
+            """
+            if not entry_.is_image or id(entry_) in self._uploads:
+                return
+            # the file is created here so that it is not created twice while caching in the background
+            if not entry_.file:
+                MediaFile(entry_)
+            upload = TextureUpload(entry_)
+            self._uploads[id(entry_)] = upload
+            self._queue.put(upload)
+            self.stats['prepared'] += 1
+            while len(self._uploads) > self._size:
+                self._uploads.popitem(False)[1].discard()
+
+        def take(self, entry_):
+            """
+            Returns the texture of an entry, the rest of an incomplete upload is copied right away.
+            An upload that is not decoded yet is kept, so that it can be polled.
+            :return: pyglet.image.Texture or None if the image is not decoded yet
+            """
+            upload = self._uploads.get(id(entry_))
+            if not upload or upload.state in (TextureUpload.QUEUED, TextureUpload.FAILED):
+                self.stats['missed'] += 1
+                if upload and upload.state == TextureUpload.FAILED:
+                    self._uploads.pop(id(entry_)).discard()
+                return None
+            del self._uploads[id(entry_)]
+            if upload.state == TextureUpload.COMPLETE:
+                self.stats['complete'] += 1
+            else:
+                self.stats['partial'] += 1
+                upload.upload(upload.height)
+            return upload.texture
+
+        def poll(self, entry_):
+            """
+            Returns the texture of an entry once its upload is complete.
+            :return: pyglet.image.Texture or None while it is decoded or uploaded
+            """
+            upload = self._uploads.get(id(entry_))
+            if not upload or upload.state != TextureUpload.COMPLETE:
+                return None
+            del self._uploads[id(entry_)]
+            return upload.texture
+
+        def on_frame(self, dt):
+            budget = self.bytes_per_frame
+            for upload in list(self._uploads.values()):
+                if budget <= 0:
+                    break
+                if upload.state in (TextureUpload.DECODED, TextureUpload.UPLOADING):
+                    rows = upload.upload(max(1, budget // upload.pitch))
+                    budget -= rows * upload.pitch
+
+        def __str__(self):
+            return 'UploadScheduler {} prepared, {} complete, {} partial, {} missed'.format(
+                self.stats['prepared'], self.stats['complete'], self.stats['partial'], self.stats['missed'])
+
+    def __init__(self, bytes_per_frame_=None, size_=8):
+        if not UploadScheduler.instance:
+            UploadScheduler.instance = UploadScheduler.__UploadScheduler(
+                bytes_per_frame_ if bytes_per_frame_ else Config.UPLOAD_BYTES_PER_FRAME, size_)
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def __str__(self):
+        return str(self.instance)
@@ -1,21 +1,35 @@
-import asyncio
 import os
+import signal
+import time
 from datetime import datetime
 from pathlib import Path
 
-import simplejson as json
 import click
 import pyglet
-from random import shuffle
-import twitter
 
 from api_access import api_user, api_pass, api_server
 from content.api import ApiClient
+from content.catalog import ProgramCatalog
 from content.dispatcher import Dispatcher
-from content.program import Program, FollowupProgram
+from content.hooks import HookIndex
+from content.playlist import PlaylistCache
+from content.prefetch import Prefetcher
+from content.snapshot import PlayoutSnapshot
+from content.rotation import Rotation
+from content.schedule import Schedule
+from display.mediadisplay import MediaDisplay
+from display.texturepool import TexturePool
+from display.upload import UploadScheduler
+from system.announce import Announcer, TwitterSink
+from system.clock import Clock
 from system.config import Config
+from system.download import DownloadManager
+from system.layout import ScreenLayout
+from system.loop import EventLoop
 from system.machine import Machine
-from twitter_access import twitter_consumer_key, twitter_consumer_secret, twitter_access_token, twitter_access_token_secret
+
+# time of the import of this module, the start of the process where /proc is not available
+IMPORTED = time.time()
 
 
 @click.command()
@@ -23,97 +37,198 @@ from twitter_access import twitter_consumer_key, twitter_consumer_secret, twitte
 @click.option('--randomize/--no-random', default=True, help='Randomize order of programs')
 @click.option('--followups/--no-followups', default=True, help='Avoid followup programs')
 @click.option('--prodmode/--devmode', default=True, help='Mode for development with shorter durations')
+@click.option('--schedule-hours', default=3.0, help='Hours the schedule plans ahead, 0 loads programs on demand')
+@click.option('--prefetch/--no-prefetch', default=True, help='Load scheduled programs in the background')
+@click.option('--processes/--single-process', default=False, help='Render each screen in its own process')
+@click.option('--screens', default=None, help='JSON file with the screen layout, by default three screens')
+@click.option('--cluster-port', default=0, help='Lead a cluster, serving timeline and content cache on this port')
+@click.option('--cluster-host', default='127.0.0.1', help='Address the cluster leader listens on, e.g. its LAN address')
+@click.option('--follow', default=None, help='URL of a cluster leader whose timeline is played')
+@click.option('--proxy', default=None, help='URL of a caching proxy that is used instead of the Madek server')
 class Main(object):
-    def __init__(self, programs, randomize, followups, prodmode):
-        self._randomize = randomize
-        self._followups = followups
+    def __init__(self, programs, randomize, followups, prodmode, schedule_hours, prefetch, processes, screens,
+                 cluster_port, cluster_host, follow, proxy):
+        server = proxy if proxy else api_server
+        self._cluster = None
+        self._snapshot = None
+        if cluster_port:
+            # the cluster, the render processes and their modules are only imported when they are used
+            from system.cluster import ClusterServer
+            self._cluster = ClusterServer(server, (api_user, api_pass), cluster_host, cluster_port).start()
+            # the leader loads everything through the cache it shares with the followers
+            server = self._cluster.url
+        elif follow:
+            server = follow
         self._config = Config()
-        self._config.set_server(api_server)
+        self._config.set_server(server)
         self._config.set_dev_mode(not prodmode)
         self._config.set_api_auth((api_user, api_pass))
-        self._config.set_meta_data_white_list(['madek_core:authors', 'madek_core:description', 'madek_core:title', 'media_content:title',
-                                               'media_content:date_created', 'madek_core:keywords', 'media_set:title',
-                                               'institution:institutional_affiliation', 'madek_core:copyright_notice'])
+        self._config.set_meta_data_white_list(Config.META_DATA_WHITE_LIST)
         font_directory = os.path.join(os.path.dirname(__file__), 'fonts')
-        self._machine = Machine(font_directory)
-        self._api = ApiClient(api_server, api_user, api_pass)
-        self._twitter_api = twitter.Api(consumer_key=twitter_consumer_key,
-                                        consumer_secret=twitter_consumer_secret,
-                                        access_token_key=twitter_access_token,
-                                        access_token_secret=twitter_access_token_secret)
+        self._api = ApiClient(server, api_user, api_pass)
+        # programs are announced in the background, twitter is only imported with the first announcement
+        self._announcer = None
+        if not self._config.dev_mode:
+            self._announcer = Announcer(TwitterSink())
+            self._announcer.start()
 
         # defining the screens
-        screen1 = self._machine.create_screen()
-        screen2 = self._machine.create_screen()
-        screen3 = self._machine.create_screen()
-        self._dispatcher = Dispatcher((screen1, screen2, screen3))
+        layout = ScreenLayout.load(os.path.join(os.path.dirname(__file__), screens) if screens else None)
+        self._config.set_screen_sizes([(d.width, d.height) for d in layout.screens])
+        self._renderers = None
+        if processes:
+            # this process only handles the content, the screens are drawn by render processes
+            from display.remote import RemoteMediaDisplay, Renderers
+            self._renderers = Renderers(font_directory, layout)
+            display_class = RemoteMediaDisplay
+            screens = self._renderers.screens
+        else:
+            self._machine = Machine(font_directory, layout)
+            display_class = MediaDisplay
+            screens = [self._machine.create_screen() for _ in layout.screens]
+        self._dispatcher = Dispatcher(screens, display_class)
+        self._dispatcher.push_handlers(on_media=self.on_first_media)
+        if self._cluster:
+            self._dispatcher.push_handlers(on_media=self._cluster.on_media)
 
         # log start
         if not os.path.exists(self._config.log_dir):
             os.makedirs(self._config.log_dir)
         self.log_program('*** Start ***')
 
+        if follow:
+            # a follower only plays the timeline of the leader
+            from system.cluster import ClusterFollower
+            self._follower = ClusterFollower(follow, screens, display_class)
+            self._follower.start()
+            Clock().schedule_interval(self._follower.on_clock, 0.5)
+            self.run()
+            return
+
         # defining programs
-        self._programs = []
+        hook_index = HookIndex(str(Path(self._config.log_dir, 'hooks.json')))
+        catalog = ProgramCatalog(str(Path(self._config.log_dir, 'catalog.json')))
+        self._rotation = Rotation(self._api, randomize, followups, hook_index, catalog)
 
         # convert relative programs path into an absolute one
-        programs = os.path.join(os.path.dirname(__file__), programs)
-
-        with open(programs) as json_data:
-            for p in json.load(json_data)['programs']:
-                self._programs.append(Program(self._api, p))
-
-        print('{} programs'.format(len(self._programs)))
-
-        if self._randomize:
-            shuffle(self._programs)
-        self._program_index = -1
-
-        pyglet.clock.schedule_interval(self.on_clock, 1)
-        pyglet.app.run()
+        self._rotation.load(os.path.join(os.path.dirname(__file__), programs))
+
+        # the playout continues where it was before a restart, or with the entries shown last,
+        # while the first program is loaded
+        self._playlist_cache = PlaylistCache(str(Path(self._config.log_dir, 'playlist')))
+        self._snapshot = PlayoutSnapshot(str(Path(self._config.log_dir, 'snapshot.json')), self._playlist_cache)
+        restored = self._snapshot.restore(self._rotation)
+        cached = None if restored else self._playlist_cache.load()
+        if restored:
+            self._dispatcher.resume(*restored)
+        elif cached:
+            self._dispatcher.set_program(cached)
+            self._dispatcher.start()
+        self._dispatcher.push_handlers(on_media=self._playlist_cache.on_media)
+
+        # planning programs ahead
+        self._schedule = None
+        if schedule_hours > 0:
+            self._schedule = Schedule(self._rotation, self._api, schedule_hours, len(self._dispatcher.screens) - 1)
+            if prefetch:
+                Prefetcher(self._schedule).start()
+
+        # programs are loaded on the asyncio loop, which is stepped with every frame
+        self._loading = None
+        EventLoop()
+        Clock().schedule_interval(self.on_clock, 1)
+        Clock().schedule_interval(self.save_snapshot, PlayoutSnapshot.INTERVAL)
+        Clock().schedule_interval(self.reload_programs, Rotation.RELOAD_INTERVAL)
+        self.run()
+
+    def run(self):
+        # systemd stops the service with SIGTERM, the restart script sends SIGINT
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            if self._renderers:
+                self._renderers.run()
+            else:
+                pyglet.app.run()
+        except KeyboardInterrupt:
+            print('Stopped.')
+        finally:
+            if self._snapshot:
+                self.save_snapshot()
+            if self._renderers:
+                self._renderers.stop()
+            if self._announcer:
+                self._announcer.stop()
+
+    def save_snapshot(self, dt=None):
+        try:
+            self._snapshot.save(self._dispatcher, self._rotation)
+        except (OSError, TypeError) as exc:
+            print('Saving the snapshot failed: {}'.format(exc))
+
+    def reload_programs(self, dt=None):
+        if self._rotation.reload() and self._schedule:
+            self._schedule.replan()
+
+    def on_first_media(self, *args_):
+        self._dispatcher.remove_handler('on_media', self.on_first_media)
+        uptime = Main.get_uptime()
+        print('First content after {:.2f} seconds'.format(uptime))
+        self.log_program('*** First content after {:.2f} seconds ***'.format(uptime))
+
+    @staticmethod
+    def get_uptime():
+        """
+        Seconds since the start of the process, including the start of the interpreter and the imports.
+        Without /proc the seconds since the import of this module are returned.
+        """
+        try:
+            with open('/proc/self/stat') as f:
+                # the start time is the 22nd field, counted in clock ticks since the boot
+                start = int(f.read().rsplit(')', 1)[1].split()[19]) / os.sysconf('SC_CLK_TCK')
+            with open('/proc/uptime') as f:
+                return float(f.read().split()[0]) - start
+        except (OSError, ValueError, IndexError):
+            return time.time() - IMPORTED
 
     def on_clock(self, dt):
-        if self._dispatcher.entries_len == 0 and not self._api.session_active:
-            self.load_program()
-
-    def load_program(self):
-        program = None
-        last_program = self._dispatcher.program
-        while not program or not program.valid:
-            # Decide whether to try a followup program
-            if self._followups and last_program and type(last_program) is not FollowupProgram:
-                program = FollowupProgram(self._api)
-            if program and program.set_reference(last_program):
-                print('***** load_program followup {} *****'.format(program._name))
+        if self._dispatcher.entries_len == 0 and not self._loading:
+            self._loading = EventLoop().run(self.load_program())
+
+    async def load_program(self):
+        """
+        Loads the next program on the event loop, while the screens keep drawing. The program starts as soon as
+        there are entries for the content screens, the other entries are added while it is playing.
+        """
+        entries = len(self._dispatcher.screens) - 1
+        self._api.start_session()
+        try:
+            if self._schedule:
+                program, loading = await self._schedule.start_next_program(entries, self._api)
             else:
-                self._program_index = (self._program_index + 1) % len(self._programs)
-                # shuffle programs?
-                middle_index = int(0.5*len(self._programs))
-                one_third_index = int(0.3*len(self._programs))
-                if self._program_index == 0:
-                    # shuffle last two third whenever program loop starts again
-                    a = self._programs[:one_third_index]
-                    b = self._programs[one_third_index:]
-                    shuffle(b)
-                    self._programs = a + b
-                elif self._program_index == middle_index + 1:
-                    # shuffle first half whenever program loop has reached second half
-                    a = self._programs[:middle_index]
-                    b = self._programs[middle_index:]
-                    shuffle(a)
-                    self._programs = a + b
-                program = self._programs[self._program_index]
-            print('***** load_program {} *****'.format(program._name))
-            loop = self._api.start_session()
-            future = asyncio.ensure_future(program.load(False))
-            loop.run_until_complete(future)
+                program, loading = await self._rotation.start_next(self._dispatcher.program, entries)
+            self.play_program(program)
+            if loading:
+                await loading
+            if self._schedule:
+                self._schedule.dump(str(Path(self._config.log_dir, 'schedule.json')))
+        except Exception as exc:
+            print('Loading a program failed: {}'.format(exc))
+        finally:
             self._api.complete_session()
-        if program.valid:
+            self._loading = None
+
+    def play_program(self, program_):
+        if not self._renderers:
+            print(TexturePool())
+            print(UploadScheduler())
+        print(EventLoop())
+        print(DownloadManager())
+        if program_.valid:
             try:
-                self.log_program(program.name)
-                self._dispatcher.set_program(program)
+                self.log_program(program_.name)
+                self._dispatcher.set_program(program_)
                 self._dispatcher.start()
-                self.tweet_program(program)
+                self.tweet_program(program_)
             except AssertionError:
                 print('Error loading program.')
         else:
@@ -125,11 +240,8 @@ class Main(object):
 
 
     def tweet_program(self, program_):
-        try:
-            if not self._config.dev_mode:
-                self._twitter_api.PostUpdate('{} {}{}'.format(program_.name, api_server, program_.web_url))
-        except:
-            print('Twitter error ...')
+        if self._announcer:
+            self._announcer.announce('{} {}{}'.format(program_.name, api_server, program_.web_url))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,170 @@
+import os
+import random
+import tempfile
+import time
+from collections import Counter, OrderedDict
+
+import simplejson as json
+import click
+
+from content.catalog import ProgramCatalog
+from content.dispatcher import Dispatcher
+from content.hooks import HookIndex
+from content.rotation import Rotation
+from content.program import FollowupProgram
+from content.schedule import Schedule
+from standin.archive import StandInArchive
+from standin.client import StandInApiClient
+from standin.display import StandInMediaDisplay
+from standin.screen import StandInScreen
+from system.clock import Clock, VirtualClock
+from system.config import Config
+from system.layout import ScreenLayout
+
+
+@click.command()
+@click.option('--programs', default='programs.json', help='JSON file with programs')
+@click.option('--days', default=1.0, help='Simulated days of playout')
+@click.option('--randomize/--no-random', default=True, help='Randomize order of programs')
+@click.option('--followups/--no-followups', default=True, help='Avoid followup programs')
+@click.option('--entries', default=2000, help='Number of media entries in the stand-in archive')
+@click.option('--latency', default=0.08, help='Simulated seconds per API request')
+@click.option('--connections', default=20, help='Parallel connections of the API client')
+@click.option('--seed', default=1, help='Seed for the archive and all random decisions')
+@click.option('--schedule-hours', default=0.0, help='Hours the schedule plans ahead, 0 loads programs on demand')
+@click.option('--prefetch-lead', default=1800.0, help='Seconds before their start when scheduled programs are loaded')
+@click.option('--hook-index/--no-hook-index', default=True, help='Choose followup hooks with the hook index')
+@click.option('--catalog/--no-catalog', default=True, help='Skip chronically empty programs with the program catalog')
+@click.option('--screens', default=None, help='JSON file with the screen layout, by default three screens')
+@click.option('--report', default=None, help='JSON file for the report')
+class Simulation(object):
+    """
+    Runs the player headless on a virtual clock against an in-process stand-in of the Madek API.
+    Screens are stand-ins without windows, loading a program blocks the virtual clock for the time
+    the requests would take.
+    """
+
+    def __init__(self, programs, days, randomize, followups, entries, latency, connections, seed, schedule_hours,
+                 prefetch_lead, hook_index, catalog, screens, report):
+        random.seed(seed)
+        self._latency = latency
+        self._connections = connections
+        self._clock = VirtualClock()
+        Clock(self._clock)
+        self._config = Config()
+        self._config.set_server('standin')
+        self._config.set_dev_mode(False)
+        self._config.set_meta_data_white_list(Config.META_DATA_WHITE_LIST)
+        self._config.set_log_dir(tempfile.mkdtemp(prefix='simulation_'))
+        self._api = StandInApiClient(StandInArchive(seed, entries))
+
+        layout = ScreenLayout.load(os.path.join(os.path.dirname(__file__), screens) if screens else None)
+        self._config.set_screen_sizes([(d.width, d.height) for d in layout.screens])
+        self._screens = [StandInScreen(d.index, d.width, d.height, d.info) for d in layout.screens]
+        self._dispatcher = Dispatcher(self._screens, StandInMediaDisplay)
+
+        self._rotation = Rotation(self._api, randomize, followups, HookIndex() if hook_index else None,
+                                  ProgramCatalog() if catalog else None)
+        self._rotation.load(os.path.join(os.path.dirname(__file__), programs))
+        self._schedule = None
+        self._prefetch_lead = prefetch_lead
+        if schedule_hours > 0:
+            self._schedule = Schedule(self._rotation, self._api, schedule_hours, len(self._screens) - 1)
+
+        self._played = Counter()
+        self._load_seconds = []
+        self._load_requests = []
+        self._preview_bytes_saved = []
+        self._prefetch_requests = 0
+        # seconds content screens were without content
+        self._idle_seconds = 0
+
+        start = time.perf_counter()
+        self._clock.schedule_interval(self.on_clock, 1)
+        self._clock.advance(days * 24 * 3600)
+        wall = time.perf_counter() - start
+
+        self.report(wall, report)
+
+    def on_clock(self, dt):
+        self._idle_seconds += sum(1 for s in self._screens if s.is_empty)
+        if self._dispatcher.entries_len == 0:
+            self.load_program()
+        elif self._schedule:
+            self.prefetch()
+
+    def prefetch(self):
+        # in the player this happens in the background and does not block the clock
+        slot = self._schedule.next_to_prefetch(self._prefetch_lead)
+        if slot:
+            requests = self._api.total_requests
+            self._schedule.load(slot)
+            self._prefetch_requests += self._api.total_requests - requests
+
+    def load_program(self):
+        requests = self._api.total_requests
+        if self._schedule:
+            program = self._schedule.next_program()
+        else:
+            program = self._rotation.load_next(self._dispatcher.program)
+        requests = self._api.total_requests - requests
+        # loading blocks the player for the time of all requests
+        seconds = requests * self._latency / self._connections
+        self._clock.sleep(seconds)
+        self._load_seconds.append(seconds)
+        self._load_requests.append(requests)
+        self._played['followup' if type(program) is FollowupProgram else program.name] += 1
+        self._preview_bytes_saved.append(program.preview_bytes_saved)
+        self._dispatcher.set_program(program)
+        self._dispatcher.start()
+
+    def report(self, wall_, file_):
+        hours = self._clock.time() / 3600
+        shown = sum(s.shown for s in self._screens)
+        r = OrderedDict()
+        r['simulated_hours'] = round(hours, 2)
+        r['wall_seconds'] = round(wall_, 2)
+        r['speedup'] = round(self._clock.time() / wall_) if wall_ else None
+        r['program_loads'] = self._rotation.stats['loads']
+        r['invalid_loads'] = self._rotation.stats['invalid_loads']
+        r['followups'] = self._rotation.stats['followups']
+        r['invalid_followups'] = self._rotation.stats['invalid_followups']
+        r['skipped_programs'] = self._rotation.stats['skipped']
+        r['deadline_misses'] = self._rotation.stats['deadline_misses']
+        r['programs_played'] = sum(self._played.values())
+        r['programs_per_hour'] = round(r['programs_played'] / hours, 2)
+        r['load_seconds_mean'] = round(sum(self._load_seconds) / len(self._load_seconds), 2)
+        r['load_seconds_max'] = round(max(self._load_seconds), 2)
+        r['blocked_share'] = round(sum(self._load_seconds) / self._clock.time(), 4)
+        r['requests'] = self._api.total_requests
+        r['requests_per_hour'] = round(self._api.total_requests / hours)
+        r['requests_per_load_mean'] = round(sum(self._load_requests) / len(self._load_requests), 1)
+        r['prefetch_requests'] = self._prefetch_requests
+        # estimated, compared with the x_large previews
+        r['preview_mb_saved_per_program'] = round(
+            sum(self._preview_bytes_saved) / len(self._preview_bytes_saved) / 1024 / 1024, 2)
+        r['screens'] = len(self._screens)
+        r['entries_shown'] = shown
+        r['entries_per_hour'] = round(shown / hours, 1)
+        # share of time the content screens were waiting for content
+        r['idle_screen_share'] = round(self._idle_seconds / ((len(self._screens) - 1) * self._clock.time()), 4)
+        r['orientation_match'] = round(sum(s.matching for s in self._screens) / shown, 3) if shown else None
+        r['media_repeats'] = round(sum(s.repeats for s in self._screens) / shown, 3) if shown else None
+        r['info_screen_turns'] = sum(s.info_turns for s in self._screens)
+        r['info_layouts'] = sum(s.layouts for s in self._screens)
+        for s in self._screens:
+            r['screen_{}_shown'.format(s.index+1)] = s.shown
+        stats = self._api.cache_stats
+        for k in ['person', 'keyword']:
+            lookups = stats[k + '_hit'] + stats[k + '_miss']
+            r['{}_cache_hit_rate'.format(k)] = round(stats[k + '_hit'] / lookups, 3) if lookups else None
+        r['most_played'] = self._played.most_common(5)
+        for k, v in r.items():
+            print('{:<28} {}'.format(k, v))
+        if file_:
+            with open(file_, 'w') as f:
+                json.dump(r, f, indent=2)
+
+
+if __name__ == '__main__':
+    s = Simulation()
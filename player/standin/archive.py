@@ -0,0 +1,273 @@
+import io
+import random
+import uuid
+import zlib
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+import simplejson as json
+
+
+class StandInArchive():
+    """
+    Deterministic stand-in for the Madek JSON-ROA API.
+    It generates media entries, meta data, people, keywords, media files and previews
+    and answers api paths the same way the real server does - as far as the player needs it.
+    """
+
+    PAGE_SIZE = 30
+
+    # thumbnail name and maximum edge length as used by Madek
+    THUMBNAILS = [('small', 100), ('small_125', 125), ('medium', 300), ('large', 500), ('x_large', 1024),
+                  ('maximum', 3000)]
+
+    KEYWORD_KEYS = ['madek_core:keywords', 'media_content:type', 'zhdk_bereich:project_type',
+                    'media_content:portrayed_object_materials']
+
+    def __init__(self, seed_: int=1, entries_: int=500, keywords_: int=300, people_: int=200):
+        """
+        :param seed_: seed for the random generator, the same seed creates the same archive
+        :param entries_: number of media entries
+        :param keywords_: number of keywords
+        :param people_: number of people
+        """
+        self.__random = random.Random(seed_)
+        self.__images = {}
+        self.keywords = {}
+        self.people = {}
+        self.entries = {}
+        self.meta_data = {}
+        self.media_files = {}
+        self.previews = {}
+        self.__entry_ids = []
+        for i in range(keywords_):
+            k = self.__uuid()
+            self.keywords[k] = {'id': k, 'term': 'Schlagwort {}'.format(i),
+                                'meta_key_id': self.__random.choice(StandInArchive.KEYWORD_KEYS)}
+        for i in range(people_):
+            p = self.__uuid()
+            self.people[p] = {'id': p, 'first_name': 'Vorname{}'.format(i), 'last_name': 'Nachname{}'.format(i),
+                              'pseudonym': None, 'date_of_birth': None, 'date_of_death': None}
+        keyword_ids = sorted(self.keywords.keys())
+        people_ids = sorted(self.people.keys())
+        for i in range(entries_):
+            self.__create_entry(i, keyword_ids, people_ids)
+
+    def __uuid(self):
+        return str(uuid.UUID(int=self.__random.getrandbits(128)))
+
+    def __create_entry(self, index_, keyword_ids_, people_ids_):
+        r = self.__random
+        e = self.__uuid()
+        self.__entry_ids.append(e)
+        self.entries[e] = {'id': e, 'created_at': '2017-01-01T00:00:00.000Z', 'is_published': True,
+                           'responsible_user_id': self.__uuid(), 'meta_data': {}}
+        # meta data
+        title = 'Titel {} {}'.format(index_, ' '.join(r.choice(['Licht', 'Raum', 'Klang', 'Form', 'Zeit'])
+                                                       for _ in range(r.randint(1, 6))))
+        description = '\r\n\r\n'.join('Absatz {} '.format(p) + 'Lorem ipsum dolor sit amet. ' * r.randint(1, 12)
+                                      for p in range(r.randint(0, 4)))
+        self.__add_meta_datum(e, 'madek_core:title', 'MetaDatum::Text', title)
+        if description:
+            self.__add_meta_datum(e, 'madek_core:description', 'MetaDatum::Text', description)
+        self.__add_meta_datum(e, 'madek_core:copyright_notice', 'MetaDatum::Text', '© ZHdK')
+        self.__add_meta_datum(e, 'madek_core:authors', 'MetaDatum::People',
+                              r.sample(people_ids_, r.randint(1, 3)))
+        keywords = r.sample(keyword_ids_, r.randint(2, 8))
+        for key in StandInArchive.KEYWORD_KEYS:
+            values = [k for k in keywords if self.keywords[k]['meta_key_id'] == key]
+            if values:
+                self.__add_meta_datum(e, key, 'MetaDatum::Keywords', values)
+        # media file and previews
+        kind = r.random()
+        if kind < 0.8:
+            extension, media_type = '.jpg', 'image'
+        elif kind < 0.95:
+            extension, media_type = '.mp4', 'video'
+        else:
+            extension, media_type = '.pdf', 'document'
+        width, height = r.choice([(4000, 3000), (3000, 4000), (3000, 3000), (1920, 1080), (1080, 1920)])
+        mf = self.__uuid()
+        self.media_files[mf] = {'id': mf, 'filename': 'file{}{}'.format(index_, extension), 'media_entry_id': e,
+                                'size': width * height // 4, 'previews': []}
+        self.entries[e]['media_file_id'] = mf
+        if media_type == 'video':
+            self.__add_preview(mf, 'video', 'video/mp4', None, width, height)
+        for thumbnail, edge in StandInArchive.THUMBNAILS:
+            scale = min(1.0, edge / max(width, height))
+            self.__add_preview(mf, 'image', 'image/jpeg', thumbnail, int(width * scale), int(height * scale))
+
+    def __add_meta_datum(self, entry_id_, key_, type_, value_):
+        m = self.__uuid()
+        self.meta_data[m] = {'id': m, 'meta_key_id': key_, 'type': type_, 'value': value_,
+                             'media_entry_id': entry_id_}
+        self.entries[entry_id_]['meta_data'][key_] = m
+
+    def __add_preview(self, media_file_id_, media_type_, content_type_, thumbnail_, width_, height_):
+        p = self.__uuid()
+        self.previews[p] = {'id': p, 'media_type': media_type_, 'content_type': content_type_,
+                            'filename': '{}.{}'.format(p, 'mp4' if media_type_ == 'video' else 'jpg'),
+                            'thumbnail': thumbnail_, 'width': width_, 'height': height_,
+                            'created_at': '2017-01-01T00:00:00.000Z', 'updated_at': '2017-01-01T00:00:00.000Z',
+                            'media_file_id': media_file_id_}
+        self.media_files[media_file_id_]['previews'].append(p)
+
+    @property
+    def entry_ids(self):
+        return self.__entry_ids[:]
+
+    def resolve(self, path_: str):
+        """
+        Answers an api path like the Madek server.
+        :param path_: path including query string, e.g. '/api/media-entries/?order=desc'
+        :return: tuple with status code, content type and body as bytes
+        """
+        split = urlsplit(path_)
+        query = parse_qs(split.query)
+        parts = [p for p in split.path.split('/') if p]
+        if len(parts) < 2 or parts[0] != 'api':
+            return self.__not_found(path_)
+        resource = parts[1]
+        id_ = parts[2] if len(parts) > 2 else None
+        if resource == 'auth-info':
+            return self.__json({'type': 'ApiClient', 'login': 'standin'})
+        if resource == 'media-entries' and not id_:
+            return self.__json(self.list_media_entries(query))
+        if resource == 'media-entries' and id_ in self.entries:
+            if len(parts) > 3 and parts[3] == 'meta-data':
+                return self.__json(self.meta_data_of(id_, query))
+            return self.__json(self.media_entry(id_))
+        if resource == 'meta-data' and id_ in self.meta_data:
+            return self.__json(self.meta_datum(id_))
+        if resource == 'people' and id_ in self.people:
+            return self.__json(self.people[id_])
+        if resource == 'keywords' and id_ in self.keywords:
+            return self.__json(self.keywords[id_])
+        if resource == 'media-files' and id_ in self.media_files:
+            if len(parts) > 3 and parts[3] == 'data-stream':
+                return 200, 'image/jpeg', self.data_stream(self.media_files[id_]['previews'][-1])
+            return self.__json(self.media_file(id_))
+        if resource == 'previews' and id_ in self.previews:
+            if len(parts) > 3 and parts[3] == 'data-stream':
+                return 200, 'image/jpeg', self.data_stream(id_)
+            return self.__json(self.preview(id_))
+        return self.__not_found(path_)
+
+    def list_media_entries(self, query_: dict):
+        page = int(query_.get('page', ['1'])[0])
+        ids = self.filter_entries(query_)
+        start = (page - 1) * StandInArchive.PAGE_SIZE
+        relations = {}
+        for i in ids[start:start + StandInArchive.PAGE_SIZE]:
+            relations[i] = {'name': 'Media-Entry', 'href': '/api/media-entries/{}'.format(i)}
+        collection = {'relations': relations}
+        if start + StandInArchive.PAGE_SIZE < len(ids):
+            q = dict((k, v[0]) for k, v in query_.items())
+            q['page'] = page + 1
+            collection['next'] = {'href': '/api/media-entries/?{}'.format(urlencode(sorted(q.items())))}
+        return {'_json-roa': {'collection': collection}}
+
+    def filter_entries(self, query_: dict):
+        """
+        Returns the ids of all entries that match the filter of the query.
+        Filters with ids that are unknown to the archive are answered with a stable pseudo random
+        subset, so that real program definitions can be used as well.
+        """
+        filter_by = query_.get('filter_by', [None])[0]
+        collection_id = query_.get('collection_id', [None])[0]
+        if not filter_by and not collection_id:
+            return self.__entry_ids[:]
+        try:
+            conditions = json.loads(filter_by)['meta_data'] if filter_by else []
+        except (ValueError, KeyError, TypeError):
+            conditions = []
+        ids = self.__entry_ids
+        known = bool(conditions)
+        for c in conditions:
+            value = c.get('value')
+            if value not in self.keywords and value not in self.people:
+                known = False
+                break
+            ids = [i for i in ids if self.__has_value(i, c.get('key'), value)]
+        if known:
+            return ids
+        # unknown filter: between none and a hundred entries depending on the filter
+        r = random.Random(zlib.crc32('{}{}'.format(filter_by, collection_id).encode('utf-8')))
+        return r.sample(self.__entry_ids, min(len(self.__entry_ids), r.choice([0, 5, 20, 40, 60, 100])))
+
+    def __has_value(self, entry_id_, key_, value_):
+        for k, m in self.entries[entry_id_]['meta_data'].items():
+            if key_ in (k, 'any'):
+                v = self.meta_data[m]['value']
+                if type(v) is list and value_ in v:
+                    return True
+        return False
+
+    def media_entry(self, id_):
+        e = self.entries[id_]
+        return {'id': e['id'], 'created_at': e['created_at'], 'is_published': e['is_published'],
+                'responsible_user_id': e['responsible_user_id'],
+                '_json-roa': {'relations': {
+                    'meta-data': {'href': '/api/media-entries/{}/meta-data/{{?meta_keys}}'.format(id_)},
+                    'media-file': {'href': '/api/media-files/{}'.format(e['media_file_id'])}}}}
+
+    def meta_data_of(self, id_, query_: dict):
+        keys = None
+        if 'meta_keys' in query_:
+            try:
+                keys = json.loads(query_['meta_keys'][0])
+            except ValueError:
+                keys = None
+        relations = {}
+        for k, m in self.entries[id_]['meta_data'].items():
+            if keys is None or k in keys:
+                relations[k] = {'name': 'Meta-Datum', 'href': '/api/meta-data/{}'.format(m)}
+        return {'media_entry_id': id_, '_json-roa': {'collection': {'relations': relations}}}
+
+    def meta_datum(self, id_):
+        m = self.meta_data[id_]
+        j = {'id': m['id'], 'meta_key_id': m['meta_key_id'], 'type': m['type'], 'value': m['value'],
+             'media_entry_id': m['media_entry_id']}
+        if type(m['value']) is list:
+            relations = {}
+            for v in m['value']:
+                if v in self.people:
+                    relations[v] = {'name': 'Person', 'href': '/api/people/{}'.format(v)}
+                else:
+                    relations[v] = {'name': 'Keyword', 'href': '/api/keywords/{}'.format(v)}
+            j['value'] = [{'id': v} for v in m['value']]
+            j['_json-roa'] = {'collection': {'relations': relations}}
+        return j
+
+    def media_file(self, id_):
+        mf = self.media_files[id_]
+        return {'id': mf['id'], 'filename': mf['filename'], 'media_entry_id': mf['media_entry_id'],
+                'size': mf['size'], 'previews': [{'id': p} for p in mf['previews']],
+                '_json-roa': {'relations': {'data-stream': {'href': '/api/media-files/{}/data-stream'.format(id_)}},
+                              'collection': {'relations': dict(
+                                  (p, {'name': 'Preview', 'href': '/api/previews/{}'.format(p)})
+                                  for p in mf['previews'])}}}
+
+    def preview(self, id_):
+        j = dict(self.previews[id_])
+        j['_json-roa'] = {'relations': {'data-stream': {'href': '/api/previews/{}/data-stream'.format(id_)}}}
+        return j
+
+    def data_stream(self, id_):
+        """
+        Returns a JPEG with the size of the preview. Videos are answered with a still image as well.
+        """
+        p = self.previews[id_]
+        size = (max(1, p['width']), max(1, p['height']))
+        if size not in self.__images:
+            from PIL import Image
+            b = io.BytesIO()
+            Image.new('RGB', size, (122, 157, 41)).save(b, 'JPEG')
+            self.__images[size] = b.getvalue()
+        return self.__images[size]
+
+    def __json(self, json_):
+        return 200, 'application/json-roa+json', json.dumps(json_).encode('utf-8')
+
+    def __not_found(self, path_):
+        return 404, 'application/json-roa+json', json.dumps(
+            {'errors': [{'detail': 'Not found: {}'.format(path_)}]}).encode('utf-8')
@@ -0,0 +1,23 @@
+from content.api import ApiClient
+from standin.archive import StandInArchive
+
+
+class StandInApiClient(ApiClient):
+    """
+    ApiClient that answers all requests in-process from a StandInArchive instead of the network.
+    """
+
+    def __init__(self, archive_: StandInArchive=None):
+        super(StandInApiClient, self).__init__('standin', 'standin', 'standin')
+        self.archive = archive_ if archive_ else StandInArchive()
+        # requests over all sessions
+        self.total_requests = 0
+
+    async def send_request(self, path_, **kwargs):
+        self._request_counter += 1
+        self.total_requests += 1
+        status, content_type, body = self.archive.resolve(path_)
+        data = self.decoder.decode(body)
+        if status != 200:
+            print('received {} for {}'.format(data, path_))
+        return data
@@ -0,0 +1,38 @@
+import pyglet
+
+from system.clock import Clock
+
+
+class StandInMediaDisplay(pyglet.event.EventDispatcher):
+    """
+    MediaDisplay for the headless mode. It neither downloads nor draws anything
+    and only keeps the time of the entry on the clock.
+    """
+
+    def __init__(self, media_entry_, screen_, program_=None, index_=None):
+        super(StandInMediaDisplay, self).__init__()
+        self.media_entry = media_entry_
+        self.program = program_
+        self.index = index_
+        self.screen = screen_
+        self.area = None
+
+    @staticmethod
+    def prepare(media_entry_):
+        pass
+
+    def show(self):
+        Clock().schedule_once(self.on_timer_end, self.media_entry.duration)
+        self.dispatch_event('on_show', self)
+
+    def draw(self):
+        pass
+
+    def on_timer_end(self, seconds_):
+        self.dispatch_event('on_end', self, self.screen)
+
+    def hide(self):
+        Clock().unschedule(self.on_timer_end)
+
+StandInMediaDisplay.register_event_type('on_show')
+StandInMediaDisplay.register_event_type('on_end')
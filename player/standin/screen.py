@@ -0,0 +1,84 @@
+from content.mediaentry import MediaEntryData
+
+
+class StandInScreen():
+    """
+    Screen without a window for the headless mode. It has the interface the Dispatcher needs
+    and counts what happens on it instead of drawing.
+    """
+
+    RESOLUTION_WIDTH = 1920
+    RESOLUTION_HEIGHT = 1080
+
+    # ids of all entries shown on any stand-in screen
+    _shown_ids = set()
+
+    def __init__(self, index_, width_=RESOLUTION_WIDTH, height_=RESOLUTION_HEIGHT, info_capable_=True):
+        self.__index = index_
+        self.info_capable = info_capable_
+        self.__virtual_width = width_
+        self.__virtual_height = height_
+        self.__info_mode = False
+        self.__media = None
+        self.orientation = MediaEntryData.get_orientation(width_, height_)
+        # counters
+        self.shown = 0
+        self.matching = 0
+        self.repeats = 0
+        self.info_turns = 0
+        self.layouts = 0
+
+    @property
+    def media(self):
+        return self.__media
+
+    @property
+    def get_width(self):
+        return self.__virtual_width
+
+    @property
+    def get_height(self):
+        return self.__virtual_height
+
+    @property
+    def index(self):
+        return self.__index
+
+    @property
+    def is_info(self):
+        return self.__info_mode
+
+    @property
+    def is_empty(self):
+        return not self.__media and not self.__info_mode
+
+    def set_info_mode(self, info_=True):
+        if info_ != self.__info_mode:
+            if info_:
+                self.__media = None
+                self.info_turns += 1
+            self.__info_mode = info_
+
+    def set_media(self, media_):
+        if not self.__info_mode:
+            if self.__media:
+                self.__media.hide()
+            self.__media = media_
+            media_.show()
+            self.shown += 1
+            if media_.media_entry.orientation == self.orientation:
+                self.matching += 1
+            if media_.media_entry.id in StandInScreen._shown_ids:
+                self.repeats += 1
+            StandInScreen._shown_ids.add(media_.media_entry.id)
+
+    def clear_media(self):
+        if self.__media:
+            self.__media.hide()
+        self.__media = None
+
+    def update_info_layout(self):
+        self.layouts += 1
+
+    def __str__(self):
+        return 'StandInScreen {}'.format(self.index+1)
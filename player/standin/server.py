@@ -0,0 +1,54 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from standin.archive import StandInArchive
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """
+    Local HTTP server that answers requests with a StandInArchive.
+    It runs in a daemon thread and can be used instead of the Madek server.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, archive_: StandInArchive=None, host_: str='127.0.0.1', port_: int=0):
+        """
+        :param archive_: StandInArchive, a default one is created if None
+        :param port_: 0 picks a free port
+        """
+        HTTPServer.__init__(self, (host_, port_), StandInRequestHandler)
+        self.archive = archive_ if archive_ else StandInArchive()
+        self.request_counter = 0
+        self.__thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.request_counter += 1
+        status, content_type, body = self.server.archive.resolve(self.path)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format_, *args):
+        pass
@@ -0,0 +1,25 @@
+import time
+
+
+class StandInSink():
+    """
+    Sink for the Announcer that keeps the announcements instead of posting them,
+    optionally slow or failing like an unreachable Twitter endpoint.
+    """
+
+    def __init__(self, latency_: float=0, failures_: int=0):
+        """
+        :param latency_: seconds every post takes
+        :param failures_: number of posts that fail before posts succeed
+        """
+        self._latency = latency_
+        self._failures = failures_
+        self.attempts = 0
+        self.posts = []
+
+    def post(self, text_: str):
+        self.attempts += 1
+        time.sleep(self._latency)
+        if self.attempts <= self._failures:
+            raise ConnectionError('stand-in sink is unreachable')
+        self.posts.append(text_)
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from collections import Counter
+
+
+class TwitterSink():
+    """
+    Posts announcements to Twitter. The twitter package and the credentials are only imported
+    with the first post, in the thread of the Announcer.
+    """
+
+    def __init__(self):
+        self._api = None
+
+    def post(self, text_: str):
+        """
+        :raises Exception: any error of the twitter package, e.g. twitter.TwitterError
+        """
+        if not self._api:
+            import twitter
+            from twitter_access import twitter_consumer_key, twitter_consumer_secret, \
+                twitter_access_token, twitter_access_token_secret
+            self._api = twitter.Api(consumer_key=twitter_consumer_key,
+                                    consumer_secret=twitter_consumer_secret,
+                                    access_token_key=twitter_access_token,
+                                    access_token_secret=twitter_access_token_secret,
+                                    timeout=Announcer.TIMEOUT)
+        self._api.PostUpdate(text_)
+
+
+class Announcer(threading.Thread):
+    """
+    Posts announcements from a bounded queue in the background, so that a slow or unreachable sink
+    never delays the playout. Posts are spaced by a minimum interval and retried with a growing delay.
+    When the queue is full the oldest announcement is dropped, it is outdated anyway.
+    """
+
+    # seconds a post may take
+    TIMEOUT = 20
+
+    def __init__(self, sink_, size_: int=5, interval_: float=60, retries_: int=3, backoff_: float=30):
+        """
+        :param sink_: object with a method post(text), e.g. TwitterSink or StandInSink
+        :param size_: number of announcements waiting at most
+        :param interval_: minimum seconds between two posts
+        :param retries_: number of retries of a failed post
+        :param backoff_: seconds before the first retry, doubled with every further retry
+        """
+        super(Announcer, self).__init__(daemon=True)
+        self._sink = sink_
+        self._queue = queue.Queue(size_)
+        self._interval = interval_
+        self._retries = retries_
+        self._backoff = backoff_
+        self._stopped = threading.Event()
+        self._last_post = None
+        # counts queued, dropped, posted, retried and failed announcements
+        self.stats = Counter()
+
+    def announce(self, text_: str):
+        """
+        Queues an announcement and returns right away.
+        """
+        while True:
+            try:
+                self._queue.put_nowait(text_)
+                break
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.stats['dropped'] += 1
+                except queue.Empty:
+                    pass
+        self.stats['queued'] += 1
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                text = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self.post(text)
+
+    def post(self, text_: str):
+        for attempt in range(self._retries + 1):
+            if self._last_post is not None:
+                # rate limit
+                if self._stopped.wait(self._last_post + self._interval - time.monotonic()):
+                    return
+            self._last_post = time.monotonic()
+            try:
+                self._sink.post(text_)
+                self.stats['posted'] += 1
+                return
+            except Exception as exc:
+                print('Announcing {} failed: {}'.format(text_, exc))
+            if attempt < self._retries:
+                self.stats['retried'] += 1
+                if self._stopped.wait(self._backoff * 2 ** attempt):
+                    return
+        self.stats['failed'] += 1
+
+    def stop(self):
+        self._stopped.set()
+
+    def __str__(self):
+        return 'Announcer {} queued, {} posted, {} retried, {} failed, {} dropped'.format(
+            self.stats['queued'], self.stats['posted'], self.stats['retried'], self.stats['failed'],
+            self.stats['dropped'])
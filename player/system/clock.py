@@ -0,0 +1,99 @@
+import heapq
+
+import pyglet
+
+
+class Clock:
+    """
+    Singleton that forwards scheduling either to the default pyglet clock or to an installed VirtualClock.
+    """
+
+    instance = None
+
+    def __init__(self, clock_=None):
+        """
+        :param clock_: optional clock that replaces the pyglet clock, e.g. VirtualClock
+        """
+        if clock_:
+            Clock.instance = clock_
+        elif not Clock.instance:
+            Clock.instance = pyglet.clock.get_default()
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+
+class VirtualClock():
+    """
+    Clock with the scheduling interface of pyglet.clock that only moves forward when advanced.
+    Used for headless simulations that run days of playout in seconds.
+    """
+
+    # duration of a frame for functions scheduled with schedule()
+    FRAME = 1 / 60
+
+    def __init__(self, start_: float=0):
+        self.__time = start_
+        self.__queue = []
+        self.__counter = 0
+
+    def time(self):
+        return self.__time
+
+    def schedule(self, func_, *args, **kwargs):
+        self.__push(func_, self.__time + VirtualClock.FRAME, VirtualClock.FRAME, args, kwargs)
+
+    def schedule_once(self, func_, delay_, *args, **kwargs):
+        self.__push(func_, self.__time + delay_, None, args, kwargs)
+
+    def schedule_interval(self, func_, interval_, *args, **kwargs):
+        self.__push(func_, self.__time + interval_, interval_, args, kwargs)
+
+    def unschedule(self, func_):
+        for _, _, item in self.__queue:
+            if item.func == func_:
+                item.cancelled = True
+
+    def sleep(self, seconds_: float):
+        """
+        Moves the time forward without processing events, like a blocking call in the real player.
+        Events that became due are processed late by the next advance().
+        """
+        self.__time += seconds_
+
+    def advance(self, seconds_: float):
+        """
+        Processes all events that are due within the given time.
+        """
+        end = self.__time + seconds_
+        while self.__queue and self.__queue[0][0] <= max(end, self.__time):
+            t, _, item = heapq.heappop(self.__queue)
+            if item.cancelled:
+                continue
+            self.__time = max(self.__time, t)
+            dt = self.__time - item.last
+            item.last = self.__time
+            if item.interval:
+                heapq.heappush(self.__queue, (max(t + item.interval, self.__time), self.__next_counter(), item))
+            item.func(dt, *item.args, **item.kwargs)
+        self.__time = max(self.__time, end)
+
+    def __push(self, func_, time_, interval_, args_, kwargs_):
+        item = ScheduledItem(func_, self.__time, interval_, args_, kwargs_)
+        heapq.heappush(self.__queue, (time_, self.__next_counter(), item))
+
+    def __next_counter(self):
+        # keeps the order of events with the same time
+        self.__counter += 1
+        return self.__counter
+
+
+class ScheduledItem():
+
+    def __init__(self, func_, last_, interval_, args_, kwargs_):
+        self.func = func_
+        self.last = last_
+        self.interval = interval_
+        self.args = args_
+        self.kwargs = kwargs_
+        self.cancelled = False
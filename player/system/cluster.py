@@ -0,0 +1,200 @@
+import asyncio
+import queue
+import threading
+import time
+import urllib.parse
+from collections import deque, Counter
+
+import requests
+
+from content.api import ApiClient
+from content.program import Program
+from system.clock import Clock
+from system.config import Config
+from system.proxy import CachingProxy, ProxyRequestHandler
+
+
+class ClusterServer(CachingProxy):
+    """
+    HTTP server of the cluster leader. It publishes the clock and the timeline of the leader
+    and answers all other requests from a cache of the Madek server, so that the leader and
+    all followers share one set of API requests and downloads.
+    """
+
+    def __init__(self, upstream_: str, auth_: tuple=None, host_: str='127.0.0.1', port_: int=0,
+                 cache_bytes_: int=None, history_: int=200):
+        """
+        :param upstream_: URL of the Madek server
+        :param auth_: tuple with user and password for the Madek server, which the server uses for every
+                      request it passes on, so it should only listen on a trusted network
+        :param host_: address the server listens on, only the local host by default
+        :param port_: 0 picks a free port
+        :param cache_bytes_: budget of the cache, by default Config.CLUSTER_CACHE_BYTES
+        :param history_: number of timeline events kept for followers
+        """
+        super(ClusterServer, self).__init__(upstream_, auth_, host_, port_,
+                                            cache_bytes_ if cache_bytes_ else Config.CLUSTER_CACHE_BYTES,
+                                            handler_class_=ClusterRequestHandler)
+        self._events = deque(maxlen=history_)
+        self._seq = 0
+        self._events_lock = threading.Lock()
+
+    def publish(self, event_: dict):
+        """
+        Adds an event with the leader time to the timeline.
+        """
+        with self._events_lock:
+            self._seq += 1
+            event_['seq'] = self._seq
+            event_.setdefault('time', time.time())
+            self._events.append(event_)
+
+    def timeline(self, since_: int=0):
+        with self._events_lock:
+            return [e for e in self._events if e['seq'] > since_]
+
+    def on_media(self, screen_, media_entry_, index_, info_screen_, program_):
+        """
+        Handler for the on_media event of the Dispatcher.
+        """
+        self.publish({'screen': screen_.index, 'entry': media_entry_.id, 'index': index_,
+                      'info': info_screen_.index if info_screen_ else None,
+                      'program': program_.name if program_ else None,
+                      'meta_data': program_.meta_data_white_list if program_ else None})
+
+
+class ClusterRequestHandler(ProxyRequestHandler):
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path == '/cluster/time':
+            self.send_json({'time': time.time()})
+        elif url.path == '/cluster/timeline':
+            self.server.stats['timeline'] += 1
+            since = int(urllib.parse.parse_qs(url.query).get('since', ['0'])[0])
+            self.send_json({'time': time.time(), 'events': self.server.timeline(since)})
+        else:
+            super(ClusterRequestHandler, self).do_GET()
+
+
+class ClusterFollower(threading.Thread):
+    """
+    Plays the timeline of a cluster leader on the local screens, a fixed delay after the leader
+    so that the entries can be loaded through the cache of the leader in time.
+    The clock offset to the leader is measured from time to time.
+    """
+
+    # seconds the playout follows the leader
+    DELAY = 5
+    # seconds between clock measurements
+    SYNC_INTERVAL = 60
+
+    def __init__(self, leader_: str, screens_, display_class_, delay_: float=DELAY, interval_: float=1):
+        """
+        :param leader_: URL of the ClusterServer of the leader
+        :param screens_: list of Screen instances
+        :param display_class_: class that turns a media entry into something shown on a screen
+        :param delay_: seconds the playout follows the leader
+        :param interval_: seconds between requests for the timeline
+        """
+        super(ClusterFollower, self).__init__(daemon=True)
+        self._leader = leader_
+        self._screens = screens_
+        self._display_class = display_class_
+        self.delay = delay_
+        self._interval = interval_
+        # leader time minus local time
+        self.offset = 0
+        self.round_trip = None
+        self._since = 0
+        self._synced = 0
+        self._programs = {}
+        self._ready = queue.Queue()
+        self._stopped = threading.Event()
+        # entries played, late or failed to load
+        self.stats = Counter()
+
+    def run(self):
+        # the thread needs its own event loop and session
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        api = ApiClient(self._leader, '', '')
+        while not self._stopped.wait(self._interval):
+            try:
+                if time.time() - self._synced > ClusterFollower.SYNC_INTERVAL:
+                    self.sync_clock()
+                self.load_timeline(api)
+            except (requests.RequestException, ValueError) as exc:
+                print('Cluster leader not available: {}'.format(exc))
+
+    def sync_clock(self, samples_: int=5):
+        """
+        Measures the offset to the clock of the leader with the sample of the shortest round trip.
+        """
+        best = None
+        for _ in range(samples_):
+            start = time.time()
+            leader = requests.get('{}/cluster/time'.format(self._leader), timeout=2).json()['time']
+            end = time.time()
+            if best is None or end - start < best[0]:
+                best = (end - start, leader - 0.5 * (start + end))
+        self.round_trip, self.offset = best
+        self._synced = time.time()
+
+    def load_timeline(self, api_):
+        j = requests.get('{}/cluster/timeline'.format(self._leader), params={'since': self._since}, timeout=5).json()
+        events = j['events']
+        if not events:
+            return
+        self._since = events[-1]['seq']
+        # events that are already over are skipped, except the last one of each screen
+        last = {}
+        for e in events:
+            last[e['screen']] = e
+        events = [e for e in events if e['time'] + self.delay > j['time'] or last[e['screen']] is e]
+        loop = api_.start_session()
+        entries = loop.run_until_complete(asyncio.gather(
+            *[api_.get_media_entry(id_=e['entry'], meta_data_white_list_=e['meta_data']) for e in events],
+            return_exceptions=True))
+        api_.complete_session()
+        for e, m in zip(events, entries):
+            if m and not isinstance(m, Exception):
+                self._ready.put((e, m))
+            else:
+                self.stats['failed'] += 1
+
+    def on_clock(self, dt):
+        """
+        Schedules the loaded entries on the local clock, to be called regularly in the main thread.
+        """
+        while not self._ready.empty():
+            event, entry = self._ready.get()
+            self._display_class.prepare(entry)
+            delay = event['time'] + self.delay - self.offset - time.time()
+            if delay < 0:
+                self.stats['late'] += 1
+            Clock().schedule_once(self.play, max(0, delay), event, entry)
+
+    def play(self, dt, event_, entry_):
+        if event_['screen'] >= len(self._screens):
+            return
+        for s in self._screens:
+            info = s.index == event_['info']
+            if info and not s.is_info and s.media:
+                # hidden first, so that its video player stops and its texture goes back to the pool
+                s.clear_media()
+            s.set_info_mode(info)
+        screen = self._screens[event_['screen']]
+        screen.set_media(self._display_class(entry_, screen, self.get_program(event_), event_['index']))
+        self.stats['played'] += 1
+        if event_['info'] is not None and event_['info'] < len(self._screens):
+            self._screens[event_['info']].update_info_layout()
+
+    def get_program(self, event_):
+        # programs of the leader only provide name and meta data for the info screen
+        name = event_['program']
+        if name not in self._programs:
+            self._programs[name] = Program(None, {'name': name, 'parameters': {}, 'meta_data': event_['meta_data']})
+        return self._programs[name]
+
+    def stop(self):
+        self._stopped.set()
@@ -11,8 +11,25 @@ class Config:
     """
 
     META_DATA_MINIMUM = ['madek_core:authors', 'madek_core:title', 'madek_core:copyright_notice']
+    META_DATA_WHITE_LIST = ['madek_core:authors', 'madek_core:description', 'madek_core:title', 'media_content:title',
+                            'media_content:date_created', 'madek_core:keywords', 'media_set:title',
+                            'institution:institutional_affiliation', 'madek_core:copyright_notice']
     GREEN = (122, 157, 41, 255)
     FONT = 'Open Sans Medium'
+    # bytes of video memory for the textures of images
+    TEXTURE_BUDGET = 256 * 1024 * 1024
+    # bytes of upcoming images copied into textures per frame, a 1920x1080 image takes about 8 frames
+    UPLOAD_BYTES_PER_FRAME = 1024 * 1024
+    # bytes of a decoded image that is passed to a render process, larger images are loaded by the renderer
+    FRAME_BYTES = 1920 * 1920 * 4
+    # bytes of API responses and media files the cluster leader keeps for its followers
+    CLUSTER_CACHE_BYTES = 512 * 1024 * 1024
+    # bytes of API responses and media files the caching proxy keeps in memory, all of them are also kept on disk
+    PROXY_CACHE_BYTES = 256 * 1024 * 1024
+    PROXY_CACHE_DIR = str(Path(Path.home(), 'player_cache'))
+    # bytes per second of media files that are shown soon and of media files of upcoming programs
+    DOWNLOAD_FOREGROUND_RATE = 12 * 1024 * 1024
+    DOWNLOAD_BACKGROUND_RATE = 2 * 1024 * 1024
     instance = None
 
     class __Config:
@@ -22,6 +39,8 @@ class Config:
             self.__server = None
             self.__meta_datum_white_list = []
             self.__dev_mode = False
+            self.__log_dir = str(Path(Path.home(), 'player_log'))
+            self.__screen_sizes = []
 
         def set_server(self, server_):
             self.__server = server_
@@ -46,6 +65,15 @@ class Config:
         def set_dev_mode(self, dev_mode_):
             self.__dev_mode = dev_mode_
 
+        def set_log_dir(self, log_dir_):
+            self.__log_dir = log_dir_
+
+        def set_screen_sizes(self, sizes_):
+            """
+            :param sizes_: list of tuples with the virtual width and height of the screens, used to choose previews
+            """
+            self.__screen_sizes = sizes_
+
         @property
         def server(self):
             return self.__server
@@ -64,7 +92,11 @@ class Config:
 
         @property
         def log_dir(self):
-            return str(Path(Path.home(), 'player_log'))
+            return self.__log_dir
+
+        @property
+        def screen_sizes(self):
+            return self.__screen_sizes
 
 
     def __init__(self):
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import Counter
+
+import requests
+
+from system.config import Config
+
+
+class TokenBucket():
+    """
+    Limits the bytes per second of the downloads that take from it. A download may take more tokens than
+    the bucket holds and waits until they are refilled, so that large chunks do not starve.
+    """
+
+    def __init__(self, rate_: float, burst_: float=None):
+        """
+        :param rate_: bytes per second, None or 0 for no limit
+        :param burst_: bytes that can be taken at once after a pause, by default one second of the rate
+        """
+        self.rate = rate_
+        self._burst = burst_ if burst_ else rate_
+        self._tokens = self._burst
+        self._time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, bytes_: int):
+        """
+        Takes tokens for the given bytes and waits until they are available.
+        :return: seconds waited
+        """
+        if not self.rate:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._time) * self.rate)
+            self._time = now
+            self._tokens -= bytes_
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class Transfer():
+    """
+    Progress of a running download.
+    """
+
+    def __init__(self, url_, priority_, deadline_=None):
+        self.url = url_
+        self.priority = priority_
+        self.deadline = deadline_
+        self.start = time.monotonic()
+        self.total = None
+        self.received = 0
+
+    @property
+    def at_risk(self):
+        """
+        True if the download is not expected to be complete at its deadline at the current rate.
+        """
+        if self.deadline is None:
+            return False
+        now = time.monotonic()
+        if now >= self.deadline:
+            return True
+        if not self.total or not self.received:
+            return False
+        rate = self.received / max(now - self.start, 1e-6)
+        return now + (self.total - self.received) / rate > self.deadline
+
+
+class DownloadManager:
+    """
+    Singleton class that downloads media files with separate bandwidth budgets for files that are shown soon
+    (foreground) and files of upcoming programs (background). Background downloads pause while a foreground
+    download is expected to miss the time its entry is shown.
+    """
+
+    FOREGROUND = 'foreground'
+    BACKGROUND = 'background'
+    # seconds until an entry that is prepared is usually shown
+    SLOT = 20
+
+    instance = None
+
+    class __DownloadManager:
+
+        # bytes read at once
+        CHUNK = 64 * 1024
+        # seconds between checks whether a paused background download may continue
+        PAUSE_INTERVAL = 0.1
+
+        def __init__(self, foreground_rate_, background_rate_):
+            """
+            :param foreground_rate_: bytes per second of all foreground downloads, None for no limit
+            :param background_rate_: bytes per second of all background downloads, None for no limit
+            """
+            self.buckets = {DownloadManager.FOREGROUND: TokenBucket(foreground_rate_),
+                            DownloadManager.BACKGROUND: TokenBucket(background_rate_)}
+            self._transfers = []
+            self._lock = threading.Lock()
+            self._session = threading.local()
+            # counts bytes and files by priority, seconds throttled and paused, promoted background downloads,
+            # foreground downloads that ended after their slot and files that were not cached when they were due
+            self.stats = Counter()
+
+        def fetch(self, url_, file_, priority_=None, slot_=None):
+            """
+            Downloads a file. This blocks until it is downloaded.
+            :param url_: URL of the file
+            :param file_: file object the content is written to, it is truncated first
+            :param priority_: DownloadManager.FOREGROUND or DownloadManager.BACKGROUND
+            :param slot_: seconds until the file is needed, only for foreground downloads
+            :return: True if the file was downloaded
+            """
+            priority = priority_ if priority_ else DownloadManager.FOREGROUND
+            transfer = Transfer(url_, priority, time.monotonic() + slot_ if slot_ is not None else None)
+            with self._lock:
+                self._transfers.append(transfer)
+            try:
+                file_.seek(0)
+                file_.truncate()
+                # the connection goes back to the pool of the session when the response is closed
+                with self.get_session().get(url_, auth=Config().api_auth, stream=True, timeout=30) as response:
+                    if response.status_code != 200:
+                        return False
+                    length = response.headers.get('Content-Length')
+                    transfer.total = int(length) if length and length.isdigit() else None
+                    for chunk in response.iter_content(self.CHUNK):
+                        # the priority changes when a background download is promoted
+                        if transfer.priority == DownloadManager.BACKGROUND:
+                            self.stats['paused_seconds'] += self.wait_for_foreground()
+                        self.stats['{}_throttled_seconds'.format(transfer.priority)] += \
+                            self.buckets[transfer.priority].take(len(chunk))
+                        file_.write(chunk)
+                        transfer.received += len(chunk)
+                file_.flush()
+                self.stats['{}_bytes'.format(transfer.priority)] += transfer.received
+                self.stats['{}_files'.format(transfer.priority)] += 1
+                return True
+            except (requests.RequestException, OSError) as exc:
+                print('Downloading {} failed: {}'.format(url_, exc))
+                return False
+            finally:
+                with self._lock:
+                    self._transfers.remove(transfer)
+                    if transfer.deadline is not None:
+                        if transfer.deadline <= transfer.start:
+                            self.stats['due'] += 1
+                        elif time.monotonic() > transfer.deadline:
+                            self.stats['late'] += 1
+
+        def promote(self, url_, slot_=None):
+            """
+            Turns a running background download into a foreground download, e.g. because its entry is due
+            while the prefetcher is still downloading it.
+            :param slot_: seconds until the file is needed, by default DownloadManager.SLOT
+            :return: True if a background download of the URL was running
+            """
+            with self._lock:
+                for t in self._transfers:
+                    if t.url == url_ and t.priority == DownloadManager.BACKGROUND:
+                        t.priority = DownloadManager.FOREGROUND
+                        t.deadline = time.monotonic() + (slot_ if slot_ is not None else DownloadManager.SLOT)
+                        self.stats['promoted'] += 1
+                        return True
+            return False
+
+        def wait_for_foreground(self):
+            """
+            Waits while a foreground download is at risk of missing its slot.
+            :return: seconds waited
+            """
+            start = time.monotonic()
+            while self.at_risk:
+                time.sleep(self.PAUSE_INTERVAL)
+            return time.monotonic() - start
+
+        @property
+        def at_risk(self):
+            with self._lock:
+                return any(t.priority == DownloadManager.FOREGROUND and t.at_risk for t in self._transfers)
+
+        def get_session(self):
+            # every thread keeps its connections to the Madek server
+            session = getattr(self._session, 'session', None)
+            if not session:
+                session = self._session.session = requests.Session()
+            return session
+
+        def __str__(self):
+            mb = 1024 * 1024
+            return 'DownloadManager {:.1f} MB foreground, {:.1f} MB background, {} late, {} due, {} promoted, ' \
+                   '{:.1f} s paused'.format(self.stats['foreground_bytes'] / mb, self.stats['background_bytes'] / mb,
+                                            self.stats['late'], self.stats['due'], self.stats['promoted'],
+                                            self.stats['paused_seconds'])
+
+    def __init__(self, foreground_rate_=None, background_rate_=None):
+        if not DownloadManager.instance:
+            DownloadManager.instance = DownloadManager.__DownloadManager(
+                foreground_rate_ if foreground_rate_ else Config.DOWNLOAD_FOREGROUND_RATE,
+                background_rate_ if background_rate_ else Config.DOWNLOAD_BACKGROUND_RATE)
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def __str__(self):
+        return str(self.instance)
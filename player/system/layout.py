@@ -0,0 +1,70 @@
+import simplejson as json
+
+
+class ScreenDefinition():
+    """
+    A single output of the player as defined in the screen layout.
+    """
+
+    def __init__(self, index_, json_=None):
+        """
+        :param index_: position of the screen in the layout
+        :param json_: dict with width, height, display, info and optionally x and y
+        """
+        json_ = json_ or {}
+        self.index = index_
+        # virtual resolution, which also defines the orientation
+        self.width = json_.get('width', 1920)
+        self.height = json_.get('height', 1080)
+        # physical screen of the display, ignored if there is only one
+        self.display = json_.get('display', index_)
+        # whether the screen can show the info about the content of the others
+        self.info = json_.get('info', True)
+        # window position in single screen mode, by default the windows are placed side by side
+        self.x = json_.get('x')
+        self.y = json_.get('y')
+
+    def __str__(self):
+        return 'ScreenDefinition {} {}x{}'.format(self.index + 1, self.width, self.height)
+
+
+class ScreenLayout():
+    """
+    Defines number, resolution, placement and info capability of the screens.
+    """
+
+    def __init__(self, screens_=None):
+        """
+        :param screens_: list of dicts as in the screens file, None for the default layout
+        """
+        if screens_ is None:
+            # two landscape screens with a portrait screen in the middle
+            screens_ = [{'width': 1920, 'height': 1080}, {'width': 1080, 'height': 1920},
+                        {'width': 1920, 'height': 1080}]
+        self.screens = [ScreenDefinition(i, s) for i, s in enumerate(screens_)]
+
+    @classmethod
+    def load(cls, path_=None):
+        """
+        Reads the layout from a JSON file, without a file the default layout is used.
+        :param path_: absolute path of the screens file
+        :rtype: ScreenLayout
+        """
+        if not path_:
+            return cls()
+        with open(path_) as f:
+            return cls(json.load(f)['screens'])
+
+    @property
+    def total_width(self):
+        return sum(s.width for s in self.screens)
+
+    @property
+    def max_height(self):
+        return max(s.height for s in self.screens)
+
+    def __getitem__(self, index_):
+        return self.screens[index_]
+
+    def __len__(self):
+        return len(self.screens)
@@ -0,0 +1,73 @@
+import asyncio
+from collections import deque
+
+from system.clock import Clock
+
+
+class EventLoop:
+    """
+    Singleton that steps the asyncio loop of the main thread once per frame of the Clock, so that requests
+    and other coroutines run between frames instead of blocking them with run_until_complete.
+    The lag of the loop, the delay of a timer beyond its due time, shows how long frames or callbacks block.
+    """
+
+    instance = None
+
+    class __EventLoop():
+
+        # seconds between two measurements of the lag
+        PROBE_INTERVAL = 0.5
+        # number of measurements kept for the statistics
+        PROBES = 120
+
+        def __init__(self):
+            self.loop = asyncio.get_event_loop()
+            self._lags = deque(maxlen=self.PROBES)
+            self.lag_max = 0
+            self.loop.call_soon(self.probe, self.loop.time())
+            Clock().schedule(self.step)
+
+        def step(self, dt=None):
+            """
+            Runs the callbacks that are ready and polls the sockets without waiting.
+            """
+            self.loop.call_soon(self.loop.stop)
+            self.loop.run_forever()
+
+        def run(self, coroutine_):
+            """
+            Starts a coroutine on the loop and returns right away.
+            :return: asyncio.Task
+            """
+            return asyncio.ensure_future(coroutine_, loop=self.loop)
+
+        def probe(self, due_):
+            lag = max(0.0, self.loop.time() - due_)
+            self._lags.append(lag)
+            self.lag_max = max(self.lag_max, lag)
+            interval = self.PROBE_INTERVAL
+            self.loop.call_later(interval, self.probe, self.loop.time() + interval)
+
+        @property
+        def lag(self):
+            """
+            Mean and highest lag in seconds of the recent measurements.
+            """
+            if not self._lags:
+                return 0, 0
+            return sum(self._lags) / len(self._lags), max(self._lags)
+
+        def __str__(self):
+            mean, recent = self.lag
+            return 'EventLoop lag {:.1f} ms mean, {:.1f} ms recent max, {:.1f} ms max'.format(
+                mean * 1000, recent * 1000, self.lag_max * 1000)
+
+    def __init__(self):
+        if not EventLoop.instance:
+            EventLoop.instance = EventLoop.__EventLoop()
+
+    def __getattr__(self, name):
+        return getattr(self.instance, name)
+
+    def __str__(self):
+        return str(self.instance)
@@ -3,6 +3,8 @@ import os
 
 import pyglet
 
+from system.clock import Clock
+from system.layout import ScreenLayout
 from system.screen import Screen
 
 
@@ -20,14 +22,16 @@ class Machine:
         singleScreen = False
         scale = 1
 
-        def __init__(self, font_directory):
+        def __init__(self, font_directory, layout_=None):
             """
 
             :type font_directory: str
+            :param layout_: ScreenLayout, by default three screens
             """
             self.platform = None
             self.display = None
             self.font_directory = font_directory
+            self.layout = layout_ if layout_ else ScreenLayout()
             pyglet.gl.glEnable(pyglet.gl.GL_TEXTURE_2D)  # Do I need this here?
             self.check()
 
@@ -42,52 +46,72 @@ class Machine:
             if len(self.display.get_screens()) == 1:
                 self.singleScreen = True
                 s = self.display.get_default_screen()
-                self.scale = (s.width-40) / (2*Screen.RESOLUTION_WIDTH + Screen.RESOLUTION_HEIGHT)
+                self.scale = (s.width-40) / self.layout.total_width
 
             for screen in self.display.get_screens():
                 print(screen)
 
             self.load_fonts()
 
+        # the labels only use the regular face, the others are added after the first frames
+        FONTS = ['Regular']
+        DEFERRED_FONTS = ['Italic', 'Bold', 'BoldItalic', 'Semibold', 'SemiboldItalic']
+        # seconds after the start when the deferred fonts are added
+        FONT_DELAY = 10
+
         def load_fonts(self):
-            for f in ['Regular', 'Italic', 'Bold', 'BoldItalic', 'Semibold', 'SemiboldItalic']:
-                fn = 'OpenSans-{}.ttf'.format(f)
-                pyglet.font.add_file(os.path.join(self.font_directory, fn))
+            self.add_fonts(self.FONTS)
             pyglet.font.load('Open Sans')
+            Clock().schedule_once(self.load_deferred_fonts, self.FONT_DELAY)
+
+        def load_deferred_fonts(self, dt):
+            self.add_fonts(self.DEFERRED_FONTS)
             pyglet.font.load('Open Sans Semibold')
 
-        def create_screen(self):
+        def add_fonts(self, faces_):
+            for f in faces_:
+                fn = 'OpenSans-{}.ttf'.format(f)
+                pyglet.font.add_file(os.path.join(self.font_directory, fn))
+
+        def create_screen(self, index_=None, screen_class_=Screen, *args_):
             """
-            Return single Screen instances.
+            Return single Screen instances as defined by the layout.
+            :param index_: position of the screen in the layout, by default the next one
+            :param screen_class_: Screen or a subclass, which gets args_ as additional arguments
             """
             s = None
-            i = len(self.screens)
-            if i < 3:
-                if i != 1:
-                    w = Screen.RESOLUTION_WIDTH
-                    h = Screen.RESOLUTION_HEIGHT
-                else:
-                    h = Screen.RESOLUTION_WIDTH
-                    w = Screen.RESOLUTION_HEIGHT
-                screen = 0 if self.singleScreen else i
-                s = Screen(i, self.display.get_screens()[screen], self.singleScreen, w, h, self.scale)
-                # temp
-                if i == 1:
+            i = len(self.screens) if index_ is None else index_
+            if i < len(self.layout):
+                d = self.layout[i]
+                w = d.width
+                h = d.height
+                screens = self.display.get_screens()
+                screen = 0 if self.singleScreen or d.display >= len(screens) else d.display
+                s = screen_class_(i, screens[screen], self.singleScreen, w, h, self.scale, *args_)
+                s.info_capable = d.info
+                # the first screen that can show info does so until the dispatcher decides, a screen created
+                # by index is the only screen of a render process and gets its info mode from the content daemon
+                if index_ is None and d.info and not any(x.info_capable for x in self.screens):
                     s.set_info_mode(True)
 
                 # position the window
                 if self.singleScreen:
-                    screen_width = self.display.get_screens()[0].width
-                    s.set_location(int(max(10, min(screen_width - self.scale * w - 10,
-                                                   (len(self.screens) + 0.5) * math.floor(
-                                                       screen_width / 3) - self.scale * 0.5 * w))),
-                                   max(80, 40 + int(0.5 * self.scale * (w - h))))
+                    screen_width = screens[0].width
+                    x = d.x
+                    if x is None:
+                        x = int(max(10, min(screen_width - self.scale * w - 10,
+                                            (i + 0.5) * math.floor(screen_width / len(self.layout))
+                                            - self.scale * 0.5 * w)))
+                    y = d.y
+                    if y is None:
+                        y = max(80, 40 + int(0.5 * self.scale * (w - h)))
+                    s.set_location(x, y)
                 self.screens.append(s)
             return s
 
-    def __init__(self, font_directory):
+    def __init__(self, font_directory, layout_=None):
         if not Machine.instance:
-            Machine.instance = Machine.__Machine(font_directory)
+            Machine.instance = Machine.__Machine(font_directory, layout_)
 
     def __getattr__(self, name):
         return getattr(self.instance, name)
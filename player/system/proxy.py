@@ -0,0 +1,372 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import requests
+import simplejson as json
+
+from content.mediaentry import MediaFileData, PreviewData
+from system.config import Config
+
+
+class CachedResponse():
+    """
+    Response of the Madek server with the time it expires.
+    """
+
+    def __init__(self, status_, content_type_, body_, expires_):
+        self.status = status_
+        self.content_type = content_type_
+        self.body = body_
+        self.expires = expires_
+
+    @property
+    def expired(self):
+        return self.expires < time.time()
+
+    @property
+    def response(self):
+        return self.status, self.content_type, self.body
+
+
+class ResponseCache():
+    """
+    Responses of the Madek server by path. The most recent ones are kept in memory until the budget
+    of bytes is exceeded, with a directory all responses are also kept on disk for other processes and restarts.
+    """
+
+    def __init__(self, budget_: int, directory_: str=None):
+        """
+        :param budget_: bytes of all bodies kept in memory
+        :param directory_: directory for the responses on disk, None keeps them in memory only
+        """
+        self._budget = budget_
+        self._directory = directory_
+        self._responses = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory_ and not os.path.exists(directory_):
+            os.makedirs(directory_)
+
+    def get(self, path_):
+        """
+        :rtype: CachedResponse or None if the path is not cached or expired
+        """
+        with self._lock:
+            cached = self._responses.get(path_)
+            if cached:
+                self._responses.move_to_end(path_)
+        if not cached:
+            cached = self.load(path_)
+            if cached:
+                self.remember(path_, cached)
+        if cached and cached.expired:
+            self.remove(path_)
+            return None
+        return cached
+
+    def put(self, path_, cached_: CachedResponse):
+        self.remember(path_, cached_)
+        if self._directory:
+            # written under another name first, so that other processes never read a partial file
+            file = self.get_file(path_)
+            with open(file + '.tmp', 'wb') as f:
+                pickle.dump(cached_, f)
+            os.replace(file + '.tmp', file)
+
+    def remember(self, path_, cached_):
+        with self._lock:
+            if path_ in self._responses:
+                self._bytes -= len(self._responses.pop(path_).body)
+            self._responses[path_] = cached_
+            self._bytes += len(cached_.body)
+            while self._bytes > self._budget and len(self._responses) > 1:
+                self._bytes -= len(self._responses.popitem(False)[1].body)
+
+    def remove(self, path_):
+        with self._lock:
+            cached = self._responses.pop(path_, None)
+            if cached:
+                self._bytes -= len(cached.body)
+        if self._directory:
+            try:
+                os.remove(self.get_file(path_))
+            except FileNotFoundError:
+                # another thread or process removed it first
+                pass
+
+    def load(self, path_):
+        if not self._directory:
+            return None
+        try:
+            with open(self.get_file(path_), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def prune(self):
+        """
+        Deletes the expired responses on disk.
+        :return: number of deleted responses
+        """
+        deleted = 0
+        if self._directory:
+            for name in os.listdir(self._directory):
+                if name.endswith('.tmp'):
+                    # a response that is still being written by put
+                    continue
+                file = os.path.join(self._directory, name)
+                try:
+                    with open(file, 'rb') as f:
+                        expired = pickle.load(f).expired
+                except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                    expired = True
+                if expired:
+                    try:
+                        os.remove(file)
+                        deleted += 1
+                    except FileNotFoundError:
+                        # removed or replaced meanwhile
+                        pass
+        return deleted
+
+    def get_file(self, path_):
+        return os.path.join(self._directory, hashlib.sha1(path_.encode('utf-8')).hexdigest())
+
+    def __len__(self):
+        return len(self._responses)
+
+
+class CachingProxy(ThreadingMixIn, HTTPServer):
+    """
+    Local HTTP server that answers the requests of the players from a cache of the Madek server.
+    Resources are cached for the time of their type, concurrent requests of the same path share
+    one request to the Madek server and resources linked from JSON-ROA responses are requested
+    in the background, before the players ask for them.
+    """
+
+    daemon_threads = True
+
+    # seconds resources are cached by type, 0 passes them through
+    TTL = {
+        'auth-info': 0,
+        # lists and searches of media entries change whenever something is uploaded
+        'query': 10 * 60,
+        'media-entries': 60 * 60,
+        'meta-data': 60 * 60,
+        'people': 24 * 60 * 60,
+        'keywords': 24 * 60 * 60,
+        'media-files': 24 * 60 * 60,
+        'previews': 24 * 60 * 60,
+        # files never change
+        'data-stream': 7 * 24 * 60 * 60,
+    }
+    DEFAULT_TTL = 60 * 60
+    # levels of links followed from a requested resource, e.g. media file, previews and data stream
+    PREWARM_DEPTH = 2
+    PREWARM_WORKERS = 4
+
+    def __init__(self, upstream_: str, auth_: tuple=None, host_: str='127.0.0.1', port_: int=0,
+                 cache_bytes_: int=None, directory_: str=None, prewarm_: bool=True,
+                 handler_class_=None):
+        """
+        :param upstream_: URL of the Madek server
+        :param auth_: tuple with user and password for the Madek server
+        :param port_: 0 picks a free port
+        :param cache_bytes_: budget of the cache in memory, by default Config.PROXY_CACHE_BYTES
+        :param directory_: directory for the cache on disk, None keeps it in memory only
+        :param prewarm_: whether linked resources are requested in advance
+        """
+        HTTPServer.__init__(self, (host_, port_), handler_class_ if handler_class_ else ProxyRequestHandler)
+        self.upstream = upstream_
+        self.auth = auth_
+        self.cache = ResponseCache(cache_bytes_ if cache_bytes_ else Config.PROXY_CACHE_BYTES, directory_)
+        self.prewarm = prewarm_
+        # counts hits, misses, collapsed requests, prewarmed resources and upstream requests
+        self.stats = Counter()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._session = threading.local()
+        self._executor = ThreadPoolExecutor(CachingProxy.PREWARM_WORKERS)
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return 'http://{}:{}'.format('127.0.0.1' if host == '0.0.0.0' else host, port)
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._executor.shutdown(False)
+
+    @staticmethod
+    def get_type(path_):
+        """
+        :return: the type of a resource by its path, e.g. 'people' or 'data-stream'
+        """
+        parts = [p for p in urllib.parse.urlsplit(path_).path.split('/') if p]
+        if len(parts) < 2 or parts[0] != 'api':
+            return None
+        if parts[-1] == 'data-stream':
+            return 'data-stream'
+        if parts[1] == 'media-entries' and len(parts) == 2:
+            return 'query'
+        if len(parts) > 3 and parts[3] == 'meta-data':
+            return 'meta-data'
+        return parts[1]
+
+    def fetch(self, path_, accept_=None, depth_=0):
+        """
+        :param accept_: accept header of the request
+        :param depth_: number of links followed from a requested resource
+        :return: tuple of status, content type and body, either cached or from the Madek server
+        """
+        type = CachingProxy.get_type(path_)
+        ttl = CachingProxy.TTL.get(type, CachingProxy.DEFAULT_TTL)
+        if not ttl:
+            return self.request(path_, accept_)
+        cached = self.cache.get(path_)
+        if cached:
+            self.stats['hits'] += 1
+            return cached.response
+        with self._lock:
+            flight = self._flights.get(path_)
+            leading = flight is None
+            if leading:
+                flight = self._flights[path_] = Future()
+        if not leading:
+            # the same path is requested already
+            self.stats['collapsed'] += 1
+            return flight.result()
+        self.stats['misses'] += 1
+        try:
+            response = self.request(path_, accept_)
+            if response[0] == 200:
+                self.cache.put(path_, CachedResponse(*response, time.time() + ttl))
+            flight.set_result(response)
+        except Exception as exc:
+            flight.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[path_]
+        if self.prewarm and response[0] == 200 and type not in ('query', 'data-stream'):
+            self.prewarm_links(response[2], depth_ + 1)
+            if type == 'media-files' and depth_ + 2 <= CachingProxy.PREWARM_DEPTH:
+                self._executor.submit(self.prewarm_preview, response[2], depth_ + 1)
+        return response
+
+    def request(self, path_, accept_=None):
+        # every thread keeps its connections to the Madek server
+        session = getattr(self._session, 'session', None)
+        if not session:
+            session = self._session.session = requests.Session()
+            session.auth = self.auth
+        self.stats['upstream'] += 1
+        r = session.get('{}{}'.format(self.upstream, path_),
+                        headers={'Accept': accept_} if accept_ else None, timeout=30)
+        return r.status_code, r.headers.get('Content-Type', 'application/octet-stream'), r.content
+
+    def prewarm_links(self, body_, depth_):
+        if depth_ > CachingProxy.PREWARM_DEPTH:
+            return
+        try:
+            j = json.loads(body_.decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            return
+        for path in CachingProxy.get_links(j):
+            if path not in self._flights and not self.cache.get(path):
+                self.stats['prewarmed'] += 1
+                self._executor.submit(self.prewarm_path, path, depth_)
+
+    def prewarm_path(self, path_, depth_):
+        try:
+            self.fetch(path_, 'application/json-roa+json', depth_)
+        except requests.RequestException:
+            pass
+
+    def prewarm_preview(self, body_, depth_):
+        """
+        Requests the data stream of the image preview that the players choose for their screens,
+        see Config.screen_sizes and MediaFileData.get_preview.
+        :param body_: body of a media file
+        :param depth_: level of the previews of the media file
+        """
+        try:
+            j = json.loads(body_.decode('utf-8'))
+            media_file = MediaFileData('', j)
+            for r in j['_json-roa'].get('collection', {}).get('relations', {}).values():
+                status, content_type, body = self.fetch(r['href'], 'application/json-roa+json', depth_)
+                if status == 200:
+                    media_file.add_preview(PreviewData('', json.loads(body.decode('utf-8'))))
+            preview = media_file.get_preview()
+            # the data streams of videos are linked from their previews anyway
+            if preview and preview.content_type != 'video/mp4' and not self.cache.get(preview.data_stream):
+                self.stats['prewarmed'] += 1
+                self.prewarm_path(preview.data_stream, depth_ + 1)
+        except (ValueError, KeyError, TypeError, UnicodeDecodeError, requests.RequestException) as exc:
+            print('Prewarming the preview of a media file failed: {}'.format(exc))
+
+    @staticmethod
+    def get_links(json_):
+        """
+        :return: paths of the resources a JSON-ROA response links to, templates are skipped
+        """
+        if not isinstance(json_, dict):
+            return []
+        roa = json_.get('_json-roa', {})
+        relations = list(roa.get('relations', {}).items()) + list(roa.get('collection', {}).get('relations', {}).items())
+        links = []
+        for name, r in relations:
+            href = r.get('href', '')
+            if not href.startswith('/api/') or '{' in href or name == 'root':
+                continue
+            if CachingProxy.get_type(href) in ('query', 'auth-info'):
+                continue
+            if name == 'data-stream' and json_.get('content_type') != 'video/mp4':
+                # images only need the preview chosen for the screens, see prewarm_preview
+                continue
+            links.append(href)
+        return links
+
+    def __str__(self):
+        return 'CachingProxy {} hits, {} misses, {} collapsed, {} prewarmed, {} upstream'.format(
+            self.stats['hits'], self.stats['misses'], self.stats['collapsed'], self.stats['prewarmed'],
+            self.stats['upstream'])
+
+
+class ProxyRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        try:
+            self.send_body(*self.server.fetch(self.path, self.headers.get('Accept')))
+        except requests.RequestException as exc:
+            self.send_json({'errors': [{'detail': str(exc)}]}, 502)
+
+    def send_json(self, data_, status_=200):
+        self.send_body(status_, 'application/json', json.dumps(data_).encode('utf-8'))
+
+    def send_body(self, status_, content_type_, body_):
+        self.send_response(status_)
+        self.send_header('Content-Type', content_type_)
+        self.send_header('Content-Length', str(len(body_)))
+        self.end_headers()
+        self.wfile.write(body_)
+
+    def log_message(self, format_, *args):
+        pass
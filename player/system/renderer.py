@@ -0,0 +1,156 @@
+import pyglet
+
+from display.mediadisplay import Area
+from display.texturepool import TexturePool
+from display.upload import TextureUpload
+from system.clock import Clock
+from system.config import Config
+from system.machine import Machine
+from system.screen import Screen, MediaCaption
+
+
+class RenderScreen(Screen):
+    """
+    Screen in its own render process. It only draws and gets its content as messages from
+    the content daemon, decoded images are read from buffers shared with the daemon.
+    """
+
+    def __init__(self, index_, screen_, single_screen_, width_, height_, scale_, count_, connection_, buffers_):
+        """
+        :param count_: number of screens of all render processes
+        :param connection_: multiprocessing.Connection to the content daemon
+        :param buffers_: list of multiprocessing.RawArray with decoded images
+        """
+        # the class lists of the content are indexed by screen, even if this process has a single screen
+        while len(Screen._content) < count_ - 1:
+            Screen._content.append(None)
+            Screen._captions.append(None)
+        self._connection = connection_
+        self._buffers = buffers_
+        self._texture = None
+        self._player = None
+        self._area = None
+        self._media_caption = None
+        # TextureUpload, index of its buffer and caption
+        self._upload = None
+        # the content is cleared once no new content follows right away
+        self._clear_pending = False
+        super(RenderScreen, self).__init__(index_, screen_, single_screen_, width_, height_, scale_)
+        Clock().schedule(self.on_frame)
+
+    def on_frame(self, dt):
+        try:
+            while self._connection.poll():
+                self.on_message(*self._connection.recv())
+        except EOFError:
+            # the content daemon is gone
+            pyglet.app.exit()
+            return
+        if self._clear_pending and not self._upload:
+            self.clear_content()
+        if self._upload:
+            upload, index, caption = self._upload
+            upload.upload(max(1, Config.UPLOAD_BYTES_PER_FRAME // upload.pitch))
+            if upload.state == TextureUpload.COMPLETE:
+                self._upload = None
+                self.show_texture(upload.texture, upload.width, upload.height, caption)
+                self._connection.send(('released', index))
+
+    def on_message(self, command_, *args_):
+        if command_ == 'image':
+            self.show_buffer(*args_)
+        elif command_ == 'file':
+            self.show_file(*args_)
+        elif command_ == 'video':
+            self.show_video(*args_)
+        elif command_ == 'clear':
+            self._clear_pending = True
+        elif command_ == 'info_mode':
+            self.clear_content()
+            self.set_info_mode(*args_)
+        elif command_ == 'layout':
+            if self.is_info:
+                self.layout_info(*args_)
+        elif command_ == 'quit':
+            pyglet.app.exit()
+
+    def show_buffer(self, index_, width_, height_, format_, caption_):
+        # the current content stays visible until the new image is uploaded
+        self.cancel_upload()
+        upload = TextureUpload(None)
+        upload.set_data(width_, height_, self._buffers[index_], format_)
+        self._upload = (upload, index_, caption_)
+
+    def show_file(self, path_, caption_):
+        self.cancel_upload()
+        image = pyglet.image.load(path_)
+        self.show_texture(TexturePool().acquire(image), image.width, image.height, caption_)
+
+    def show_video(self, sequence_, path_, caption_):
+        """
+        :param sequence_: number of the video that is sent back when it ends
+        """
+        self.clear_content()
+        source = pyglet.media.load(path_)
+        self._player = pyglet.media.Player()
+        @self._player.event
+        def on_eos():
+            self._connection.send(('end', sequence_))
+        self._player.queue(source)
+        self._player.play()
+        if source.video_format:
+            self.set_area(source.video_format.width, source.video_format.height, caption_)
+
+    def show_texture(self, texture_, width_, height_, caption_):
+        self.clear_content()
+        self._texture = texture_
+        self.set_area(width_, height_, caption_)
+
+    def set_area(self, width_, height_, caption_):
+        self._area = Area(0, 0, width_, height_)
+        self._area.scale_to(self.get_width, self.get_height, 10, True, True)
+        self._media_caption = MediaCaption(self._area, None, caption_)
+
+    def cancel_upload(self):
+        if self._upload:
+            upload, index, caption = self._upload
+            upload.discard()
+            self._upload = None
+            self._connection.send(('released', index))
+
+    def clear_content(self):
+        self._clear_pending = False
+        if self._player:
+            self._player.delete()
+            self._player = None
+        TexturePool().release(self._texture)
+        self._texture = None
+        self._area = None
+        self._media_caption = None
+
+    def on_draw(self):
+        if self.is_info:
+            super(RenderScreen, self).on_draw()
+            return
+        self.clear()
+        a = self._area
+        if self._player and a and self._player.get_texture():
+            self._player.get_texture().blit(a.x, a.y, 0, a.width, a.height)
+        elif self._texture and a:
+            self._texture.blit(a.x, a.y, 0, a.width, a.height)
+        if self._media_caption:
+            self._media_caption.draw()
+
+    def on_key_press(self, symbol_, modifiers_):
+        self._connection.send(('closed',))
+        pyglet.app.exit()
+
+
+def run_renderer(index_, layout_, font_directory_, connection_, buffers_):
+    """
+    Entry point of a render process.
+    :param layout_: ScreenLayout of all screens
+    """
+    machine = Machine(font_directory_, layout_)
+    machine.create_screen(index_, RenderScreen, len(layout_), connection_, buffers_)
+    pyglet.app.run()
@@ -1,4 +1,5 @@
 import math
+from collections import Counter
 
 import pyglet
 from pyglet.gl import *
@@ -6,6 +7,7 @@ from pyglet.text import Label
 from pyglet.text.layout import TextLayout
 from pyglet.window import Window
 
+from content.apidata import ApiData
 from content.mediaentry import MediaEntryData
 from display.mediadisplay import MediaDisplay
 from system.config import Config
@@ -16,6 +18,8 @@ class Screen(Window):
     RESOLUTION_WIDTH = 1920
     RESOLUTION_HEIGHT = 1080
     PADDING = 80
+    # whether the screen can become the info screen, defined by the layout
+    info_capable = True
 
     # contains the MediaDisplay instances played on the content screens
     # so that the info screen has access to them
@@ -33,6 +37,10 @@ class Screen(Window):
         self.__caption = None
         self._insert = None
         self._program = None
+        self._program_name = None
+        # laid out InfoBox instances of the info screen by entry and geometry
+        self._info_boxes = {}
+        self.info_box_stats = Counter()
         # For each new Screen add empty entries in the following class lists
         Screen._content.append(None)
         Screen._captions.append(None)
@@ -87,6 +95,8 @@ class Screen(Window):
                 # switch from info to media mode
                 self._insert = None
                 self._program = None
+                self._program_name = None
+                self.clear_info_boxes()
             self.__info_mode = info_
 
     def set_media(self, media_):
@@ -96,15 +106,16 @@ class Screen(Window):
                 self.media.hide()
             Screen._content[self.__index] = media_
             self.media.show()
-            caption_lines = []
-            # if media_.index:
-            #     caption_lines.append(str(media_.index))
-            for i in Config.META_DATA_MINIMUM:
-                v = media_.media_entry.get_meta_datum(i)
-                if v:
-                    caption_lines.append(v)
-            caption = '\n'.join(caption_lines)
-            self.__caption = MediaCaption(self.media.area, self.media, caption)
+            self.__caption = MediaCaption(self.media.area, self.media, Screen.get_caption(media_.media_entry))
+
+    @staticmethod
+    def get_caption(media_entry_):
+        caption_lines = []
+        for i in Config.META_DATA_MINIMUM:
+            v = media_entry_.get_meta_datum(i)
+            if v:
+                caption_lines.append(v)
+        return '\n'.join(caption_lines)
 
     def create_insert(self):
         insert_text = 'Sender Medienarchiv'
@@ -116,63 +127,118 @@ class Screen(Window):
         return insert
 
     def set_program_info(self, program_):
-        t = program_.name
-        s = Screen.find_text_size(t, self._content_width)
-        d = Screen.get_formatted_text(t, s)
-        self._program = Label(t, font_name=Config.FONT, bold=False, font_size=s,
+        self.set_program_name(program_.name)
+
+    def set_program_name(self, name_):
+        if self._program and self._program_name == name_:
+            return
+        self._program_name = name_
+        s = Screen.find_text_size(name_, self._content_width)
+        self._program = Label(name_, font_name=Config.FONT, bold=False, font_size=s,
                               color=Config.GREEN, anchor_x='left', anchor_y='top')
         self._program.x = Screen.PADDING
         self._program.y = self._insert._y - self._insert.content_height - Screen.PADDING
 
     def update_info_layout(self):
-        # detect available space
-        top = self._insert._y - self._insert.content_height - Screen.PADDING
+        content = [m for m in Screen._content if m]
+        self.layout_info(Screen.get_program_name(content), [Screen.get_info(m) for m in content])
+
+    @staticmethod
+    def get_program_name(content_):
+        """
+        :param content_: list of MediaDisplay
+        :return: name of the program if all content belongs to the same, otherwise None
+        """
         # find content and count different programs
-        content = [] # MediaDisplay
         programs = [] # contexts of the content
-        for m in Screen._content:
-            if m:
-                content.append(m)
-                # Is this a new program?
-                new_program = True
-                for c in programs:
-                    if m.program and c == m.program:
-                        new_program = False
-                        break
-                if new_program:
-                    programs.append(m.program)
+        for m in content_:
+            # Is this a new program?
+            new_program = True
+            for c in programs:
+                if m.program and c == m.program:
+                    new_program = False
+                    break
+            if new_program:
+                programs.append(m.program)
         # only show context info if all contents have the same
         if len(programs) == 1 and programs[0]:
-            self.set_program_info(programs[0])
+            return programs[0].name
+        return None
+
+    @staticmethod
+    def get_info(media_):
+        """
+        :param media_: MediaDisplay
+        :return: tuple of screen index, entry id and meta data text for the info screen
+        """
+        return media_.screen.index, media_.media_entry.id, media_.media_entry.serialize_meta_data(
+            media_.program.meta_data_white_list, ApiData.INFO_SEPARATOR, ApiData.INFO_PARAGRAPH_SEPARATOR)
+
+    def layout_info(self, program_name_, content_):
+        """
+        Arranges the info boxes of the content screens.
+        :param program_name_: name of the program shown on all content screens or None
+        :param content_: list of tuples as returned by get_info
+        """
+        # detect available space
+        top = self._insert._y - self._insert.content_height - Screen.PADDING
+        if program_name_:
+            self.set_program_name(program_name_)
             top = self._program._y - self._program.content_height - Screen.PADDING
         else:
             self._program = None
+            self._program_name = None
+        if not content_:
+            self.clear_info_boxes()
+            return
         # define space for content info
         landscape = self.orientation == MediaEntryData.LANDSCAPE
         x = Screen.PADDING
         if landscape:
-            w = (self._content_width - (len(content)-1) * Screen.PADDING) / len(content)
+            w = (self._content_width - (len(content_)-1) * Screen.PADDING) / len(content_)
             h = top - Screen.PADDING
         else:
             w = self._content_width
-            h = (top - Screen.PADDING - (len(content)-1) * Screen.PADDING) / len(content)
-        for m in content:
-            if m:
-                # get text to display
-                pointer = ''
-                if m.screen.index < self.index:
-                    pointer = (self.index-m.screen.index)*'<'
-                elif m.screen.index > self.index:
-                    pointer = (m.screen.index-self.index)*'>'
-                t = '{} {}'.format(pointer, m.media_entry.serialize_meta_data(m.program.meta_data_white_list, ' | ', ' ¶ '))
-                s = Screen.find_text_size(t, w, h)
-                d = Screen.get_formatted_text(t, s)
-                c = InfoBox(d, x, top, w)
-                Screen._captions[m.screen.index] = c
-                if landscape:
-                    x = x + w + Screen.PADDING
-                else:
-                    top = top - h - Screen.PADDING
+            h = (top - Screen.PADDING - (len(content_)-1) * Screen.PADDING) / len(content_)
+        boxes = {}
+        for index, entry_id, text in content_:
+            # only boxes of new entries, with a new text or a new geometry are laid out again
+            key = (entry_id, index, text, round(x), round(top), round(w), round(h))
+            c = self._info_boxes.pop(key, None)
+            if c:
+                self.info_box_stats['reused'] += 1
+            else:
+                c = self.create_info_box(index, text, x, top, w, h)
+                self.info_box_stats['created'] += 1
+            boxes[key] = c
+            Screen._captions[index] = c
+            if landscape:
+                x = x + w + Screen.PADDING
+            else:
+                top = top - h - Screen.PADDING
+        # remove boxes of entries that are not shown anymore
+        self.clear_info_boxes()
+        self._info_boxes = boxes
+
+    def create_info_box(self, screen_index_, text_, x_, y_, w_, h_):
+        # get text to display
+        pointer = ''
+        if screen_index_ < self.index:
+            pointer = (self.index-screen_index_)*'<'
+        elif screen_index_ > self.index:
+            pointer = (screen_index_-self.index)*'>'
+        t = '{} {}'.format(pointer, text_)
+        s = Screen.find_text_size(t, w_, h_)
+        d = Screen.get_formatted_text(t, s)
+        return InfoBox(d, x_, y_, w_)
+
+    def clear_info_boxes(self):
+        for c in self._info_boxes.values():
+            for i, caption in enumerate(Screen._captions):
+                if caption is c:
+                    Screen._captions[i] = None
+            c.delete()
+        self._info_boxes = {}
 
     def clear_media(self):
         if Screen._content[self.__index]:
@@ -0,0 +1,64 @@
+import random
+import textwrap
+import unittest
+
+from content.apidata import ApiData, MetaDatum, KeywordData
+
+
+def normalize(value_, paragraph_separator_=None):
+    # the normalization before values were normalized in a single pass
+    value = value_.replace('\r', '\n')
+    while value.find('\n\n') > -1:
+        value = value.replace('\n\n', '\n')
+    if paragraph_separator_:
+        value = value.replace('\n', paragraph_separator_)
+    return textwrap.shorten(value, 500, placeholder='...')
+
+
+class NormalizeValueTest(unittest.TestCase):
+
+    VALUES = ['', 'Title', '  Two  words  ', 'Line\nbreak', 'Windows\r\nbreaks\r\n\r\nand paragraphs',
+              '\n\n\nleading and trailing\n\n', 'tabs\tand\x0bother whitespace', 'a ' * 300, 'x' * 600,
+              'Über die Ästhetik\n\nder Bewegung ' * 40]
+
+    def test_equivalence(self):
+        for v in NormalizeValueTest.VALUES:
+            for separator in (None, ApiData.INFO_PARAGRAPH_SEPARATOR):
+                self.assertEqual(ApiData.normalize_value(v, separator), normalize(v, separator), repr(v))
+
+    def test_random_equivalence(self):
+        r = random.Random(34)
+        for i in range(500):
+            v = ''.join(r.choice('ab \n\r\t') for _ in range(r.randint(0, 700)))
+            for separator in (None, ApiData.INFO_PARAGRAPH_SEPARATOR):
+                self.assertEqual(ApiData.normalize_value(v, separator), normalize(v, separator), repr(v))
+
+
+class SerializeMetaDataTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = ApiData('entry')
+        self.data.set_meta_datum(MetaDatum({'id': '1', 'meta_key_id': 'title', 'value': 'A\n\ntitle'}))
+        self.keywords = MetaDatum({'id': '2', 'meta_key_id': 'keywords', 'value': []})
+        self.data.set_meta_datum(self.keywords)
+
+    def test_serialize(self):
+        self.assertEqual(self.data.serialize_meta_data(['title', 'keywords', 'missing'], ' | ', ' ¶ '), 'A ¶ title')
+        self.assertEqual(self.data.serialize_meta_data(['keywords', 'title']), 'A title')
+
+    def test_added_value(self):
+        keys = ['title', 'keywords']
+        self.assertEqual(self.data.serialize_meta_data(keys), 'A title')
+        # keywords are added to their meta datum after it was created
+        self.keywords.add_value(KeywordData({'id': '3', 'term': 'Tanz'}))
+        self.assertEqual(self.data.serialize_meta_data(keys), 'A title | Tanz')
+
+    def test_new_meta_datum(self):
+        keys = ['title']
+        self.assertEqual(self.data.serialize_meta_data(keys), 'A title')
+        self.data.set_meta_datum(MetaDatum({'id': '4', 'meta_key_id': 'title', 'value': 'Another'}))
+        self.assertEqual(self.data.serialize_meta_data(keys), 'Another')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from content.catalog import ProgramCatalog
+
+
+class Program():
+
+    def __init__(self, name_, playlist_=None):
+        self.name = name_
+        self.playlist = playlist_
+
+
+class ProgramCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'catalog.json')
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_record(self):
+        catalog = ProgramCatalog()
+        program = Program('a', [1, 2, 3])
+        self.assertIsNone(catalog.get(program))
+        catalog.record(program, 2, 100)
+        catalog.record(Program('a'), 12, 200)
+        p = catalog.get(program)
+        self.assertEqual((p['loads'], p['failures']), (2, 1))
+        self.assertAlmostEqual(p['seconds'], 0.7 * 2 + 0.3 * 12)
+        self.assertAlmostEqual(p['requests'], 0.7 * 100 + 0.3 * 200)
+        self.assertAlmostEqual(p['valid'], 0.7 * 3)
+        self.assertEqual(catalog.failure_rate(program), 0.5)
+
+    def test_skip_empty_programs(self):
+        catalog = ProgramCatalog()
+        program = Program('a')
+        for i in range(ProgramCatalog.MIN_LOADS):
+            # programs are only judged after some loads
+            self.assertTrue(catalog.is_usable(program))
+            catalog.record(program, 1, 10)
+        usable = [catalog.is_usable(program) for _ in range(2 * (ProgramCatalog.RETRY_TURNS + 1))]
+        # an empty program is tried again every few turns
+        self.assertEqual(usable, ([False] * ProgramCatalog.RETRY_TURNS + [True]) * 2)
+        self.assertEqual((catalog.skipped, catalog.retried), (2 * ProgramCatalog.RETRY_TURNS, 2))
+
+    def test_expensive(self):
+        catalog = ProgramCatalog()
+        catalog.record(Program('a', [1]), 1, 10)
+        catalog.record(Program('b', [1]), ProgramCatalog.EXPENSIVE_SECONDS, 10)
+        catalog.record(Program('c', [1]), 1, ProgramCatalog.EXPENSIVE_REQUESTS)
+        self.assertFalse(catalog.is_expensive(Program('a')))
+        self.assertTrue(catalog.is_expensive(Program('b')))
+        self.assertTrue(catalog.is_expensive(Program('c')))
+        self.assertFalse(catalog.is_expensive(Program('d')))
+
+    def test_save(self):
+        catalog = ProgramCatalog(self._path)
+        catalog.record(Program('a', [1]), 1, 10)
+        self.assertEqual(os.listdir(self._directory.name), ['catalog.json'])
+        self.assertEqual(ProgramCatalog(self._path).get(Program('a'))['loads'], 1)
+
+    def test_broken_file(self):
+        with open(self._path, 'w') as f:
+            f.write('{"programs": {"a": ')
+        catalog = ProgramCatalog(self._path)
+        self.assertEqual(len(catalog), 0)
+        catalog.record(Program('a', [1]), 1, 10)
+        self.assertEqual(len(ProgramCatalog(self._path)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+from content.dispatcher import Lookahead
+from content.mediaentry import MediaEntryData
+
+LANDSCAPE = MediaEntryData.LANDSCAPE
+SQUARE = MediaEntryData.SQUARE
+PORTRAIT = MediaEntryData.PORTRAIT
+
+
+class Entry():
+
+    def __init__(self, orientation_):
+        self.orientation = orientation_
+
+
+class Playlist():
+    """
+    Stands in for a Program, only get_next is used by the lookahead.
+    """
+
+    def __init__(self, orientations_):
+        self.entries = [Entry(o) for o in orientations_]
+        self.index = 0
+
+    def get_next(self, count_=False):
+        if self.index >= len(self.entries):
+            return None, self.index
+        self.index += 1
+        return self.entries[self.index - 1], self.index
+
+
+class LookaheadTest(unittest.TestCase):
+
+    def test_fill_up_to_size(self):
+        lookahead = Lookahead(3)
+        program = Playlist([LANDSCAPE] * 5)
+        self.assertEqual(len(lookahead.fill(program)), 3)
+        self.assertEqual(len(lookahead), 3)
+        self.assertEqual(lookahead.fill(program), [])
+        lookahead.take(LANDSCAPE)
+        self.assertEqual(len(lookahead.fill(program)), 1)
+
+    def test_take_oldest_with_orientation(self):
+        lookahead = Lookahead(4)
+        program = Playlist([LANDSCAPE, PORTRAIT, LANDSCAPE, PORTRAIT])
+        lookahead.fill(program)
+        self.assertIs(lookahead.take(PORTRAIT).entry, program.entries[1])
+        self.assertIs(lookahead.take(LANDSCAPE).entry, program.entries[0])
+        self.assertIs(lookahead.take(PORTRAIT).entry, program.entries[3])
+        self.assertEqual(len(lookahead), 1)
+
+    def test_take_closest_orientation(self):
+        lookahead = Lookahead(4)
+        program = Playlist([LANDSCAPE, SQUARE])
+        lookahead.fill(program)
+        self.assertIsNone(lookahead.take(PORTRAIT, True))
+        self.assertIs(lookahead.take(PORTRAIT).entry, program.entries[1])
+        self.assertIs(lookahead.take(PORTRAIT).entry, program.entries[0])
+        self.assertIsNone(lookahead.take(PORTRAIT))
+        self.assertEqual(len(lookahead), 0)
+
+    def test_give_back(self):
+        lookahead = Lookahead(4)
+        program = Playlist([LANDSCAPE, LANDSCAPE])
+        lookahead.fill(program)
+        t = lookahead.take(LANDSCAPE)
+        lookahead.give_back(t)
+        self.assertEqual(len(lookahead), 2)
+        self.assertIs(lookahead.take(LANDSCAPE), t)
+
+    def test_overdue(self):
+        lookahead = Lookahead(2)
+        program = Playlist([PORTRAIT] + [LANDSCAPE] * 4)
+        lookahead.fill(program)
+        self.assertIsNone(lookahead.overdue)
+        for i in range(3):
+            lookahead.take(LANDSCAPE, True)
+            lookahead.fill(program)
+        # the portrait entry waited for more turns than the window holds entries
+        self.assertEqual(lookahead.overdue, PORTRAIT)
+        lookahead.take(PORTRAIT)
+        self.assertIsNone(lookahead.overdue)
+
+    def test_entries_in_program_order(self):
+        lookahead = Lookahead(4)
+        program = Playlist([PORTRAIT, LANDSCAPE, SQUARE, LANDSCAPE])
+        lookahead.fill(program)
+        self.assertEqual([t.entry for t in lookahead.entries], program.entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
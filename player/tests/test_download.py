@@ -0,0 +1,58 @@
+import time
+import unittest
+
+from system.download import TokenBucket, Transfer, DownloadManager
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_no_limit(self):
+        for rate in (None, 0):
+            self.assertEqual(TokenBucket(rate).take(10 ** 9), 0)
+
+    def test_burst_is_free(self):
+        bucket = TokenBucket(10 ** 6, 2 * 10 ** 6)
+        self.assertEqual(bucket.take(2 * 10 ** 6), 0)
+
+    def test_waits_for_tokens(self):
+        bucket = TokenBucket(10 ** 6)
+        bucket.take(10 ** 6)
+        start = time.monotonic()
+        waited = bucket.take(50000)
+        self.assertAlmostEqual(waited, 0.05, delta=0.01)
+        self.assertGreaterEqual(time.monotonic() - start, waited)
+
+    def test_large_take_waits_for_refill(self):
+        # a chunk larger than the bucket is not starved
+        bucket = TokenBucket(10 ** 6, 10000)
+        self.assertAlmostEqual(bucket.take(60000), 0.05, delta=0.01)
+
+    def test_refill(self):
+        bucket = TokenBucket(10 ** 6)
+        bucket.take(10 ** 6)
+        time.sleep(0.1)
+        self.assertLess(bucket.take(90000), 0.01)
+
+
+class TransferTest(unittest.TestCase):
+
+    def test_without_deadline(self):
+        self.assertFalse(Transfer('url', DownloadManager.BACKGROUND).at_risk)
+
+    def test_past_deadline(self):
+        self.assertTrue(Transfer('url', DownloadManager.FOREGROUND, time.monotonic()).at_risk)
+
+    def test_rate(self):
+        transfer = Transfer('url', DownloadManager.FOREGROUND, time.monotonic() + 10)
+        transfer.start -= 1
+        transfer.total = 1000
+        # nothing received yet, the rate is unknown
+        self.assertFalse(transfer.at_risk)
+        transfer.received = 500
+        self.assertFalse(transfer.at_risk)
+        transfer.received = 50
+        self.assertTrue(transfer.at_risk)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+import unittest
+
+from content.hooks import HookIndex
+
+
+class Hook():
+
+    def __init__(self, id_):
+        self.id = id_
+
+
+class HookIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'hooks.json')
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_unknown_hook(self):
+        index = HookIndex()
+        self.assertFalse(index.is_usable(Hook('a')))
+        self.assertEqual(index.estimate(Hook('a')), 0)
+        self.assertEqual(index.valid_ratio, HookIndex.DEFAULT_VALID_RATIO)
+
+    def test_record(self):
+        index = HookIndex(minimum_=4)
+        index.record(Hook('a'), 5)
+        index.record(Hook('b'), 3)
+        self.assertTrue(index.is_usable(Hook('a')))
+        self.assertFalse(index.is_usable(Hook('b')))
+
+    def test_estimate_from_listed_entries(self):
+        index = HookIndex(self._path)
+        index.record(Hook('a'), 5)
+        index = HookIndex(self._path)
+        # probed hooks are estimated with the share of valid entries of the measured ones
+        index._hooks['a']['listed'] = 10
+        index._hooks['b'] = {'listed': 10, 'valid': None, 'checked': time.time()}
+        self.assertEqual(index.valid_ratio, 0.5)
+        self.assertEqual(index.estimate(Hook('b')), 5)
+
+    def test_max_age(self):
+        index = HookIndex(max_age_=60)
+        index.record(Hook('a'), 5)
+        self.assertTrue(index.is_fresh(Hook('a')))
+        index._hooks['a']['checked'] -= 61
+        self.assertFalse(index.is_fresh(Hook('a')))
+
+    def test_save(self):
+        index = HookIndex(self._path)
+        index.record(Hook('a'), 5)
+        self.assertEqual(os.listdir(self._directory.name), ['hooks.json'])
+        self.assertEqual(HookIndex(self._path).estimate(Hook('a')), 5)
+
+    def test_broken_file(self):
+        with open(self._path, 'w') as f:
+            f.write('{"hooks": ')
+        index = HookIndex(self._path)
+        self.assertEqual(index.estimate(Hook('a')), 0)
+        index.record(Hook('a'), 5)
+        self.assertEqual(HookIndex(self._path).estimate(Hook('a')), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
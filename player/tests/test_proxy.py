@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+import unittest
+
+from system.proxy import CachedResponse, ResponseCache
+
+
+def response(body_=b'{}', ttl_=60):
+    return CachedResponse(200, 'application/json-roa+json', body_, time.time() + ttl_)
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_get_put(self):
+        cache = ResponseCache(1000)
+        self.assertIsNone(cache.get('/a'))
+        cache.put('/a', response(b'a'))
+        self.assertEqual(cache.get('/a').body, b'a')
+
+    def test_expired(self):
+        cache = ResponseCache(1000, self._directory.name)
+        cache.put('/a', response(ttl_=-1))
+        self.assertIsNone(cache.get('/a'))
+        self.assertEqual(len(cache), 0)
+        self.assertFalse(os.path.exists(cache.get_file('/a')))
+
+    def test_budget(self):
+        cache = ResponseCache(10)
+        cache.put('/a', response(b'12345'))
+        cache.put('/b', response(b'12345'))
+        cache.get('/a')
+        cache.put('/c', response(b'12345'))
+        # the least recently used response is dropped
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('/b'))
+        self.assertIsNotNone(cache.get('/a'))
+
+    def test_disk(self):
+        ResponseCache(1000, self._directory.name).put('/a', response(b'a'))
+        # another process or a restart reads the responses from the directory
+        self.assertEqual(ResponseCache(1000, self._directory.name).get('/a').body, b'a')
+
+    def test_remove(self):
+        cache = ResponseCache(1000, self._directory.name)
+        cache.put('/a', response())
+        cache.remove('/a')
+        cache.remove('/a')
+        self.assertIsNone(cache.get('/a'))
+
+    def test_prune(self):
+        cache = ResponseCache(1000, self._directory.name)
+        cache.put('/a', response())
+        cache.put('/b', response(ttl_=-1))
+        with open(cache.get_file('/c'), 'wb') as f:
+            f.write(b'broken')
+        # a response that is still being written
+        with open(cache.get_file('/d') + '.tmp', 'wb') as f:
+            f.write(b'partial')
+        self.assertEqual(cache.prune(), 2)
+        kept = [cache.get_file('/a'), cache.get_file('/d') + '.tmp']
+        self.assertEqual(sorted(os.listdir(self._directory.name)), sorted(os.path.basename(f) for f in kept))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+import simplejson as json
+
+from content.rotation import Rotation
+
+
+def definition(name_, order_='desc'):
+    return {'name': name_, 'parameters': {'order': order_}}
+
+
+class RotationTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'programs.json')
+        self._mtime = 1000000
+        self.write([definition(n) for n in 'abcd'])
+        self.rotation = Rotation(None, randomize_=False, followups_=False)
+        self.rotation.load(self._path)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def write(self, definitions_):
+        with open(self._path, 'w') as f:
+            json.dump({'programs': definitions_}, f)
+        # reload compares the modification time, which may not change within a test otherwise
+        self._mtime += 10
+        os.utime(self._path, (self._mtime, self._mtime))
+
+    def names(self):
+        return [p.name for p in self.rotation.programs]
+
+    def test_reload_without_changes(self):
+        self.assertFalse(self.rotation.reload())
+        os.utime(self._path, (self._mtime + 5, self._mtime + 5))
+        self.assertFalse(self.rotation.reload())
+        self.assertEqual(self.names(), ['a', 'b', 'c', 'd'])
+
+    def test_reload_keeps_unchanged_programs_and_position(self):
+        played = [self.rotation.next_regular(), self.rotation.next_regular()]
+        # the rotation reshuffles the programs that are not played yet
+        kept, changed = self.rotation.programs[2:]
+        self.write([definition(p.name) for p in played + [kept]] + [definition(changed.name, 'asc'),
+                                                                    definition('e')])
+        self.assertTrue(self.rotation.reload())
+        self.assertEqual(len(self.rotation.programs), 5)
+        for p in played + [kept]:
+            self.assertIs(self.rotation.find(p.name), p)
+        self.assertIsNot(self.rotation.find(changed.name), changed)
+        # the played programs stay played, the others follow
+        self.assertEqual(self.rotation.programs[:2], played)
+        upcoming = [self.rotation.next_regular().name for _ in range(3)]
+        self.assertEqual(sorted(upcoming), sorted([kept.name, changed.name, 'e']))
+
+    def test_reload_rejects_broken_file(self):
+        programs = self.rotation.programs
+        for broken in [{'programs': []}, {'programs': [definition('a'), definition('a')]},
+                       {'programs': [{'name': 'a'}]}]:
+            with open(self._path, 'w') as f:
+                json.dump(broken, f)
+            self._mtime += 10
+            os.utime(self._path, (self._mtime, self._mtime))
+            self.assertFalse(self.rotation.reload())
+        self.assertEqual(self.rotation.programs, programs)
+        self.assertEqual(self.rotation.stats['rejected_reloads'], 3)
+
+    def test_restore_state(self):
+        self.rotation.next_regular()
+        state = self.rotation.state
+        other = Rotation(None, randomize_=True, followups_=False)
+        other.load(self._path)
+        self.assertTrue(other.restore(state))
+        self.assertEqual([p.name for p in other.programs], self.names())
+        self.assertEqual(other.next_regular().name, self.rotation.next_regular().name)
+
+    def test_restore_changed_programs(self):
+        state = self.rotation.state
+        self.write([definition(n) for n in 'abc'])
+        self.rotation.reload()
+        self.assertFalse(self.rotation.restore(state))
+        self.assertEqual(self.names(), ['a', 'b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
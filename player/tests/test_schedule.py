@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+import simplejson as json
+
+from content.rotation import Rotation
+from content.schedule import Schedule, Slot
+from system.clock import Clock, VirtualClock
+
+
+class ScheduleTest(unittest.TestCase):
+
+    def setUp(self):
+        Clock(VirtualClock())
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'programs.json')
+        self.write('abcd')
+        self.rotation = Rotation(None, randomize_=False, followups_=False)
+        self.rotation.load(self._path)
+
+    def tearDown(self):
+        self._directory.cleanup()
+        Clock.instance = None
+
+    def write(self, names_):
+        with open(self._path, 'w') as f:
+            json.dump({'programs': [{'name': n, 'parameters': {'order': 'desc'}} for n in names_]}, f)
+
+    def test_extend_covers_hours(self):
+        schedule = Schedule(self.rotation, None, 1, 2)
+        slots = schedule.slots
+        self.assertGreaterEqual(slots[-1].start, 3600)
+        self.assertLess(slots[-2].start, 3600)
+        for s, n in zip(slots, slots[1:]):
+            self.assertAlmostEqual(n.start, s.start + s.duration(2))
+
+    def test_next_to_prefetch_within_lead(self):
+        schedule = Schedule(self.rotation, None, 1, 2)
+        slots = schedule.slots
+        lead = slots[1].start + 1
+        self.assertIs(schedule.next_to_prefetch(lead), slots[0])
+        self.assertEqual(slots[0].state, Slot.LOADING)
+        self.assertIs(schedule.next_to_prefetch(lead), slots[1])
+        self.assertIsNone(schedule.next_to_prefetch(lead))
+        Clock().advance(slots[2].start - slots[1].start)
+        self.assertIs(schedule.next_to_prefetch(lead), slots[2])
+
+    def test_next_to_prefetch_not_twice(self):
+        self.write('a')
+        rotation = Rotation(None, randomize_=False, followups_=False)
+        rotation.load(self._path)
+        schedule = Schedule(rotation, None, 1, 2)
+        self.assertIs(schedule.next_to_prefetch(7200), schedule.slots[0])
+        # the other slots play the same program, which is still loading
+        self.assertIsNone(schedule.next_to_prefetch(7200))
+
+    def test_replan_skips_removed_programs(self):
+        schedule = Schedule(self.rotation, None, 2, 2)
+        loading = schedule.next_to_prefetch(1)
+        removed = [p for p in self.rotation.programs if p.name in ('b', 'c') and p is not loading.program]
+        self.write([p.name for p in self.rotation.programs if p not in removed])
+        os.utime(self._path, (os.path.getmtime(self._path) + 10,) * 2)
+        self.assertTrue(self.rotation.reload())
+        schedule.replan()
+        slots = schedule.slots
+        self.assertEqual(loading.state, Slot.LOADING)
+        for s in slots:
+            if s.program in removed:
+                self.assertEqual(s.state, Slot.SKIPPED)
+                self.assertEqual(s.duration(2), 0)
+            else:
+                self.assertNotEqual(s.state, Slot.SKIPPED)
+        self.assertGreaterEqual(slots[-1].start, 2 * 3600)
+
+
+if __name__ == '__main__':
+    unittest.main()